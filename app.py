@@ -1,27 +1,45 @@
 """Flask 入口：处理页面路由、API 接口、用户登录与推荐逻辑。"""
 
 import os
+import base64
+import json
 import time
 import math
-import re
+import random
 import threading
 import uuid
-from collections import Counter
-from datetime import datetime
+from datetime import datetime, timedelta
 from io import BytesIO
 
-import jieba
+import click
 from PIL import Image
-from flask import Blueprint, Flask, render_template, jsonify, request, redirect, url_for, flash
+from flask import (
+    Blueprint, Flask, Response, render_template, jsonify, request, redirect, stream_with_context, url_for, flash,
+)
 from werkzeug.utils import secure_filename
 from werkzeug.security import check_password_hash, generate_password_hash
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
-from sqlalchemy import func, or_
+from sqlalchemy import and_, func, or_, select, union_all
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.exc import IntegrityError
 
 from config import Config
-from models import db, Video, User, UserAction
-from spider.bilibili_api import crawl
+from models import (
+    db, Video, User, UserAction, StatsSnapshot, SearchDoc, UpStats, UpTerm, TagCount, VideoGrowth, VideoMetrics,
+)
+from history_buffer import HistoryBuffer
+from item_cf import ItemCF, build_item_similarity
+from recommender import ContentRecommender, action_weight
+from spider.search_index import REFRESH_OVERLAP, SearchIndex, rebuild_search_index
+from spider.stats_snapshot import SNAPSHOT_NAME, rebuild_stats_snapshot
+from spider.classifier import classify_many, get_classify_service, reclassify_videos
+from spider.executor import SpiderExecutor
+from spider.metric_history import GROWTH_WINDOWS, decode_samples, from_minute, rebuild_growth
+from spider.model_loader import get_classifier_state, get_vectorizer_state, warm_up
+from spider.result_spool import ResultSpool
+from spider.task_store import ACTIVE_STATUSES, RESUMABLE_STATUSES, TaskStore
+from spider.term_store import WORD_CLOUD_SIZE, rebuild_term_store
+from spider.up_rollup import MAXIMA_NAME as UP_MAXIMA_NAME, rebuild_up_rollup
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -34,6 +52,22 @@ PASSWORD_HASH_METHOD = "pbkdf2:sha256:260000"
 PASSWORD_SALT_LENGTH = 8  # keep hash length within DB column limits
 SUPPORTED_ACTIONS = {'fav', 'todo', 'history'}
 HISTORY_LIMIT = 200  # 返回给前端的学习足迹条数上限，避免过大响应
+VIDEO_PAGE_SIZE = 12
+COUNT_CACHE_TTL = 60  # 游标分页下 total 的缓存秒数
+RECOMMEND_SIZE = 8
+HISTORY_FLUSH_SIZE = 500  # 历史写后缓冲每批 upsert 的最大行数
+RANDOM_OVERSAMPLE = 2  # 随机抽样的 seek 次数 = 返回条数 * 该倍数，抵消重复命中
+PROFILE_ACTION_LIMIT = 200  # 构造用户画像时最多取的最近行为数
+SPIDER_DATA_PAGE_SIZE = 200  # /api/spider/tasks/<id>/data 每页返回的结果条数
+SSE_POLL_INTERVAL = 0.5  # SSE 检查新事件的间隔（秒）
+SSE_HEARTBEAT = 15  # 无事件时发送心跳注释的间隔（秒），防止代理断开空闲连接
+SSE_MAX_DURATION = 300  # 单次 SSE 连接最长保持（秒），之后由浏览器带 Last-Event-ID 自动重连
+SSE_RETRY_MS = 3000  # 告知浏览器的重连间隔
+RISING_LIMIT = 50  # /api/videos/rising 单次最多返回的条数
+# 预分叉部署（gunicorn --preload）设为 1：master 导入时即加载分类模型与 jieba 词典，fork 后的 worker 共享，首个请求不再冷启动
+WARM_UP_MODELS = os.environ.get("BILI_WARM_UP") == "1"
+CLASSIFY_API_ENABLED = os.environ.get("BILI_CLASSIFY_API") == "1"  # 是否开放 POST /api/classify
+CLASSIFY_API_MAX_ITEMS = 500  # /api/classify 单次最多分类的条数
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
@@ -47,6 +81,28 @@ try:
 except Exception as exc:
     app.logger.warning("Skipping db.create_all during startup: %s", exc)
 
+# 关键词倒排索引：启动时从 search_docs 全量加载，之后每次搜索按水位增量补齐爬虫新写入的文档
+search_index = SearchIndex()
+
+
+def refresh_search_index() -> None:
+    """把 indexed_at 晚于水位的文档加载进内存索引（首次为全量加载）。"""
+    query = db.session.query(SearchDoc.bvid, SearchDoc.terms, SearchDoc.doc_len, SearchDoc.indexed_at)
+    since = search_index.refresh_since()
+    if since is not None:
+        query = query.filter(SearchDoc.indexed_at >= since)
+    search_index.add_rows(query.yield_per(2000))
+
+
+try:
+    with app.app_context():
+        refresh_search_index()
+except Exception as exc:
+    app.logger.warning("Skipping search index load during startup: %s", exc)
+
+if WARM_UP_MODELS:
+    app.logger.info("Models warmed up: %s", {name: round(cost, 3) for name, cost in warm_up().items()})
+
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
@@ -57,89 +113,183 @@ def load_user(user_id):
     """Flask-Login 回调：根据 user_id 取出用户对象。"""
     return db.session.get(User, int(user_id))
 
-# ---- 爬虫任务管理（内存版，支持前端可视化进度）----
+# ---- 爬虫任务管理（SQLite 持久化 + 页级检查点，结果落盘为 NDJSON，支持前端可视化进度与断点续跑）----
 spider_bp = Blueprint("spider_api", __name__)
-tasks: dict[str, dict] = {}
-
-
-def run_spider_task(task_id: str, params: dict):
-    task = tasks[task_id]
-    task["status"] = "running"
-    task["progress"] = 0
-    task["message"] = ""
-    stop_flag = threading.Event()
-    task["stop_flag"] = stop_flag
-
-    def on_progress(done: int, total: int, log_line: str | None = None):
-        if total:
-            task["progress"] = min(100, max(0, int(done / total * 100)))
-        if log_line:
-            task["logs"] = (task["logs"] + [log_line])[-20:]
-
-    try:
-        data = crawl(params or {}, progress_cb=on_progress, stop_flag=stop_flag)
-        task["result"] = data
-        task["status"] = "succeeded"
-        task["progress"] = 100
-    except Exception as exc:
-        task["status"] = "failed"
-        task["message"] = str(exc)
+task_store = TaskStore()
+result_spool = ResultSpool()
+spider_executor = SpiderExecutor(task_store, result_spool.directory)
+
+
+def evict_finished_tasks() -> int:
+    """删除结束超过 RESULT_TTL 的任务记录、检查点与结果文件。"""
+    expired = task_store.expired()
+    for task_id in expired:
+        result_spool.remove(task_id)
+    task_store.delete(expired)
+    return len(expired)
+
+
+def recover_spider_tasks() -> None:
+    """
+    进程启动后执行一次：worker 已退出（心跳过期或进程不存在）的执行中任务标记为 interrupted，清理过期任务，
+    并为共享队列里遗留的排队任务拉起 worker。心跳正常的任务属于其他进程拉起的 worker，不受影响。
+    """
+    interrupted = task_store.recover_stale()
+    if interrupted:
+        app.logger.warning("Marked %s orphaned spider task(s) as interrupted", interrupted)
+    evict_finished_tasks()
+    spider_executor.dispatch()
+
+
+_import_pid = os.getpid()
+_started_pid = None
+_started_lock = threading.Lock()
+
+
+@app.before_request
+def start_process_services():
+    """
+    每个进程处理首个请求前执行一次启动逻辑（不在导入时执行：导入 app 的脚本、CLI 命令不会动到任务状态）。
+    预分叉部署（gunicorn --preload）中这里运行在 fork 后的 worker 里：丢弃从 master 继承的数据库连接池
+    （不关闭，连接仍归 master 所有），后台线程与 SQLite 连接都在 worker 内按需新建。
+    """
+    global _started_pid
+    if _started_pid == os.getpid():
+        return
+    with _started_lock:
+        if _started_pid == os.getpid():
+            return
+        if os.getpid() != _import_pid:
+            db.engine.dispose(close=False)
+        history_buffer.start()
+        try:
+            recover_spider_tasks()
+        except Exception as exc:
+            app.logger.warning("Skipping spider task recovery during startup: %s", exc)
+        _started_pid = os.getpid()
 
 
 @spider_bp.route("/api/spider/tasks", methods=["POST"])
 @login_required
 def create_spider_task():
     params = request.get_json(silent=True) or {}
-    task_id = str(uuid.uuid4())
-    tasks[task_id] = {
-        "status": "pending",
-        "progress": 0,
-        "message": "",
-        "logs": [],
-        "result": [],
-        "created_at": datetime.utcnow(),
-    }
-    t = threading.Thread(target=run_spider_task, args=(task_id, params), daemon=True)
-    t.start()
-    return jsonify({"task_id": task_id})
+    evict_finished_tasks()
+    task_id, deduplicated = spider_executor.submit(str(uuid.uuid4()), params)
+    return jsonify({"task_id": task_id, "deduplicated": deduplicated})
 
 
 @spider_bp.route("/api/spider/tasks/<task_id>", methods=["GET"])
 @login_required
 def get_spider_task(task_id: str):
-    task = tasks.get(task_id)
+    task = task_store.get(task_id)
     if not task:
         return jsonify({"error": "not found"}), 404
     return jsonify(
         {
-            "status": task.get("status"),
-            "progress": task.get("progress", 0),
-            "message": task.get("message", ""),
-            "logs": task.get("logs", []),
+            "status": task["status"],
+            "progress": task["progress"],
+            "message": task["message"],
+            "logs": task["logs"],
+            "result_count": task["result_count"],
+            "queue_position": spider_executor.queue_position(task_id),
+            "resumable": task["status"] in RESUMABLE_STATUSES,
         }
     )
 
 
+def format_sse(event_id, event_type, data) -> str:
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@spider_bp.route("/api/spider/tasks/<task_id>/events", methods=["GET"])
+@login_required
+def stream_spider_task_events(task_id: str):
+    """
+    Server-Sent Events：推送 progress（进度 + 新日志行）与 status（状态变化）事件。
+    首次连接先发一条 snapshot（当前状态与最近日志）；断线重连时浏览器带 Last-Event-ID，只补发其后的事件。
+    任务结束后发完剩余事件即关闭；轮询接口 GET /api/spider/tasks/<id> 仍可作为降级方案。
+    """
+    task = task_store.get(task_id)
+    if not task:
+        return jsonify({"error": "not found"}), 404
+    last_id = request.headers.get("Last-Event-ID", type=int) or request.args.get("last_event_id", 0, type=int)
+
+    def generate(last_id):
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        if not last_id:
+            last_id = task_store.last_event_id(task_id)
+            snapshot = {key: task[key] for key in ("status", "progress", "message", "logs", "result_count")}
+            snapshot["queue_position"] = spider_executor.queue_position(task_id)
+            yield format_sse(last_id, "snapshot", snapshot)
+        started = last_beat = time.time()
+        while time.time() - started < SSE_MAX_DURATION:
+            events = task_store.events_after(task_id, last_id)
+            for event_id, event_type, data in events:
+                last_id = event_id
+                yield format_sse(event_id, event_type, data)
+            if events:
+                last_beat = time.time()
+                continue
+            current = task_store.get(task_id)
+            if current is None or current["status"] not in ACTIVE_STATUSES:
+                return
+            if time.time() - last_beat >= SSE_HEARTBEAT:
+                last_beat = time.time()
+                yield ": heartbeat\n\n"
+            time.sleep(SSE_POLL_INTERVAL)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(generate(last_id)), mimetype="text/event-stream", headers=headers)
+
+
 @spider_bp.route("/api/spider/tasks/<task_id>/data", methods=["GET"])
 @login_required
 def get_spider_task_data(task_id: str):
-    task = tasks.get(task_id)
+    """
+    默认按游标分页：?cursor=<上页 next_cursor>&limit=200，游标对前端不透明，无效的游标返回 400；
+    ?stream=1 以 application/x-ndjson 分块返回全部结果，不在内存中拼装完整列表。
+    """
+    task = task_store.get(task_id)
     if not task:
         return jsonify({"error": "not found"}), 404
-    return jsonify({"data": task.get("result", [])})
+    if request.args.get("stream") == "1":
+        return Response(stream_with_context(result_spool.stream(task_id)), mimetype="application/x-ndjson")
+    limit = min(max(request.args.get("limit", SPIDER_DATA_PAGE_SIZE, type=int), 1), SPIDER_DATA_PAGE_SIZE)
+    try:
+        rows, next_cursor, has_more = result_spool.read(task_id, request.args.get("cursor"), limit)
+    except ValueError:
+        return jsonify({"error": "invalid cursor"}), 400
+    return jsonify({"data": rows, "total": task["result_count"], "next_cursor": next_cursor, "has_more": has_more})
 
 
 @spider_bp.route("/api/spider/tasks/<task_id>/cancel", methods=["POST"])
 @login_required
 def cancel_spider_task(task_id: str):
-    task = tasks.get(task_id)
+    task = task_store.get(task_id)
+    if not task:
+        return jsonify({"error": "not found"}), 404
+    if task["status"] not in ACTIVE_STATUSES:
+        return jsonify({"status": task["status"]})
+    # 排队中的直接出队；执行中的改为 cancelling，worker 轮询到后中断，刷完写库队列再改为 cancelled（此前不可续跑）
+    if spider_executor.cancel_pending(task_id):
+        return jsonify({"status": "cancelled"})
+    if task_store.request_cancel(task_id):
+        return jsonify({"status": "cancelling"})
+    current = task_store.get(task_id)     # 已是 cancelling，或刚好执行结束
+    return jsonify({"status": current["status"] if current else task["status"]})
+
+
+@spider_bp.route("/api/spider/tasks/<task_id>/resume", methods=["POST"])
+@login_required
+def resume_spider_task(task_id: str):
+    """中断/取消/失败的任务按原参数重跑，crawl() 会从检查点继续。"""
+    task = task_store.get(task_id)
     if not task:
         return jsonify({"error": "not found"}), 404
-    flag = task.get("stop_flag")
-    if flag:
-        flag.set()
-    task["status"] = "cancelled"
-    return jsonify({"status": "cancelled"})
+    if task["status"] not in RESUMABLE_STATUSES or spider_executor.is_active(task_id):
+        return jsonify({"error": f"任务状态为 {task['status']}，无法续跑"}), 409
+    queued_id, deduplicated = spider_executor.submit(task_id, task["params"], create=False)
+    return jsonify({"task_id": queued_id, "status": "pending", "deduplicated": deduplicated})
 
 
 app.register_blueprint(spider_bp)
@@ -211,14 +361,26 @@ def delete_action(user_id: int, bvid: str, action_type: str) -> bool:
     return True
 
 
+def write_history_rows(rows) -> None:
+    """写后缓冲的落库函数：多行 INSERT ... ON DUPLICATE KEY UPDATE，命中 uq_user_action 时只刷新时间。"""
+    with app.app_context(), db.engine.begin() as conn:
+        for start in range(0, len(rows), HISTORY_FLUSH_SIZE):
+            stmt = mysql_insert(UserAction).values([
+                {'user_id': uid, 'bvid': bvid, 'action_type': 'history', 'status': 0, 'create_time': when}
+                for uid, bvid, when in rows[start:start + HISTORY_FLUSH_SIZE]
+            ])
+            stmt = stmt.on_duplicate_key_update(create_time=stmt.inserted.create_time)
+            conn.execute(stmt)
+
+
+# 观看历史是点击量最大的写路径：先进内存队列，后台按条数/时间批量 upsert，进程退出前刷盘。
+# 刷盘线程在首次记录历史时才在当前进程启动（预分叉部署中 master 不启动，各 worker 各起一个）
+history_buffer = HistoryBuffer(write_history_rows, flush_size=HISTORY_FLUSH_SIZE)
+
+
 def bump_history(user_id: int, bvid: str) -> None:
-    """记录观看历史：若存在则更新时间，否则新增。"""
-    history = get_action_record(user_id, bvid, 'history')
-    if history:
-        history.create_time = func.now()
-    else:
-        db.session.add(UserAction(user_id=user_id, bvid=bvid, action_type='history'))
-    db.session.commit()
+    """记录观看历史：只入写后缓冲，不等待数据库（若存在则更新时间，否则新增，由批量 upsert 完成）。"""
+    history_buffer.add(user_id, bvid)
 
 
 # --- 认证路由 ---
@@ -313,64 +475,234 @@ def spider_page(): return render_template('spider.html', active='spider')
 
 # --- API 接口 ---
 
+def rebuild_dashboard_snapshot() -> None:
+    """全量重算仪表盘快照（复用应用的数据库连接）。"""
+    connection = db.engine.raw_connection()
+    try:
+        rebuild_stats_snapshot(connection)
+    finally:
+        connection.close()
+
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """flask --app app rebuild-stats：全量重建仪表盘快照。"""
+    rebuild_dashboard_snapshot()
+    print("仪表盘快照已重建")
+
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """flask --app app rebuild-search-index：对全部视频重新分词建索引。"""
+    connection = db.engine.raw_connection()
+    try:
+        rebuild_search_index(connection)
+    finally:
+        connection.close()
+    print("搜索索引已重建")
+
+
 @app.route('/api/stats')
 def get_stats():
-    """仪表盘数据：全局统计 + 玫瑰图 + 干货度散点图。"""
-
-    # 1) 基础计数
-    total_videos = Video.query.count()
-    total_teachers = db.session.query(func.count(func.distinct(Video.up_name))).scalar()
-    total_views = db.session.query(func.sum(Video.view_count)).scalar() or 0
-    avg_score = db.session.query(func.avg(Video.dry_goods_ratio)).scalar() or 0
-
-    # 2) 干货度榜单 (Top 8)
-    top_list = Video.query.order_by(Video.dry_goods_ratio.desc()).limit(8).all()
-    rank_titles = [v.title[:15] + '...' if len(v.title) > 15 else v.title for v in top_list][::-1]
-    rank_scores = [v.dry_goods_ratio for v in top_list][::-1]
-    rank_bvids = [v.bvid for v in top_list][::-1]
-
-    # 3) 学科分类分布（玫瑰图数据）：phase/subject 都写进 category 以兼容旧字段
-    cat_stats = db.session.query(Video.category, func.count(Video.bvid)) \
-        .filter(Video.category != None, Video.category != '') \
-        .group_by(Video.category).all()
-
-    # 构造 ECharts 需要的 [{name: 'xx', value: 10}, ...] 格式
-    category_data = [{'name': c[0], 'value': c[1]} for c in cat_stats]
-
-    # 4) 散点图数据：过滤掉超短或超长视频，按播放量取 Top 150
-    scatter_data = []
-    hot_videos = Video.query.filter(Video.duration > 300, Video.duration < 10800).order_by(
-        Video.view_count.desc()).limit(150).all()
-    for v in hot_videos:
-        duration_min = round(v.duration / 60, 1)
-        scatter_data.append([duration_min, v.dry_goods_ratio, v.title, v.up_name, v.bvid])
-
+    """仪表盘数据：读取爬虫增量维护的统计快照，不再对 videos 做全表聚合。"""
+    snapshot = db.session.get(StatsSnapshot, SNAPSHOT_NAME)
+    if snapshot is None:
+        # 首次访问（或快照被清空）时全量构建一次
+        rebuild_dashboard_snapshot()
+        snapshot = db.session.get(StatsSnapshot, SNAPSHOT_NAME)
+    payload = json.loads(snapshot.payload or '{}')
+
+    # 干货度榜单 (Top 8)：条目为 [bvid, 干货度, 标题]，前端按升序画条形图
+    top_list = payload.get('rank', [])[::-1]
+    rank_titles = [t[:15] + '...' if len(t) > 15 else t for _, _, t in top_list]
+    rank_scores = [score for _, score, _ in top_list]
+    rank_bvids = [bvid for bvid, _, _ in top_list]
+
+    # 学科分类分布（玫瑰图）：构造 ECharts 需要的 [{name: 'xx', value: 10}, ...] 格式
+    category_data = [{'name': k, 'value': v} for k, v in payload.get('category_counts', {}).items() if v > 0]
+
+    # 散点图：条目为 [bvid, 播放量, 时长(秒), 干货度, 标题, UP 主]
+    scatter_data = [
+        [round(duration / 60, 1), ratio, title, up_name, bvid]
+        for bvid, _, duration, ratio, title, up_name in payload.get('scatter', [])
+    ]
+
+    avg_score = snapshot.ratio_sum / snapshot.ratio_count if snapshot.ratio_count else 0
+    updated_at = snapshot.updated_at
     return jsonify({
-        'total_videos': total_videos,
-        'total_teachers': total_teachers,
-        'total_views': total_views,
+        'total_videos': snapshot.total_videos or 0,
+        'total_teachers': snapshot.total_teachers or 0,
+        'total_views': snapshot.total_views or 0,
         'avg_score': round(avg_score, 1),
         'rank_titles': rank_titles,
         'rank_scores': rank_scores,
         'rank_bvids': rank_bvids,
         'scatter_data': scatter_data,
-        'category_data': category_data  # 返回分类数据
+        'category_data': category_data,  # 返回分类数据
+        'snapshot_updated_at': updated_at.isoformat() if updated_at else None,
+        'snapshot_age_seconds': int((datetime.now() - updated_at).total_seconds()) if updated_at else None,
     })
 
+SORT_COLUMNS = {
+    'views': Video.view_count,
+    'new': Video.pubdate,
+    'dry_goods': Video.dry_goods_ratio,
+}
+
+
+def apply_category_filter(query, category):
+    """分类筛选（兼容 phase/subject/category）。"""
+    # 前端传来的 category 可能是 "升学备考"(phase)，也可能是 "考研数学"(subject)
+    if category == 'all':
+        return query
+    return query.filter(or_(
+        Video.phase == category,    # 匹配一级分类（阶段）
+        Video.subject == category,  # 匹配二级分类（科目）
+        Video.category == category  # 兼容旧数据
+    ))
+
+
+def rank_search_hits(scores, category, sort_by):
+    """
+    对倒排索引命中的 bvid 排序：
+    - relevance：纯 BM25；
+    - dry_goods（综合排序）：BM25 乘以干货度的对数加成；
+    - views/new：保持原排序语义，BM25 仅用于同值时的次序。
+    """
+    column = SORT_COLUMNS.get(sort_by, Video.dry_goods_ratio)
+    rows = apply_category_filter(
+        db.session.query(Video.bvid, column).filter(Video.bvid.in_(list(scores))), category
+    ).all()
+    if sort_by == 'relevance':
+        return sorted((r[0] for r in rows), key=lambda b: scores[b], reverse=True)
+    if sort_by in ('views', 'new'):
+        # NULL 与 MySQL DESC 一致排在最后
+        return [r[0] for r in sorted(rows, key=lambda r: (r[1] is not None, r[1] or 0, scores[r[0]]), reverse=True)]
+    boost_base = math.log1p(max((max(r[1] or 0, 0) for r in rows), default=0)) or 1
+
+    def blended(row):
+        return scores[row[0]] * (1 + math.log1p(max(row[1] or 0, 0)) / boost_base)
+
+    return [r[0] for r in sorted(rows, key=blended, reverse=True)]
+
+
+CURSOR_SOURCES = ('index', 'seek')  # 游标来自倒排索引命中列表，还是数据库 seek 分页
+
+
+def encode_cursor(sort_by: str, sort_key, bvid: str, source: str = 'seek') -> str:
+    """游标 = 来源 + 排序方式 + 上一页最后一条的排序键 + bvid，base64 后对前端不透明。"""
+    if isinstance(sort_key, datetime):
+        sort_key = sort_key.isoformat()
+    raw = json.dumps({'p': source, 's': sort_by, 'k': sort_key, 'b': bvid}, ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token: str, sort_by: str):
+    """解析游标，返回 (来源, 排序键, bvid)；格式不对或与当前排序方式不一致时抛 ValueError。"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+        source, sort_key, bvid = data['p'], data['k'], data['b']
+    except Exception as exc:
+        raise ValueError('bad cursor') from exc
+    if source not in CURSOR_SOURCES or data.get('s') != sort_by or not isinstance(bvid, str):
+        raise ValueError('cursor sort mismatch')
+    if sort_key is not None and sort_by == 'new':
+        sort_key = datetime.fromisoformat(sort_key)
+    return source, sort_key, bvid
+
+
+def seek_after(query, column, sort_key, bvid):
+    """
+    按 (column DESC, bvid DESC) 的顺序定位到游标之后；NULL 与 MySQL DESC 一致排在最后。
+    依赖 (column, bvid) 上的索引（InnoDB 二级索引自带主键），深翻页不再扫描 OFFSET。
+    """
+    if sort_key is None:
+        return query.filter(column.is_(None), Video.bvid < bvid)
+    return query.filter(or_(
+        column < sort_key,
+        and_(column == sort_key, Video.bvid < bvid),
+        column.is_(None),
+    ))
+
+
+_count_cache: dict[tuple, tuple[float, int]] = {}
+
+
+def cached_count(query, cache_key: tuple) -> int:
+    """游标模式下的 total：同一筛选条件在 TTL 内复用 COUNT(*) 结果。"""
+    now = time.time()
+    hit = _count_cache.get(cache_key)
+    if hit and now - hit[0] < COUNT_CACHE_TTL:
+        return hit[1]
+    total = query.order_by(None).count()
+    if len(_count_cache) > 1000:
+        _count_cache.clear()
+    _count_cache[cache_key] = (now, total)
+    return total
+
+
 @app.route('/api/videos')
 def get_videos():
-    """视频列表：支持关键词、分类筛选与播放量/时间/干货度排序。"""
+    """
+    视频列表：支持关键词、分类筛选与播放量/时间/干货度/相关度排序。
+    两种分页：page=N（旧客户端，返回 total/pages）；cursor=（首屏传空串，之后传 next_cursor，
+    with_total=1 时才返回带缓存的 total）。
+    """
 
     # 获取参数
     page = request.args.get('page', 1, type=int)
-    per_page = 12
+    per_page = VIDEO_PAGE_SIZE
     sort_by = request.args.get('sort', 'dry_goods')
     category = request.args.get('category', 'all')
-    keyword = request.args.get('q', '')
+    keyword = request.args.get('q', '').strip()
+    cursor_token = request.args.get('cursor')
+    with_total = request.args.get('with_total', '0') == '1'
+
+    cursor = None
+    if cursor_token:
+        try:
+            cursor = decode_cursor(cursor_token, sort_by)
+        except ValueError:
+            return jsonify({'msg': '无效的 cursor'}), 400
+
+    # 1) 关键词搜索：优先走倒排索引（分词 + 倒排表求交 + BM25），索引答不了时回退 LIKE
+    if keyword:
+        refresh_search_index()
+        scores = search_index.search(keyword)
+        if scores is not None:
+            ranked = rank_search_hits(scores, category, sort_by) if scores else []
+            if cursor_token is not None:
+                # 命中列表本身就在内存里，游标只需定位上一页最后一个 bvid；
+                # 游标来自 seek 分页或其 bvid 已不在命中列表里（索引刚刷新等）时无法续接，返回 400 而不是悄悄回到第一页
+                start = 0
+                if cursor:
+                    if cursor[0] != 'index' or cursor[2] not in ranked:
+                        return jsonify({'msg': '无效的 cursor'}), 400
+                    start = ranked.index(cursor[2]) + 1
+            else:
+                page = max(page, 1)
+                start = (page - 1) * per_page
+            page_bvids = ranked[start: start + per_page]
+            video_map = {v.bvid: v for v in Video.query.filter(Video.bvid.in_(page_bvids)).all()} if page_bvids else {}
+            videos = [serialize_video(video_map[b]) for b in page_bvids if b in video_map]
+            if cursor_token is not None:
+                has_more = start + per_page < len(ranked)
+                return jsonify({
+                    'videos': videos,
+                    'next_cursor': encode_cursor(sort_by, None, page_bvids[-1], 'index') if has_more else None,
+                    'has_more': has_more,
+                    'total': len(ranked),
+                })
+            return jsonify({
+                'videos': videos,
+                'total': len(ranked),
+                'pages': math.ceil(len(ranked) / per_page),
+                'current_page': page
+            })
 
     query = Video.query
 
-    # 1) 关键词搜索 (标题 OR 标签 OR UP主)
+    # 标题 OR 标签 OR UP主 子串匹配（索引未命中时的兜底路径）
     if keyword:
         query = query.filter(or_(
             Video.title.like(f'%{keyword}%'),
@@ -378,24 +710,36 @@ def get_videos():
             Video.up_name.like(f'%{keyword}%')
         ))
 
-    # 2) 分类筛选（兼容 phase/subject/category）
-    # 前端传来的 category 可能是 "升学备考"(phase)，也可能是 "考研数学"(subject)
-    if category != 'all':
-        query = query.filter(or_(
-            Video.phase == category,    # 匹配一级分类（阶段）
-            Video.subject == category,  # 匹配二级分类（科目）
-            Video.category == category  # 兼容旧数据
-        ))
+    # 2) 分类筛选
+    query = apply_category_filter(query, category)
 
     # 3) 排序逻辑：播放量/最新/干货度（默认）
-    if sort_by == 'views':
-        query = query.order_by(Video.view_count.desc())
-    elif sort_by == 'new':
-        query = query.order_by(Video.pubdate.desc())
-    else:
-        query = query.order_by(Video.dry_goods_ratio.desc())
-
-    # 4. 分页
+    sort_column = SORT_COLUMNS.get(sort_by, Video.dry_goods_ratio)
+
+    # 4a. 游标分页：seek 谓词 + LIMIT，多取一条判断是否还有下一页，不做 COUNT/OFFSET
+    if cursor_token is not None:
+        filtered = query
+        if cursor:
+            # 倒排索引路径的游标没有排序键，套用到 seek 上会变成 “column IS NULL”，直接拒绝
+            if cursor[0] != 'seek':
+                return jsonify({'msg': '无效的 cursor'}), 400
+            query = seek_after(query, sort_column, cursor[1], cursor[2])
+        rows = query.order_by(sort_column.desc(), Video.bvid.desc()).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            next_cursor = encode_cursor(sort_by, getattr(last, sort_column.key), last.bvid)
+        return jsonify({
+            'videos': [serialize_video(v) for v in rows],
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'total': cached_count(filtered, (keyword, category)) if with_total else None,
+        })
+
+    # 4b. 页码分页（旧客户端）
+    query = query.order_by(sort_column.desc())
     pagination = db.paginate(query, page=page, per_page=per_page, error_out=False)
     videos = pagination.items
 
@@ -407,43 +751,56 @@ def get_videos():
     })
 
 
+@app.cli.command('rebuild-terms')
+def rebuild_terms_command():
+    """flask --app app rebuild-terms：重新分词，重建 UP 词频与标签计数。"""
+    connection = db.engine.raw_connection()
+    try:
+        rebuild_term_store(connection)
+    finally:
+        connection.close()
+    print("词频表已重建")
+
+
 @app.route('/api/hot_tags')
 def get_hot_tags():
-    """热门标签词频：取前 200 条视频的 tags 聚合后返回 Top 15。"""
-    videos = Video.query.filter(Video.tags != '').limit(200).all()
-    all_tags = []
-    for v in videos:
-        if v.tags:
-            parts = re.split(r'[\,\uFF0C\u3001\s]+', v.tags)
-            all_tags.extend([t for t in parts if t])
-    return jsonify([tag for tag, count in Counter(all_tags).most_common(15)])
+    """热门标签：直接读入库时累加的全局标签计数，返回 Top 15。"""
+    rows = TagCount.query.filter(TagCount.cnt > 0).order_by(TagCount.cnt.desc()).limit(15).all()
+    return jsonify([row.tag for row in rows])
+
+
+def rebuild_up_stats() -> None:
+    """全量重算 UP 汇总（复用应用的数据库连接）。"""
+    connection = db.engine.raw_connection()
+    try:
+        rebuild_up_rollup(connection)
+    finally:
+        connection.close()
+
+
+@app.cli.command('rebuild-up-stats')
+def rebuild_up_stats_command():
+    """flask --app app rebuild-up-stats：全量重算 UP 汇总与归一化基准（建议每日执行以刷新活跃度）。"""
+    rebuild_up_stats()
+    print("UP 汇总已重建")
 
 
 @app.route('/api/compare_data')
 def compare_data():
-    """UP 主对比：聚合播放/收藏/互动等指标，归一化后输出雷达图与词云。"""
+    """UP 主对比：读取两行 UP 汇总 + 一条归一化基准，输出雷达图与词云。"""
     up1 = request.args.get('up1')
     up2 = request.args.get('up2')
     if not up1 or not up2:
         return jsonify({'msg': '缺少 up 参数'}), 400
 
-    # 计算各 UP 真实数据的聚合，避免模拟占位
-    summaries = db.session.query(
-        Video.up_name,
-        func.count(Video.bvid).label('video_count'),
-        func.sum(Video.view_count).label('total_views'),
-        func.sum(Video.favorite_count).label('total_fav'),
-        func.sum(Video.reply_count).label('total_reply'),
-        func.sum(Video.danmaku_count).label('total_danmaku'),
-        func.sum(Video.duration).label('total_duration'),
-        func.min(Video.pubdate).label('first_pub')
-    ).group_by(Video.up_name).all()
-
-    summary_map = {s.up_name: s for s in summaries}
-    stat_cache = {}
-    def safe_rate(numerator, denominator):
-        """分母为 0 时返回 0，避免抛异常。"""
-        return round((numerator / denominator) * 100, 2) if denominator else 0
+    maxima_row = db.session.get(StatsSnapshot, UP_MAXIMA_NAME)
+    if maxima_row is None:
+        # 汇总表尚未建立（首次部署）时全量构建一次
+        rebuild_up_stats()
+        maxima_row = db.session.get(StatsSnapshot, UP_MAXIMA_NAME)
+    maxima = json.loads(maxima_row.payload or '{}')
+
+    stat_cache = {s.up_name: s for s in UpStats.query.filter(UpStats.up_name.in_([up1, up2])).all()}
 
     def normalize(value, max_value):
         """将指标压缩到 0-100：用对数平滑缩小极端差距。"""
@@ -456,45 +813,12 @@ def compare_data():
         if score < 5 and value > 0: score = 5
         return round(min(score, 100), 1)
 
-    # 预计算每个 UP 的原始指标，避免重复计算
-    from datetime import datetime
-    now_dt = datetime.utcnow()
-    for s in summaries:
-        video_count = s.video_count or 0
-        total_views = s.total_views or 0
-        total_fav = s.total_fav or 0
-        total_interact = (s.total_reply or 0) + (s.total_danmaku or 0)
-        fav_rate = safe_rate(total_fav, total_views)
-        interact_avg = total_interact / max(video_count, 1) / 2  # (弹幕+评论)/视频数/2
-        duration_hours = (s.total_duration or 0) / 3600 or 0
-        depth_score = total_fav / max(duration_hours, 1)  # 收藏/时长(小时)
-        if s.first_pub:
-            days_span = max((now_dt - s.first_pub).total_seconds() / 86400, 1)
-        else:
-            days_span = 30  # 无发布时间数据时给一个平滑基准
-        activity_per_week = (video_count / days_span) * 7  # 每周发片数
-
-        stat_cache[s.up_name] = {
-            'video_count': video_count,
-            'views': total_views,
-            'fav': total_fav,
-            'fav_rate': fav_rate,
-            'interact_avg': interact_avg,
-            'depth_score': depth_score,
-            'activity': activity_per_week,
-            'total_interact': total_interact,
-            'total_duration_hours': duration_hours,
-        }
-
     # 评分归一化基准
-    if stat_cache:
-        max_views = max(c['views'] for c in stat_cache.values()) or 1
-        max_fav_rate = max(c['fav_rate'] for c in stat_cache.values()) or 1
-        max_interact = max(c['interact_avg'] for c in stat_cache.values()) or 1
-        max_depth = max(c['depth_score'] for c in stat_cache.values()) or 1
-        max_activity = max(c['activity'] for c in stat_cache.values()) or 1
-    else:
-        max_views = max_fav_rate = max_interact = max_depth = max_activity = 1
+    max_views = maxima.get('views') or 1
+    max_fav_rate = maxima.get('fav_rate') or 1
+    max_interact = maxima.get('interact') or 1
+    max_depth = maxima.get('depth') or 1
+    max_activity = maxima.get('activity') or 1
 
     missing = [u for u in (up1, up2) if u not in stat_cache]
     if missing:
@@ -505,14 +829,11 @@ def compare_data():
         if not summary:
             return {'radar': [0] * 5, 'metrics': {}, 'words': []}
 
-        total_views = summary['views']
-        fav_rate = summary['fav_rate']
-        inter_avg = summary['interact_avg']
-        depth_score = summary['depth_score']
-        activity = summary['activity']
-        video_count = summary['video_count']
-        total_fav = summary['fav']
-        total_interact = summary['total_interact']
+        total_views = summary.total_views or 0
+        fav_rate = summary.fav_rate or 0
+        inter_avg = summary.interact_avg or 0
+        depth_score = summary.depth_score or 0
+        activity = summary.activity or 0
 
         # 构造雷达图数据（归一化到 0-100）
         # 顺序：传播力, 质量(收藏率), 互动热度, 深度收藏, 创作活跃
@@ -524,22 +845,9 @@ def compare_data():
             normalize(activity, max_activity)
         ]
 
-        # 词云逻辑 (保持不变)
-        videos = Video.query.filter_by(up_name=up_name).all()
-        text = "".join([v.title + (v.tags or "") for v in videos])
-        stop_words = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很',
-                      '到', '说', '去', '你', '会', '着', '没有', '看', '怎么', '视频', '高数', '数学', '考研',
-                      '这一', '这个', '那个', '还是', '因为', '所以', '如果', '就是', '什么', '主要', '很多', '非常',
-                      '大家'}
-
-        words = jieba.cut(text)
-        valid_words = []
-        for w in words:
-            if len(w) > 1 and w not in stop_words and not w.isdigit():
-                valid_words.append(w)
-
-        word_counts = Counter(valid_words).most_common(150)
-        word_cloud_data = [{'name': k, 'value': v} for k, v in word_counts] or [{'name': up_name, 'value': 1}]
+        # 词云：入库时已分词并累加到 up_terms，这里只按词频取 Top 150
+        word_counts = UpTerm.query.filter_by(up_name=up_name).order_by(UpTerm.cnt.desc()).limit(WORD_CLOUD_SIZE).all()
+        word_cloud_data = [{'name': w.term, 'value': w.cnt} for w in word_counts] or [{'name': up_name, 'value': 1}]
 
         # 前端表格展示指标（Key 必须与前端一致）
         metrics = {
@@ -552,8 +860,6 @@ def compare_data():
 
         return {'radar': stats, 'metrics': metrics, 'words': word_cloud_data}
 
-    # === 评分归一化基准结束 ===
-
     data1 = get_up_data(up1)
     data2 = get_up_data(up2)
 
@@ -563,6 +869,226 @@ def compare_data():
     })
 
 
+@app.cli.command('rebuild-growth')
+def rebuild_growth_command():
+    """flask --app app rebuild-growth：按指标历史重算各窗口的增长汇总（修改 BILI_GROWTH_WINDOWS 后执行）。"""
+    connection = db.engine.raw_connection()
+    try:
+        rebuild_growth(connection)
+    finally:
+        connection.close()
+    print("增长汇总已重建")
+
+
+@app.cli.command('reclassify')
+@click.option('--dry-run', is_flag=True, help='只统计会变化的科目，不写库')
+def reclassify_command(dry_run):
+    """flask --app app reclassify：发布新模型后用当前模型重新分类全部视频，只更新科目有变化的行。"""
+    connection = db.engine.raw_connection()
+    try:
+        scanned, changed, transitions = reclassify_videos(connection, dry_run=dry_run)
+    finally:
+        connection.close()
+    print(f"已扫描 {scanned} 条视频，科目变化 {changed} 条{'（未写库）' if dry_run else ''}")
+    for (old, new), count in transitions.most_common(20):
+        print(f"  {old} -> {new}: {count}")
+
+
+def serialize_growth(g):
+    return {
+        'window_days': g.window_days,
+        'view_delta': g.view_delta or 0,
+        'favorite_delta': g.favorite_delta or 0,
+        'reply_delta': g.reply_delta or 0,
+        'view_rate': round(g.view_rate or 0, 2),
+        'span_hours': round(g.span_hours or 0, 1),
+        'sampled_at': g.sampled_at.isoformat() if g.sampled_at else None,
+    }
+
+
+@app.route('/api/videos/rising')
+def get_rising_videos():
+    """
+    上升最快的视频：按 window（天，须为预计算窗口之一）读取 video_growth，按日均播放增量排序，
+    走 (window_days, view_rate) 索引；超过一个窗口未再被抓到的视频不参与排行。
+    """
+    window = request.args.get('window', 7 if 7 in GROWTH_WINDOWS else GROWTH_WINDOWS[0], type=int)
+    if window not in GROWTH_WINDOWS:
+        return jsonify({'msg': f"window 仅支持 {', '.join(map(str, GROWTH_WINDOWS))} 天"}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), RISING_LIMIT)
+    category = request.args.get('category', 'all')
+
+    query = (
+        db.session.query(VideoGrowth, Video)
+        .join(Video, Video.bvid == VideoGrowth.bvid)
+        .filter(VideoGrowth.window_days == window,
+                VideoGrowth.sampled_at >= datetime.now() - timedelta(days=window))
+    )
+    rows = apply_category_filter(query, category).order_by(VideoGrowth.view_rate.desc()).limit(limit).all()
+    return jsonify({
+        'window': window,
+        'windows': list(GROWTH_WINDOWS),
+        'videos': [{**serialize_video(v), 'growth': serialize_growth(g)} for g, v in rows],
+    })
+
+
+@app.route('/api/videos/<bvid>/growth')
+def get_video_growth(bvid):
+    """单个视频各窗口的增长汇总；history=1 时附带解码后的完整指标历史（趋势图用）。"""
+    growth = VideoGrowth.query.filter_by(bvid=bvid).order_by(VideoGrowth.window_days).all()
+    payload = {'bvid': bvid, 'growth': [serialize_growth(g) for g in growth]}
+    if request.args.get('history', '0') == '1':
+        history = []
+        for chunk in VideoMetrics.query.filter_by(bvid=bvid).order_by(VideoMetrics.chunk).all():
+            samples = decode_samples(chunk.base_minute, (chunk.base_view, chunk.base_fav, chunk.base_reply), chunk.data)
+            history.extend(
+                {'time': from_minute(minute).isoformat(), 'view': view, 'favorite': fav, 'reply': reply}
+                for minute, view, fav, reply in samples
+            )
+        payload['history'] = history
+    return jsonify(payload)
+
+
+def _random_seek_query(point: float, subject, exclude_bvids):
+    """从随机点 point 起沿 (subject, rand_key) 索引取一条，代价为一次索引定位。"""
+    query = select(Video.bvid).where(Video.rand_key >= point)
+    if subject:
+        query = query.where(Video.subject == subject)
+    if exclude_bvids:
+        query = query.where(Video.bvid.notin_(exclude_bvids))
+    return query.order_by(Video.rand_key).limit(1).subquery()
+
+
+def sample_videos(limit: int, subject=None, exclude_bvid=None):
+    """
+    随机抽样替代 ORDER BY RAND()：每个视频入库时带一个 [0,1) 的随机键 rand_key，
+    抽样时取 2*limit 个随机点，各做一次 rand_key >= 点 的索引 seek，UNION ALL 一次往返取回后去重。
+    """
+    excluded = [exclude_bvid] if exclude_bvid else []
+    seeks = [_random_seek_query(random.random(), subject, excluded) for _ in range(limit * RANDOM_OVERSAMPLE)]
+    picked = list(dict.fromkeys(
+        row[0] for row in db.session.execute(union_all(*[select(sq.c.bvid) for sq in seeks]))
+    ))[:limit]
+
+    # 候选集很小或随机点扎堆时，从一个随机点顺序补齐（不够再从头绕回）
+    for point in (random.random(), 0.0):
+        if len(picked) >= limit:
+            break
+        query = Video.query.with_entities(Video.bvid).filter(
+            Video.rand_key >= point, Video.bvid.notin_(picked + excluded)
+        )
+        if subject:
+            query = query.filter(Video.subject == subject)
+        picked += [row[0] for row in query.order_by(Video.rand_key).limit(limit - len(picked)).all()]
+
+    video_map = {v.bvid: v for v in Video.query.filter(Video.bvid.in_(picked)).all()} if picked else {}
+    return [video_map[b] for b in picked if b in video_map]
+
+
+@app.cli.command('refresh-rand-key')
+@click.option('--all', 'refresh_all', is_flag=True, help='给所有视频重新生成随机键（定期重排，打散抽样偏差）')
+def refresh_rand_key_command(refresh_all):
+    """flask --app app refresh-rand-key：给缺少随机键的存量视频补上 rand_key。"""
+    query = Video.query if refresh_all else Video.query.filter(Video.rand_key.is_(None))
+    updated = query.update({Video.rand_key: func.rand()}, synchronize_session=False)
+    db.session.commit()
+    print(f"已更新 {updated} 条视频的随机键")
+
+
+# 猜你喜欢：物品协同过滤（离线构建的 npz，在线懒加载）
+item_cf = ItemCF()
+
+# 猜你喜欢的内容推荐：首次使用时在后台加载 TF-IDF 向量器并构建视频向量矩阵，就绪前回退随机抽样
+content_recommender = None
+content_recommender_version = None  # 构建当前矩阵所用向量器的版本；训练脚本发布新向量器后在后台重建
+content_recommender_unavailable = None  # 没有可用向量器时记下当时的版本，版本变化（重新发布）后再试
+_recommender_refresh_lock = threading.Lock()
+
+
+def current_vectorizer():
+    """
+    (TF-IDF 向量器, 版本)：优先用全量训练单独发布的向量器；旧部署没有该文件时取分类模型里的 TF-IDF 步骤。
+    增量训练发布的 Hashing 模型没有词表，此时没有单独的向量器就返回 None。
+    """
+    vectorizer, version = get_vectorizer_state()
+    if vectorizer is not None:
+        return vectorizer, ('vectorizer', version)
+    model, version = get_classifier_state()
+    return getattr(model, 'named_steps', {}).get('tfidfvectorizer'), ('classifier', version)
+
+
+def refresh_content_recommender(recommender) -> None:
+    """首次全量加载全部视频；之后只加载 search_docs 水位之后新入库的视频。"""
+    since = recommender.watermark
+    # search_docs 为空时用 datetime.min 作水位（不能再减回看窗口，会溢出），之后爬虫新写入的视频仍能增量发现
+    if since is not None and since != datetime.min:
+        since -= REFRESH_OVERLAP
+    watermark = db.session.query(func.max(SearchDoc.indexed_at)).scalar() or datetime.min
+    query = db.session.query(Video.bvid, Video.title, Video.tags)
+    if since is not None:
+        query = query.join(SearchDoc, SearchDoc.bvid == Video.bvid).filter(SearchDoc.indexed_at >= since)
+    recommender.add_videos(query.yield_per(2000), watermark)
+
+
+def _build_content_recommender() -> None:
+    """后台线程：加载向量器并构建或增量刷新矩阵；向量器换版本时另建一份，建好后整体替换，期间旧矩阵照常服务。"""
+    global content_recommender, content_recommender_version, content_recommender_unavailable
+    try:
+        vectorizer, version = current_vectorizer()
+        if vectorizer is None:
+            content_recommender_unavailable = version
+            return
+        content_recommender_unavailable = None
+        recommender = content_recommender
+        if recommender is None or content_recommender_version != version:
+            recommender = ContentRecommender(vectorizer)
+        with app.app_context():
+            refresh_content_recommender(recommender)
+        content_recommender, content_recommender_version = recommender, version
+    except Exception as exc:
+        app.logger.warning("Content recommender build failed: %s", exc)
+    finally:
+        _recommender_refresh_lock.release()
+
+
+def ensure_content_recommender() -> bool:
+    """返回内容推荐是否可用；未构建或向量器已换版本时在后台（重新）构建，已构建则按间隔做增量刷新。"""
+    loaded = content_recommender is not None or content_recommender_unavailable is not None
+    # 只在已加载过向量器后才检查版本（检查本身很便宜），首次加载放在后台线程里
+    version = current_vectorizer()[1] if loaded else None
+    if content_recommender_unavailable is not None and version == content_recommender_unavailable:
+        return False
+    stale = content_recommender is None or not content_recommender.ready or content_recommender_version != version
+    # 增量刷新同样放到后台线程，不占用当前请求；刷新期间继续用现有矩阵，新视频追加完成后整体替换
+    if (stale or content_recommender.due_for_refresh()) and _recommender_refresh_lock.acquire(blocking=False):
+        threading.Thread(target=_build_content_recommender, daemon=True).start()
+    return content_recommender is not None and content_recommender.ready
+
+
+def recommend_for_user(actions) -> list:
+    """按用户的收藏/待看/历史推荐：物品协同过滤优先，不足时用内容相似补位，均排除已有行为的视频。"""
+    now = datetime.now()
+    weighted = [(a.bvid, action_weight(a.action_type, a.create_time, now)) for a in actions]
+    seen = {a.bvid for a in actions}
+    picked = item_cf.recommend(weighted, seen, RECOMMEND_SIZE)
+    if len(picked) < RECOMMEND_SIZE and ensure_content_recommender():
+        more = content_recommender.recommend(weighted, seen | set(picked), RECOMMEND_SIZE - len(picked))
+        picked += [b for b in more if b not in picked]
+    video_map = {v.bvid: v for v in Video.query.filter(Video.bvid.in_(picked)).all()} if picked else {}
+    return [video_map[b] for b in picked if b in video_map]
+
+
+@app.cli.command('build-item-cf')
+def build_item_cf_command():
+    """flask --app app build-item-cf：离线重建物品协同过滤相似度（建议每日定时执行）。"""
+    connection = db.engine.raw_connection()
+    try:
+        n_items, n_pairs = build_item_similarity(connection)
+    finally:
+        connection.close()
+    print(f"协同过滤模型已更新：{n_items} 个视频，{n_pairs} 条邻居关系")
+
+
 @app.route('/api/recommend')
 def api_recommend():
     """推荐接口：按场景（期末/基础/习题/猜你喜欢）返回 8 个视频。"""
@@ -598,55 +1124,75 @@ def api_recommend():
         ))
         query = query.order_by(Video.favorite_count.desc())
 
-    # 4. 【猜你喜欢】：有登录态就基于最近观看科目做冷启动；否则随机打散
+    # 4. 【猜你喜欢】：有登录态就基于最近观看科目做冷启动；否则随机打散（随机键采样，不做全表排序）
     else:
+        subject = exclude_bvid = None
+        videos = []
         if current_user.is_authenticated:
+            # 有行为记录时按收藏/待看/历史做个性化推荐（协同过滤 + 内容相似）
+            actions = UserAction.query.filter_by(user_id=current_user.id).order_by(
+                UserAction.create_time.desc()).limit(PROFILE_ACTION_LIMIT).all()
+            if actions:
+                videos = recommend_for_user(actions)
+
             last_action = UserAction.query.filter_by(
                 user_id=current_user.id, action_type='history'
             ).order_by(UserAction.create_time.desc()).first()
 
             if last_action:
-                last_video = Video.query.get(last_action.bvid)
+                exclude_bvid = last_action.bvid
+                last_video = db.session.get(Video, last_action.bvid)
                 if last_video and last_video.subject:
-                    query = query.filter(
-                        Video.subject == last_video.subject,
-                        Video.bvid != last_video.bvid
-                    ).order_by(func.rand())
-                else:
-                    query = query.order_by(func.rand())
-            else:
-                query = query.order_by(func.rand())
-        else:
-            query = query.order_by(func.rand())
+                    subject = last_video.subject
+        if len(videos) < RECOMMEND_SIZE:
+            seen = {v.bvid for v in videos}
+            videos += [v for v in sample_videos(RECOMMEND_SIZE, subject, exclude_bvid) if v.bvid not in seen]
+        return jsonify([serialize_video(v) for v in videos[:RECOMMEND_SIZE]])
 
     # 取前 8 个返回
-    videos = query.limit(8).all()
+    videos = query.limit(RECOMMEND_SIZE).all()
     return jsonify([serialize_video(v) for v in videos])
 
 
+def fetch_action_rows(user_id: int, action_types, limit: int | None = None, with_history_total: bool = False):
+    """
+    一次 JOIN 取回某用户若干类行为及对应视频，按时间倒序；走 (user_id, action_type, create_time) 复合索引。
+    with_history_total 时用非关联标量子查询顺带返回历史总数（MySQL 只计算一次），省掉单独的 COUNT 往返。
+    """
+    columns = [UserAction, Video]
+    if with_history_total:
+        columns.append(
+            db.session.query(func.count(UserAction.id))
+            .filter(UserAction.user_id == user_id, UserAction.action_type == 'history')
+            .scalar_subquery().label('history_total')
+        )
+    query = db.session.query(*columns).outerjoin(Video, Video.bvid == UserAction.bvid).filter(
+        UserAction.user_id == user_id, UserAction.action_type.in_(action_types)
+    ).order_by(UserAction.create_time.desc())
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
 @app.route('/api/user_profile')
 @login_required
 def get_user_profile():
-    """个人中心数据：返回收藏/待办/历史及头像/简介。"""
+    """个人中心数据：返回收藏/待办/历史及头像/简介；两次查询取齐，支持 ETag 条件请求。"""
     user = current_user
     avatar_url = f"/static/avatars/{user.avatar}" if user.avatar else "https://placehold.co/100x100/00A1D6/FFFFFF?text=User"
 
-    # 1. 收藏
-    fav_actions = UserAction.query.filter_by(user_id=user.id, action_type='fav').order_by(
-        UserAction.create_time.desc()).all()
-    fav_videos = get_videos_from_actions(fav_actions)
-
-    # 2. 待办
-    todo_actions = UserAction.query.filter_by(user_id=user.id, action_type='todo').order_by(
-        UserAction.create_time.desc()).all()
-    todo_videos = get_videos_from_actions(todo_actions, include_status=True)
+    # 1. 收藏 + 待办：一次 JOIN 取回后按类型拆分（保持时间倒序）
+    fav_todo_rows = fetch_action_rows(user.id, ['fav', 'todo'])
+    fav_videos = serialize_action_rows([r for r in fav_todo_rows if r[0].action_type == 'fav'])
+    todo_videos = serialize_action_rows([r for r in fav_todo_rows if r[0].action_type == 'todo'], include_status=True)
 
-    # 3. 历史记录（限制返回条数，避免响应过大）
-    history_query = UserAction.query.filter_by(user_id=user.id, action_type='history').order_by(
-        UserAction.create_time.desc())
-    history_total = history_query.count()
-    history_actions = history_query.limit(HISTORY_LIMIT).all()
-    history_videos = get_videos_from_actions(history_actions)
+    # 2. 历史记录（限制返回条数，避免响应过大），总数随同一条 SQL 返回；
+    #    该用户还有未落库的点击时先刷盘，保证刚看过的视频能出现在足迹里
+    if history_buffer.has_pending(user.id):
+        history_buffer.flush()
+    history_rows = fetch_action_rows(user.id, ['history'], limit=HISTORY_LIMIT, with_history_total=True)
+    history_total = history_rows[0].history_total if history_rows else 0
+    history_videos = serialize_action_rows([(r[0], r[1]) for r in history_rows])
 
     # 只统计能在视频库匹配到的待办；total 用未完成数量，done 用已完成数量，避免出现“列表空但计数>0”
     pending_todos = [v for v in todo_videos if v.get('status') == 0]
@@ -655,7 +1201,7 @@ def get_user_profile():
     todo_done = len(done_todos)
     todo_total = todo_pending + todo_done
 
-    return jsonify({
+    response = jsonify({
         'user_info': {'username': user.username, 'description': user.description, 'avatar': avatar_url},
         'favorites': fav_videos,
         'todos': todo_videos,
@@ -663,17 +1209,18 @@ def get_user_profile():
         'history_total': history_total,
         'todo_stats': {'total': todo_total, 'pending': todo_pending, 'done': todo_done}
     })
+    # 内容未变化时客户端带 If-None-Match 会拿到 304，省掉响应体传输与前端重渲染
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
 
 
-def get_videos_from_actions(actions, include_status=False):
-    """辅助：根据用户动作列表批量取回视频详情，必要时携带状态/时间。"""
-    if not actions: return []
-    bvids = [a.bvid for a in actions]
-    video_map = {v.bvid: v for v in Video.query.filter(Video.bvid.in_(bvids)).all()}
+def serialize_action_rows(rows, include_status=False):
+    """辅助：把 (行为, 视频) 行转成前端结构，必要时携带状态/时间；视频缺失时返回占位。"""
     result = []
-    for action in actions:
-        if action.bvid in video_map:
-            v_data = serialize_video(video_map[action.bvid])
+    for action, video in rows:
+        if video is not None:
+            v_data = serialize_video(video)
         else:
             # fallback：视频不在库里时也返回占位，避免前端列表空白
             v_data = {
@@ -800,6 +1347,40 @@ def toggle_todo():
     return jsonify({'msg': '更新成功', 'status': action.status})
 
 
+@app.route('/api/metrics')
+@login_required
+def get_metrics():
+    """运行时监控：历史写后缓冲的队列深度与刷盘耗时、爬虫执行器的运行/排队数等。"""
+    return jsonify({
+        'history_buffer': history_buffer.snapshot(),
+        'spider_executor': spider_executor.snapshot(),
+        'classifier': get_classify_service().snapshot(),
+    })
+
+
+def classify_api():
+    """
+    POST /api/classify（设置 BILI_CLASSIFY_API=1 才注册）：{"items": [{"title", "tags", "subject"}]}，
+    subject 为模型不置信且关键词规则未命中时的兜底值；返回与 items 一一对应的科目。
+    """
+    items = (request.get_json(silent=True) or {}).get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'msg': '缺少参数'}), 400
+    if len(items) > CLASSIFY_API_MAX_ITEMS:
+        return jsonify({'msg': f'单次最多 {CLASSIFY_API_MAX_ITEMS} 条'}), 400
+    records = [
+        (str(item.get('title') or ''), str(item.get('tags') or ''), item.get('subject') or '其他')
+        for item in items if isinstance(item, dict)
+    ]
+    if len(records) != len(items):
+        return jsonify({'msg': '参数格式错误'}), 400
+    return jsonify({'subjects': classify_many(records)})
+
+
+if CLASSIFY_API_ENABLED:
+    app.add_url_rule('/api/classify', view_func=login_required(classify_api), methods=['POST'])
+
+
 def serialize_video(v):
     """统一的前端视频字典结构，避免重复模板拼装。"""
     up_mid = getattr(v, 'up_mid', None)
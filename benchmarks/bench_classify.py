@@ -0,0 +1,83 @@
+"""分类吞吐基准：逐条 predict_proba + predict（旧路径）、整页一次 predict_proba（classify_many，每组先清空记忆缓存）
+与记忆缓存已热（同批标题再分类一次，如跨关键词重复出现或重新分类任务）的对比。
+
+用桩服务同款的确定性假标题，不需要数据库和网络；分词缓存指向临时文件，第一组 batch 为冷缓存，之后各组命中缓存：
+    python benchmarks/bench_classify.py [--rows 2000] [--batch 20 100 500]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.environ["BILI_TOKEN_CACHE"] = os.path.join(tempfile.mkdtemp(prefix="bench_classify_"), "tokens.db")
+
+import jieba  # noqa: E402
+
+from spider.classifier import CONFIDENCE_THRESHOLD, classify_many, get_classify_service, keyword_classify  # noqa: E402
+from spider.model_loader import get_classifier  # noqa: E402
+from spider.stub_server import fake_items  # noqa: E402
+
+KEYWORDS = ["宋浩 高数", "线性代数 同步", "概率论期末速成", "考研数学 真题", "泰勒公式 讲解", "3Blue1Brown 中文"]
+
+
+def legacy_classify(title, tags, original_subject):
+    """旧版 smart_classify：逐条分词，置信时再调用一次 predict。"""
+    model = get_classifier()
+    if model:
+        cut_text = " ".join([w for w in jieba.cut(title + " " + str(tags)) if len(w) > 1])
+        try:
+            probs = model.predict_proba([cut_text])[0]
+            if max(probs) > CONFIDENCE_THRESHOLD:
+                return model.predict([cut_text])[0]
+        except Exception:
+            pass
+    return keyword_classify(title, tags, original_subject)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch", type=int, nargs="+", default=[20, 100, 500])
+    args = parser.parse_args()
+    if get_classifier() is None:
+        print("未找到 subject_classifier.pkl，两条路径都只走关键词规则，对比没有意义。")
+        return
+
+    records = []
+    page = 1
+    while len(records) < args.rows:
+        for keyword in KEYWORDS:
+            records.extend((item["title"], item["tags"], "其他") for item in fake_items(keyword, page, 20))
+        page += 1
+    records = records[:args.rows]
+    jieba.initialize()
+
+    start = time.perf_counter()
+    expected = [legacy_classify(*r) for r in records]
+    legacy_cost = time.perf_counter() - start
+    print(f"{'path':>12} {'seconds':>9} {'rows/s':>9} {'speedup':>8} {'agree':>7}")
+    print(f"{'per-item':>12} {legacy_cost:>9.3f} {len(records) / legacy_cost:>9.0f} {1:>8.1f} {'-':>7}")
+
+    service = get_classify_service()
+    for size in args.batch + ["memo"]:
+        if size == "memo":
+            size, name = args.batch[-1], "memo warm"    # 不清空：全部命中上一组留下的记忆
+        else:
+            name = f"batch={size}"
+            service.clear()
+        start = time.perf_counter()
+        labels = []
+        for offset in range(0, len(records), size):
+            labels.extend(classify_many(records[offset:offset + size]))
+        cost = time.perf_counter() - start
+        agree = sum(a == b for a, b in zip(labels, expected)) / len(records)
+        print(f"{name:>12} {cost:>9.3f} {len(records) / cost:>9.0f} {legacy_cost / cost:>8.1f} {agree:>7.1%}")
+    print("分类服务统计:", service.snapshot())
+
+
+if __name__ == "__main__":
+    main()
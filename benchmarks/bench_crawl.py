@@ -0,0 +1,63 @@
+"""抓取吞吐基准：对本地桩服务分别以不同并发度跑 crawl()，比较耗时与页/秒（不写库、不访问外网）。
+
+    python benchmarks/bench_crawl.py [--keywords 10] [--pages 5] [--latency 0.2] [--rate 20] [--concurrency 1 4 8]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# 分词缓存与共享令牌桶所在的状态库在模块导入时确定路径，必须先于导入 spider 指向临时目录，
+# 避免污染真实的 token_cache.db / spider_state.db，也保证每次都是冷缓存
+_TMP_DIR = tempfile.mkdtemp(prefix="bench_crawl_")
+os.environ["BILI_SPIDER_DB"] = os.path.join(_TMP_DIR, "state.db")
+os.environ["BILI_TOKEN_CACHE"] = os.path.join(_TMP_DIR, "tokens.db")
+
+from spider import bilibili_api  # noqa: E402
+from spider.stub_server import start_stub_server  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--keywords", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.2, help="桩服务每个请求的模拟延迟（秒）")
+    parser.add_argument("--rate", type=float, default=20, help="令牌桶速率（请求/秒）")
+    parser.add_argument("--burst", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    server, url = start_stub_server(pages=args.pages, latency=args.latency)
+    bilibili_api.SEARCH_URL = url
+    bilibili_api.RATE_LIMIT = max(bilibili_api.RATE_LIMIT, args.rate)     # 共享上限放宽到基准要测的速率
+    bilibili_api.RATE_BURST = max(bilibili_api.RATE_BURST, args.burst)
+    tasks = [{"q": f"基准关键词{i}", "phase": "基准", "subject": "高等数学"} for i in range(args.keywords)]
+    # 桩服务只有 pages 页数据，多请求一页用于触发“无更多数据”的停止翻页分支
+    max_pages = min(args.pages + 1, bilibili_api.MAX_PAGES)
+
+    print(f"{'concurrency':>11} {'seconds':>9} {'pages/s':>9} {'rows':>7}")
+    try:
+        for concurrency in args.concurrency:
+            pages = []
+            start = time.perf_counter()
+            rows = bilibili_api.crawl(
+                {
+                    "tasks": tasks, "max_pages": max_pages, "save_to_db": False,
+                    "concurrency": concurrency, "rate": args.rate, "burst": args.burst,
+                },
+                progress_cb=lambda done, total, line=None: pages.append(done),
+            )
+            cost = time.perf_counter() - start
+            done = max(pages or [0])
+            print(f"{concurrency:>11} {cost:>9.2f} {done / cost:>9.1f} {len(rows):>7}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
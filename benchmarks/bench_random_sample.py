@@ -0,0 +1,116 @@
+"""随机推荐基准：ORDER BY RAND() LIMIT 8 与随机键 seek 抽样在不同表规模下的延迟对比。
+
+在配置的 MySQL 库中建一张临时表 bench_random_videos，逐级灌入合成数据后计时，结束时删除：
+    python benchmarks/bench_random_sample.py [--sizes 1000 10000 100000 1000000] [--rounds 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import pymysql  # noqa: E402
+
+from spider.bilibili_api import DB_CONFIG  # noqa: E402
+
+TABLE = "bench_random_videos"
+SUBJECTS = ["高等数学", "线性代数", "概率论与数理统计", "考研数学", "习题精讲"]
+LIMIT = 8
+SEEKS = LIMIT * 2
+INSERT_BATCH = 5000
+
+
+def fill_to(cursor, connection, current, target):
+    """把临时表补到 target 行（标题占位，让行宽接近真实 videos 表）。"""
+    while current < target:
+        n = min(INSERT_BATCH, target - current)
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (bvid, title, subject, rand_key) VALUES (%s, %s, %s, %s)",
+            [(f"BV{current + i:010d}", "合成标题" * 10, random.choice(SUBJECTS), random.random()) for i in range(n)],
+        )
+        connection.commit()
+        current += n
+    return current
+
+
+def order_by_rand(cursor, subject):
+    if subject:
+        cursor.execute(f"SELECT * FROM {TABLE} WHERE subject = %s ORDER BY RAND() LIMIT {LIMIT}", (subject,))
+    else:
+        cursor.execute(f"SELECT * FROM {TABLE} ORDER BY RAND() LIMIT {LIMIT}")
+    return cursor.fetchall()
+
+
+def seek_sample(cursor, subject):
+    """与 app.sample_videos 相同的 SQL 形态：多个随机点各 seek 一条，UNION ALL 后按主键取详情。"""
+    where = "subject = %s AND " if subject else ""
+    parts, args = [], []
+    for _ in range(SEEKS):
+        parts.append(
+            f"SELECT bvid FROM (SELECT bvid FROM {TABLE} WHERE {where}rand_key >= %s ORDER BY rand_key LIMIT 1) AS s"
+        )
+        args += ([subject] if subject else []) + [random.random()]
+    cursor.execute(" UNION ALL ".join(parts), args)
+    bvids = list(dict.fromkeys(row["bvid"] for row in cursor.fetchall()))[:LIMIT]
+    if not bvids:
+        return []
+    cursor.execute(f"SELECT * FROM {TABLE} WHERE bvid IN ({', '.join(['%s'] * len(bvids))})", bvids)
+    return cursor.fetchall()
+
+
+def timed(fn, cursor, subject, rounds):
+    costs = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(cursor, subject)
+        costs.append((time.perf_counter() - start) * 1000)
+    return statistics.median(costs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            cursor.execute(
+                f"""
+                CREATE TABLE {TABLE} (
+                    bvid varchar(20) NOT NULL PRIMARY KEY,
+                    title varchar(255),
+                    subject varchar(50),
+                    rand_key double,
+                    KEY ix_rand_key (rand_key),
+                    KEY ix_subject_rand_key (subject, rand_key)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+                """
+            )
+            print(f"{'行数':>10}{'RAND()全表':>14}{'seek全表':>12}{'RAND()科目':>14}{'seek科目':>12}   (ms, 中位数)")
+            rows = 0
+            for size in sorted(args.sizes):
+                rows = fill_to(cursor, connection, rows, size)
+                subject = random.choice(SUBJECTS)
+                print(
+                    f"{rows:>10}"
+                    f"{timed(order_by_rand, cursor, None, args.rounds):>14.2f}"
+                    f"{timed(seek_sample, cursor, None, args.rounds):>12.2f}"
+                    f"{timed(order_by_rand, cursor, subject, args.rounds):>14.2f}"
+                    f"{timed(seek_sample, cursor, subject, args.rounds):>12.2f}"
+                )
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        connection.commit()
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
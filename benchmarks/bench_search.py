@@ -0,0 +1,74 @@
+"""关键词搜索基准：对比倒排索引路径与旧版三列 LIKE '%kw%' 全表扫描路径。
+
+用法（需要可连接的数据库，且已执行过 flask --app app rebuild-search-index）：
+    python benchmarks/bench_search.py [--rounds 20] [关键词 ...]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from sqlalchemy import or_  # noqa: E402
+
+from app import app, rank_search_hits, refresh_search_index, search_index  # noqa: E402
+from models import Video  # noqa: E402
+from spider.bilibili_api import CRAWL_CONFIG  # noqa: E402
+
+
+def like_search(keyword):
+    """旧路径：三列 LIKE + 干货度排序，取第一页并统计总数（与 db.paginate 的两条 SQL 对应）。"""
+    query = Video.query.filter(or_(
+        Video.title.like(f'%{keyword}%'),
+        Video.tags.like(f'%{keyword}%'),
+        Video.up_name.like(f'%{keyword}%')
+    ))
+    total = query.count()
+    page = query.order_by(Video.dry_goods_ratio.desc()).limit(12).all()
+    return total, [v.bvid for v in page]
+
+
+def index_search(keyword):
+    """新路径：倒排表求交 + BM25（综合排序），取第一页。"""
+    scores = search_index.search(keyword)
+    if scores is None:
+        return None, []
+    ranked = rank_search_hits(scores, 'all', 'dry_goods') if scores else []
+    return len(ranked), ranked[:12]
+
+
+def timed(fn, keyword, rounds):
+    costs = []
+    result = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn(keyword)
+        costs.append((time.perf_counter() - start) * 1000)
+    return statistics.median(costs), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("keywords", nargs="*")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    keywords = args.keywords or [c["q"] for c in CRAWL_CONFIG]
+
+    with app.app_context():
+        start = time.perf_counter()
+        refresh_search_index()
+        print(f"索引文档数: {len(search_index)}，加载耗时 {(time.perf_counter() - start) * 1000:.1f} ms\n")
+        print(f"{'关键词':<20}{'LIKE(ms)':>10}{'索引(ms)':>10}{'LIKE命中':>10}{'索引命中':>10}")
+        for keyword in keywords:
+            like_ms, (like_total, _) = timed(like_search, keyword, args.rounds)
+            index_ms, (index_total, _) = timed(index_search, keyword, args.rounds)
+            index_label = "回退" if index_total is None else index_total
+            print(f"{keyword:<20}{like_ms:>10.2f}{index_ms:>10.2f}{like_total:>10}{index_label:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""抓取全流程基准：对本地回放/桩服务依次跑 串行全量、并发全量、增量 三种模式，报告 页/秒、行/秒、分类耗时、写库耗时。
+
+完全离线：搜索接口由 spider/stub_server.py 提供（--fixtures 指定录制目录时回放真实响应，否则生成假数据），
+可注入延迟、HTTP 503 错误（先经过 build_session 的重试退避，计入耗时）与 code=-412 限流；增量状态写在临时 SQLite。默认不写库，--db 指向本机 MySQL 时才统计写库耗时。
+
+    python spider/bilibili_api.py --record fixtures/search         # 先录制一次真实响应（需联网，可选）
+    python benchmarks/bench_spider.py [--fixtures fixtures/search] [--keywords 10] [--pages 5] [--latency 0.1]
+        [--jitter 0.05] [--error-rate 0.02] [--throttle-rate 0.01] [--concurrency 4] [--db root:123456@127.0.0.1/bilibili_math_db]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# 增量状态库在模块导入时确定路径，必须先于导入 spider 指向临时目录，避免污染真实的 spider_state.db
+_TMP_DIR = tempfile.mkdtemp(prefix="bench_spider_")
+os.environ["BILI_SPIDER_DB"] = os.path.join(_TMP_DIR, "state.db")
+os.environ["BILI_TOKEN_CACHE"] = os.path.join(_TMP_DIR, "tokens.db")   # 第一个模式冷缓存，之后的模式命中分词缓存
+os.environ.pop("BILI_RECORD_DIR", None)
+
+from spider import bilibili_api  # noqa: E402
+from spider.crawl_state import CrawlStateStore, KeywordTracker  # noqa: E402
+from spider.fixtures import load_fixtures  # noqa: E402
+from spider.stub_server import fake_items, start_stub_server  # noqa: E402
+
+
+def parse_db(url):
+    """user:password@host[:port]/database -> pymysql.connect 参数。"""
+    credentials, _, location = url.rpartition("@")
+    user, _, password = credentials.partition(":")
+    address, _, database = location.partition("/")
+    host, _, port = address.partition(":")
+    return {**bilibili_api.DB_CONFIG, "host": host, "port": int(port or 3306), "user": user or "root",
+            "password": password, "database": database or bilibili_api.DB_CONFIG["database"]}
+
+
+def seed_state(tasks, max_pages, fixtures, pages, per_page):
+    """不写库时增量状态不会推进：按服务端数据直接生成“上次全量抓取”的状态，让增量模式有基线可比。"""
+    store = CrawlStateStore()
+    for config in tasks:
+        tracker = KeywordTracker(store, config["q"], incremental=False)
+        for page in range(1, max_pages + 1):
+            if fixtures is not None:
+                response = fixtures.get((config["q"], page)) or {}
+                items = (response.get("data") or {}).get("result") or []
+            else:
+                items = fake_items(config["q"], page, per_page) if page <= pages else []
+            if not items:
+                break
+            tracker.filter(page, items)
+        tracker.commit(True)
+
+
+def run_mode(name, params, save_to_db):
+    stats = {}
+    bilibili_api.crawl({**params, "save_to_db": save_to_db}, stats=stats)
+    seconds = stats.get("seconds") or 1e-9
+    rows = stats.get("rows", 0)
+    write = f"{stats['write_seconds']:.2f}" if "write_seconds" in stats else "-"
+    print(
+        f"{name:<16} {stats.get('pages', 0):>6} {rows:>7} {seconds:>8.2f} {stats.get('pages', 0) / seconds:>8.1f} "
+        f"{rows / seconds:>8.0f} {stats.get('classify_seconds', 0):>9.2f} {write:>8} "
+        f"{stats.get('errors', 0):>6} {stats.get('throttled', 0):>9}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="录制目录（spider/bilibili_api.py --record 生成）；不指定则用桩服务假数据")
+    parser.add_argument("--keywords", type=int, default=10, help="假数据模式下的关键词数")
+    parser.add_argument("--pages", type=int, default=5, help="每个关键词的最大页数")
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.1, help="每个请求的模拟延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rate", type=float, default=50, help="令牌桶速率（请求/秒）")
+    parser.add_argument("--burst", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=4, help="并发模式的线程数")
+    parser.add_argument("--backoff", type=float, default=0.2, help="单页异常后的退避（秒），默认远小于线上的 5 秒")
+    parser.add_argument("--db", help="本机 MySQL，格式 user:password@host[:port]/database；不指定则不写库")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else None
+    if fixtures is not None:
+        keywords = sorted({keyword for keyword, _ in fixtures})
+        max_pages = min(max(page for _, page in fixtures) + 1, bilibili_api.MAX_PAGES)
+    else:
+        keywords = [f"基准关键词{i}" for i in range(args.keywords)]
+        # 桩服务只有 pages 页数据，多请求一页用于触发“无更多数据”的停止翻页分支
+        max_pages = min(args.pages + 1, bilibili_api.MAX_PAGES)
+    tasks = [{"q": keyword, "phase": "基准", "subject": "高等数学"} for keyword in keywords]
+
+    server, url = start_stub_server(
+        pages=args.pages, per_page=args.per_page, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate, fixtures=fixtures, seed=args.seed,
+    )
+    bilibili_api.SEARCH_URL = url
+    bilibili_api.RATE_LIMIT = max(bilibili_api.RATE_LIMIT, args.rate)     # 共享上限放宽到基准要测的速率
+    bilibili_api.RATE_BURST = max(bilibili_api.RATE_BURST, args.burst)
+    bilibili_api.ERROR_BACKOFF = args.backoff
+    if args.db:
+        bilibili_api.DB_CONFIG = parse_db(args.db)
+    bilibili_api.classify_many([("预热", "", "高等数学")])    # 模型与 jieba 词典的加载不计入第一个模式
+
+    params = {"tasks": tasks, "max_pages": max_pages, "rate": args.rate, "burst": args.burst}
+    source = f"回放 {len(fixtures)} 个录制页" if fixtures is not None else "桩服务假数据"
+    print(f"{len(tasks)} 个关键词 x 最多 {max_pages} 页，{source}，延迟 {args.latency}s(+{args.jitter}s)，"
+          f"错误率 {args.error_rate:.0%}，限流率 {args.throttle_rate:.0%}，{'写库' if args.db else '不写库'}")
+    print(f"{'mode':<16} {'pages':>6} {'rows':>7} {'seconds':>8} {'pages/s':>8} {'rows/s':>8} "
+          f"{'classify':>9} {'write':>8} {'errors':>6} {'throttled':>9}")
+    try:
+        run_mode("full-sequential", {**params, "concurrency": 1}, bool(args.db))
+        run_mode(f"full-x{args.concurrency}", {**params, "concurrency": args.concurrency}, bool(args.db))
+        if not args.db:
+            seed_state(tasks, max_pages, fixtures, args.pages, args.per_page)
+        # 写库时上一轮全量已推进状态；假数据计数不变，增量模式应在第 1 页即停止翻页
+        run_mode("incremental", {**params, "concurrency": args.concurrency, "mode": "incremental"}, bool(args.db))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""启动基准：每次在全新子进程中测量 导入耗时、首个搜索分词请求（jieba 词典）、首个分类请求（模型），对比冷启动与先 warm_up() 预热两种方式。
+
+分词缓存、爬虫状态库（任务表、增量状态）与结果目录每次指向新的临时目录，既不命中上次运行的缓存，也不改动真实的
+spider_state.db；导入 app 时连不上 MySQL 只会打印告警，不影响计时：
+    python benchmarks/bench_startup.py [--module app spider.bilibili_api] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = """
+import json, sys, time, warnings
+warnings.simplefilter("ignore")
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+result = {{"import": time.perf_counter() - start}}
+from spider.classifier import classify_many
+from spider.model_loader import warm_up
+from spider.search_index import tokenize_query
+if {warm}:
+    start = time.perf_counter()
+    warm_up()
+    result["warm_up"] = time.perf_counter() - start
+start = time.perf_counter()
+tokenize_query("泰勒公式 讲解")
+result["query"] = time.perf_counter() - start
+start = time.perf_counter()
+classify_many([("张宇带你刷线代矩阵的本质", "线性代数 考研", "高等数学")])
+result["classify"] = time.perf_counter() - start
+print("RESULT " + json.dumps(result))
+"""
+
+
+def run_once(module, warm):
+    tmp_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    env = {
+        **os.environ,
+        "BILI_TOKEN_CACHE": os.path.join(tmp_dir, "tokens.db"),
+        "BILI_SPIDER_DB": os.path.join(tmp_dir, "state.db"),
+        "BILI_SPOOL_DIR": os.path.join(tmp_dir, "spider_results"),
+    }
+    env.pop("BILI_WARM_UP", None)
+    output = subprocess.run(
+        [sys.executable, "-c", SNIPPET.format(root=ROOT_DIR, module=module, warm=warm)],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    line = next(line for line in output.splitlines() if line.startswith("RESULT "))
+    return json.loads(line[len("RESULT "):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", nargs="+", default=["app", "spider.bilibili_api"])
+    parser.add_argument("--repeat", type=int, default=3, help="每种方式重复的进程数，取中位数")
+    args = parser.parse_args()
+
+    print(f"{'module':<22} {'mode':<6} {'import':>8} {'warm_up':>8} {'query':>8} {'classify':>9} {'total':>8}")
+    for module in args.module:
+        for warm in (False, True):
+            runs = [run_once(module, warm) for _ in range(args.repeat)]
+            cost = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+            print(f"{module:<22} {'warm' if warm else 'cold':<6} {cost['import']:>8.3f} "
+                  f"{cost.get('warm_up', 0):>8.3f} {cost['query']:>8.3f} {cost['classify']:>9.3f} {sum(cost.values()):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""分词基准：旧的逐行 clean_text 与分词缓存 cut_many（冷缓存单进程 / 冷缓存进程池 / 热缓存 / 只有少量新行）对比。
+
+用桩服务同款的确定性假标题，不需要数据库；缓存写在临时目录：
+    python benchmarks/bench_tokenize.py [--rows 50000] [--workers 4] [--new 0.02]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import jieba  # noqa: E402
+
+from spider.stub_server import fake_items  # noqa: E402
+from spider.token_cache import TOKENIZE_WORKERS, TokenCache  # noqa: E402
+
+KEYWORDS = ["宋浩 高数", "线性代数 同步", "概率论期末速成", "考研数学 真题", "泰勒公式 讲解", "3Blue1Brown 中文"]
+
+
+def make_texts(rows, offset=0):
+    texts = []
+    page = 1 + offset
+    while len(texts) < rows:
+        for keyword in KEYWORDS:
+            texts.extend(f"{item['title']} {item['tags']}" for item in fake_items(keyword, page, 20))
+        page += 1
+    return texts[:rows]
+
+
+def timed(name, rows, baseline, fn):
+    start = time.perf_counter()
+    fn()
+    cost = time.perf_counter() - start
+    print(f"{name:<28} {cost:>9.2f} {rows / cost:>10.0f} {baseline / cost if baseline else 1:>8.1f}")
+    return cost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--workers", type=int, default=TOKENIZE_WORKERS)
+    parser.add_argument("--new", type=float, default=0.02, help="重训场景中新增行的比例")
+    args = parser.parse_args()
+
+    texts = make_texts(args.rows)
+    jieba.initialize()
+    tmp_dir = tempfile.mkdtemp(prefix="bench_tokenize_")
+    print(f"{args.rows} 行，{len(set(texts))} 个不同文本，进程池 {args.workers} 个 worker")
+    print(f"{'path':<28} {'seconds':>9} {'rows/s':>10} {'speedup':>8}")
+
+    baseline = timed("apply(clean_text)", args.rows, None,
+                     lambda: [" ".join(w for w in jieba.cut(t) if len(w) > 1) for t in texts])
+    timed("cut_many cold, 1 process", args.rows, baseline,
+          lambda: TokenCache(os.path.join(tmp_dir, "single.db")).cut_many(texts))
+    pooled = TokenCache(os.path.join(tmp_dir, "pooled.db"))
+    timed(f"cut_many cold, {args.workers} processes", args.rows, baseline,
+          lambda: pooled.cut_many(texts, workers=args.workers))
+    timed("cut_many warm", args.rows, baseline, lambda: pooled.cut_many(texts, workers=args.workers))
+
+    new_rows = int(args.rows * args.new)
+    retrain = texts[new_rows:] + make_texts(new_rows, offset=args.rows)
+    timed(f"retrain, {args.new:.0%} new rows", args.rows, baseline, lambda: pooled.cut_many(retrain, workers=args.workers))
+    print("缓存统计:", pooled.snapshot())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""观看历史的写后缓冲：点击只入内存队列，后台线程按条数/时间批量 upsert，进程退出前刷盘。"""
+
+import atexit
+import itertools
+import os
+import threading
+import time
+from datetime import datetime
+
+FLUSH_SIZE = 500        # 队列达到该条数立即触发刷盘
+FLUSH_INTERVAL = 2.0    # 最长刷盘间隔（秒）
+MAX_PENDING = 50_000    # 队列上限：数据库长时间不可用时丢弃最旧的记录，内存不随故障时长增长
+
+
+class HistoryBuffer:
+    """
+    以 (user_id, bvid) 为键合并同一用户对同一视频的重复点击，只保留最新时间；
+    writer(rows) 负责把 [(user_id, bvid, create_time)] 一次性写库，失败时本批回到队列等待重试。
+    队列超过 max_pending 时丢弃最旧的记录（观看历史允许少量丢失），丢弃条数计入 stats['dropped']。
+    """
+
+    def __init__(self, writer, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        self.writer = writer
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max(max_pending, flush_size)
+        self._pending: dict[tuple[int, str], datetime] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()     # 保证同一时刻只有一个刷盘在执行
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None        # 启动刷盘线程的进程；fork 出的子进程与之不同，需在子进程里重新启动
+        self._start_lock = threading.Lock()
+        self.stats = {
+            'flushes': 0,
+            'rows_written': 0,
+            'failures': 0,
+            'dropped': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'last_flush_at': None,
+            'last_error': '',
+        }
+
+    def start(self):
+        """
+        在当前进程启动后台刷盘线程（已启动则忽略），并注册进程退出时的最终刷盘；add() 首次调用时自动执行。
+        预分叉部署中 fork 出的 worker 继承不到父进程的线程，检测到 pid 变化时重建队列与锁，在 worker 里重新启动。
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._start_lock:
+            if self._pid == pid:
+                return
+            first = self._pid is None and self._thread is None
+            if not first:
+                self._pending = {}
+                self._lock = threading.Lock()
+                self._flush_lock = threading.Lock()
+                self._wakeup = threading.Event()
+                self._stopped = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="history-buffer", daemon=True)
+            self._thread.start()
+            self._pid = pid
+        if first:   # atexit 注册随 fork 继承，只注册一次
+            atexit.register(self.close)
+
+    def add(self, user_id: int, bvid: str, when: datetime | None = None):
+        self.start()
+        when = when or datetime.now()
+        with self._lock:
+            key = (user_id, bvid)
+            if key not in self._pending or self._pending[key] < when:
+                self._pending[key] = when
+            self._trim()
+            depth = len(self._pending)
+        if depth >= self.flush_size:
+            self._wakeup.set()
+
+    def has_pending(self, user_id: int) -> bool:
+        with self._lock:
+            return any(uid == user_id for uid, _ in self._pending)
+
+    def depth(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """同步刷盘，返回写入条数；写库失败时把本批并回队列（保留更新的时间）。"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            start = time.perf_counter()
+            try:
+                self.writer([(uid, bvid, when) for (uid, bvid), when in batch.items()])
+            except Exception as exc:
+                with self._lock:
+                    # 失败的批次排在刷盘期间新进的记录之前，超出上限时先丢它们
+                    for key, when in self._pending.items():
+                        if key not in batch or batch[key] < when:
+                            batch[key] = when
+                    self._pending = batch
+                    self._trim()
+                self.stats['failures'] += 1
+                self.stats['last_error'] = str(exc)
+                return 0
+            cost_ms = (time.perf_counter() - start) * 1000
+            self.stats['flushes'] += 1
+            self.stats['rows_written'] += len(batch)
+            self.stats['last_flush_ms'] = round(cost_ms, 2)
+            self.stats['max_flush_ms'] = round(max(self.stats['max_flush_ms'], cost_ms), 2)
+            self.stats['last_flush_at'] = datetime.now().isoformat(timespec='seconds')
+            return len(batch)
+
+    def _trim(self):
+        """调用方持有 _lock：超过 max_pending 时按插入顺序丢弃最旧的记录。"""
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            for key in list(itertools.islice(self._pending, overflow)):
+                del self._pending[key]
+            self.stats['dropped'] += overflow
+
+    def snapshot(self) -> dict:
+        """监控用：队列深度、上限 + 刷盘统计（含因超出上限丢弃的条数）。"""
+        return {'queue_depth': self.depth(), 'max_pending': self.max_pending, **self.stats}
+
+    def close(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
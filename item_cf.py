@@ -0,0 +1,172 @@
+"""物品协同过滤：离线按 user_actions 共现构建 item-item 相似度（Top-N 剪枝，npz 存储），在线合并近邻列表做推荐。"""
+
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pymysql
+import scipy.sparse as sp
+
+from recommender import ACTION_WEIGHTS, RECENCY_HALF_LIFE_DAYS
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+ITEM_CF_PATH = os.path.join(ROOT_DIR, "item_cf.npz")     # 与工作目录无关，Web 进程与构建命令读写同一个文件
+NEIGHBORS_PER_ITEM = 50     # 每个视频只保留最相似的 N 个邻居
+FETCH_CHUNK = 50000         # 流式读取 user_actions 的批大小
+BLOCK_SIZE = 2000           # 分块计算相似度，限制中间矩阵的内存
+RELOAD_INTERVAL = 60        # 在线侧检查 npz 是否更新的间隔（秒）
+
+_TYPE_CODES = {action: code for code, action in enumerate(ACTION_WEIGHTS)}
+_TYPE_WEIGHTS = np.array(list(ACTION_WEIGHTS.values()), dtype=np.float32)
+
+
+def _load_interactions(connection, now):
+    """
+    用服务端游标流式读取行为表，每批直接转成 numpy 数组（用户序号、视频序号、权重），
+    不在 Python 里保留逐行对象；同一用户对同一视频的多种行为权重相加。
+    """
+    user_codes: dict[int, int] = {}
+    item_codes: dict[str, int] = {}
+    users, items, weights = [], [], []
+    with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute("SELECT user_id, bvid, action_type, create_time FROM user_actions")
+        while True:
+            chunk = cursor.fetchmany(FETCH_CHUNK)
+            if not chunk:
+                break
+            u = np.fromiter((user_codes.setdefault(r[0], len(user_codes)) for r in chunk), np.int32, len(chunk))
+            i = np.fromiter((item_codes.setdefault(r[1], len(item_codes)) for r in chunk), np.int32, len(chunk))
+            t = np.fromiter((_TYPE_CODES.get(r[2], -1) for r in chunk), np.int32, len(chunk))
+            age = np.fromiter(
+                ((now - r[3]).total_seconds() / 86400 if r[3] else 0.0 for r in chunk), np.float32, len(chunk)
+            )
+            valid = t >= 0
+            w = _TYPE_WEIGHTS[t[valid]] * np.power(0.5, np.maximum(age[valid], 0) / RECENCY_HALF_LIFE_DAYS)
+            users.append(u[valid])
+            items.append(i[valid])
+            weights.append(w.astype(np.float32))
+
+    bvids = np.array(sorted(item_codes, key=item_codes.get), dtype="<U20")
+    if not users:
+        return sp.csr_matrix((0, 0), dtype=np.float32), bvids
+    ratings = sp.coo_matrix(
+        (np.concatenate(weights), (np.concatenate(users), np.concatenate(items))),
+        shape=(len(user_codes), len(item_codes)),
+        dtype=np.float32,
+    ).tocsc()   # COO 转换时重复坐标会被求和
+    return ratings, bvids
+
+
+def _prune_rows(block, keep):
+    """每行只保留分数最高的 keep 个非零项。"""
+    block = block.tocsr()
+    indptr, indices, data = [0], [], []
+    for row in range(block.shape[0]):
+        start, end = block.indptr[row], block.indptr[row + 1]
+        cols, vals = block.indices[start:end], block.data[start:end]
+        if len(vals) > keep:
+            top = np.argpartition(-vals, keep - 1)[:keep]
+            cols, vals = cols[top], vals[top]
+        indices.append(cols)
+        data.append(vals)
+        indptr.append(indptr[-1] + len(vals))
+    return indptr, indices, data
+
+
+def build_item_similarity(connection, path=ITEM_CF_PATH, now=None):
+    """
+    离线构建入口（flask build-item-cf）：相似度 = 加权共现的余弦，
+    按视频分块计算 R[:, block]^T · R，逐块剪枝到 Top-N，峰值内存只与块大小相关。
+    返回 (视频数, 保留的邻居对数)。
+    """
+    now = now or datetime.now()
+    ratings, bvids = _load_interactions(connection, now)
+    n_items = len(bvids)
+    norms = np.sqrt(np.asarray(ratings.multiply(ratings).sum(axis=0)).ravel()) if n_items else np.zeros(0)
+    norms[norms == 0] = 1.0
+    ratings_t = ratings.T.tocsr()
+    ratings = ratings.tocsr()
+
+    indptr, indices, data = [0], [], []
+    for start in range(0, n_items, BLOCK_SIZE):
+        stop = min(start + BLOCK_SIZE, n_items)
+        block = (ratings_t[start:stop] @ ratings).tocoo()
+        keep = block.row + start != block.col  # 去掉自身
+        sims = block.data[keep] / (norms[block.row[keep] + start] * norms[block.col[keep]])
+        block = sp.csr_matrix(
+            (sims.astype(np.float32), (block.row[keep], block.col[keep])), shape=(stop - start, n_items)
+        )
+        b_indptr, b_indices, b_data = _prune_rows(block, NEIGHBORS_PER_ITEM)
+        offset = indptr[-1]
+        indptr.extend(offset + p for p in b_indptr[1:])
+        indices.extend(b_indices)
+        data.extend(b_data)
+
+    similarity = sp.csr_matrix(
+        (
+            np.concatenate(data).astype(np.float32) if data else np.zeros(0, np.float32),
+            np.concatenate(indices).astype(np.int32) if indices else np.zeros(0, np.int32),
+            np.asarray(indptr, dtype=np.int64),
+        ),
+        shape=(n_items, n_items),
+    )
+    tmp_path = path + ".tmp.npz"
+    np.savez_compressed(
+        tmp_path, data=similarity.data, indices=similarity.indices, indptr=similarity.indptr,
+        bvids=bvids, built_at=np.array(now.isoformat()),
+    )
+    os.replace(tmp_path, path)
+    return n_items, similarity.nnz
+
+
+class ItemCF:
+    """在线侧：懒加载 npz，把用户近期视频的邻居列表按行为权重加权合并。"""
+
+    def __init__(self, path=ITEM_CF_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._similarity = None
+        self._bvids = None
+        self._row_of: dict[str, int] = {}
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def _maybe_reload(self):
+        if time.time() - self._checked_at < RELOAD_INTERVAL and self._similarity is not None:
+            return
+        self._checked_at = time.time()
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        with np.load(self.path) as npz:
+            bvids = npz["bvids"]
+            similarity = sp.csr_matrix((npz["data"], npz["indices"], npz["indptr"]), shape=(len(bvids), len(bvids)))
+        with self._lock:
+            self._similarity = similarity
+            self._bvids = bvids
+            self._row_of = {str(b): i for i, b in enumerate(bvids)}
+            self._mtime = mtime
+
+    def recommend(self, weighted_bvids, exclude, k):
+        """weighted_bvids: [(bvid, 权重)]；返回按合并分数降序的 bvid 列表，模型缺失或无邻居时返回 []。"""
+        self._maybe_reload()
+        with self._lock:
+            similarity, bvids, row_of = self._similarity, self._bvids, self._row_of
+        if similarity is None:
+            return []
+        scores: dict[int, float] = {}
+        for bvid, weight in weighted_bvids:
+            row = row_of.get(bvid)
+            if row is None or weight <= 0:
+                continue
+            start, end = similarity.indptr[row], similarity.indptr[row + 1]
+            for col, sim in zip(similarity.indices[start:end], similarity.data[start:end]):
+                scores[col] = scores.get(col, 0.0) + weight * float(sim)
+        excluded_rows = {row_of[b] for b in exclude if b in row_of}
+        ranked = sorted((c for c in scores if c not in excluded_rows), key=scores.get, reverse=True)
+        return [str(bvids[c]) for c in ranked[:k]]
@@ -21,7 +21,7 @@ class Video(db.Model):
     pic_url = db.Column(db.String(500))     # 封面图
 
     # 播放互动数据
-    view_count = db.Column(db.Integer)
+    view_count = db.Column(db.Integer, index=True)     # 索引供排序与游标分页 seek 使用
     danmaku_count = db.Column(db.Integer)
     reply_count = db.Column(db.Integer)
     favorite_count = db.Column(db.Integer)
@@ -34,7 +34,12 @@ class Video(db.Model):
     phase = db.Column(db.String(50), index=True)        # 一级分类：阶段（如：校内同步、升学备考）
     subject = db.Column(db.String(50), index=True)      # 二级分类：科目/主题（如：高等数学、线性代数）
 
-    dry_goods_ratio = db.Column(db.Float)   # 干货度指标：收藏/播放*1000 的估算值
+    dry_goods_ratio = db.Column(db.Double, index=True)   # 干货度指标：收藏/播放*1000 的估算值（DOUBLE：游标按原值精确比较）
+    rand_key = db.Column(db.Double, index=True)         # 入库时生成的 [0,1) 随机键，随机推荐按它做索引 seek
+
+    __table_args__ = (
+        db.Index('ix_videos_subject_rand_key', 'subject', 'rand_key'),
+    )
 
 
 class User(UserMixin, db.Model):
@@ -61,4 +66,117 @@ class UserAction(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint('user_id', 'bvid', 'action_type', name='uq_user_action'),
+        # 个人中心/推荐按用户 + 类型取最近行为，复合索引直接按时间顺序返回
+        db.Index('ix_user_actions_user_type_time', 'user_id', 'action_type', 'create_time'),
+    )
+
+
+class StatsSnapshot(db.Model):
+    """仪表盘统计快照：爬虫落库时增量维护，/api/stats 只读这一行。"""
+
+    __tablename__ = 'stats_snapshot'
+    name = db.Column(db.String(50), primary_key=True)   # 快照名，目前只有 dashboard
+    total_videos = db.Column(db.Integer, default=0)
+    total_teachers = db.Column(db.Integer, default=0)
+    total_views = db.Column(db.BigInteger, default=0)
+    ratio_sum = db.Column(db.Float, default=0)          # 干货度求和/计数，用于增量维护平均值
+    ratio_count = db.Column(db.Integer, default=0)
+    payload = db.Column(db.Text(16777215))              # JSON：分类分布、干货度榜单、散点图候选
+    updated_at = db.Column(db.DateTime)
+
+
+class SearchDoc(db.Model):
+    """关键词倒排索引的文档表：每个视频一行分词结果，应用启动时加载到内存。"""
+
+    __tablename__ = 'search_docs'
+    bvid = db.Column(db.String(20), primary_key=True)
+    terms = db.Column(db.Text)              # 'term:tf term:tf'，词频来自标题/标签/UP 主
+    doc_len = db.Column(db.Integer)         # 文档总词数，BM25 长度归一化用
+    indexed_at = db.Column(db.DateTime, index=True)     # 增量加载水位
+
+
+class UpStats(db.Model):
+    """UP 主指标汇总：爬虫落库时增量累加，UP 对比直接读取，不再对 videos 全表 GROUP BY。"""
+
+    __tablename__ = 'up_stats'
+    up_name = db.Column(db.String(100), primary_key=True)
+    video_count = db.Column(db.Integer, default=0)
+    total_views = db.Column(db.BigInteger, default=0, index=True)
+    total_fav = db.Column(db.BigInteger, default=0)
+    total_reply = db.Column(db.BigInteger, default=0)
+    total_danmaku = db.Column(db.BigInteger, default=0)
+    total_duration = db.Column(db.BigInteger, default=0)    # 秒
+    first_pub = db.Column(db.DateTime)
+
+    # 派生指标：随累加值一起刷新，带索引便于直接取全局最大值做归一化
+    fav_rate = db.Column(db.Float, index=True)          # 收藏率（%）
+    interact_avg = db.Column(db.Float, index=True)      # (弹幕+评论)/视频数/2
+    depth_score = db.Column(db.Float, index=True)       # 收藏/时长(小时)
+    activity = db.Column(db.Float, index=True)          # 每周发片数
+    updated_at = db.Column(db.DateTime)
+
+
+class VideoToken(db.Model):
+    """视频分词结果：入库时分词一次，词云/热门标签等统计都从这里累加。"""
+
+    __tablename__ = 'video_tokens'
+    bvid = db.Column(db.String(20), primary_key=True)
+    words = db.Column(db.Text)              # 'term:tf ...'，已去停用词/单字/数字
+    tags = db.Column(db.String(500))        # 拆分后的标签，空格分隔
+
+
+class UpTerm(db.Model):
+    """UP 主词频表：词云直接按 cnt 取 Top 150。"""
+
+    __tablename__ = 'up_terms'
+    up_name = db.Column(db.String(100), primary_key=True)
+    term = db.Column(db.String(50), primary_key=True)
+    cnt = db.Column(db.Integer, default=0)
+
+    __table_args__ = (
+        db.Index('ix_up_terms_up_cnt', 'up_name', 'cnt'),
+    )
+
+
+class TagCount(db.Model):
+    """全局标签计数：热门标签直接按 cnt 取 Top 15。"""
+
+    __tablename__ = 'tag_counts'
+    tag = db.Column(db.String(50), primary_key=True)
+    cnt = db.Column(db.Integer, default=0, index=True)
+
+
+class VideoMetrics(db.Model):
+    """视频指标历史（只追加）：每块最多 128 个样本，块头存首/末样本绝对值，其余样本为 varint 差值流。"""
+
+    __tablename__ = 'video_metrics'
+    bvid = db.Column(db.String(20), primary_key=True)
+    chunk = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)    # 块序号，从 0 递增
+    samples = db.Column(db.SmallInteger, default=0)
+    base_minute = db.Column(db.Integer)     # 首样本时间（Unix 分钟）
+    base_view = db.Column(db.BigInteger)
+    base_fav = db.Column(db.Integer)
+    base_reply = db.Column(db.Integer)
+    last_minute = db.Column(db.Integer)     # 末样本，追加新样本时据此求差值，无需解码
+    last_view = db.Column(db.BigInteger)
+    last_fav = db.Column(db.Integer)
+    last_reply = db.Column(db.Integer)
+    data = db.Column(db.LargeBinary)        # 第 2 个样本起的 (分钟差, 播放差, 收藏差, 评论差) zigzag varint 流
+
+
+class VideoGrowth(db.Model):
+    """各时间窗口的增长汇总：样本追加时预计算，“上升最快”直接按窗口 + 日均增速索引读取。"""
+
+    __tablename__ = 'video_growth'
+    bvid = db.Column(db.String(20), primary_key=True)
+    window_days = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    view_delta = db.Column(db.BigInteger)
+    favorite_delta = db.Column(db.Integer)
+    reply_delta = db.Column(db.Integer)
+    view_rate = db.Column(db.Float)         # 日均播放增量
+    span_hours = db.Column(db.Float)        # 实际跨度：窗口起点取起点前最近的样本，可能略长于窗口
+    sampled_at = db.Column(db.DateTime)     # 终点样本时间，超过一个窗口未更新的视频不参与排行
+
+    __table_args__ = (
+        db.Index('ix_video_growth_window_rate', 'window_days', 'view_rate'),
     )
@@ -0,0 +1,128 @@
+"""猜你喜欢的内容推荐：复用分类模型里已训练好的 TF-IDF 向量器，对全部视频预计算 L2 归一化稀疏矩阵。"""
+
+import math
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import scipy.sparse as sp
+
+from spider.token_cache import cut_many, video_text
+
+ACTION_WEIGHTS = {'fav': 3.0, 'todo': 2.0, 'history': 1.0}
+RECENCY_HALF_LIFE_DAYS = 30     # 行为权重按时间衰减的半衰期
+REFRESH_INTERVAL = 60           # 增量补充新视频的最小间隔（秒）
+TRANSFORM_BATCH = 2000
+
+
+def join_words(tokens):
+    """分词结果去单字后拼接，供 TF-IDF 向量器输入。"""
+    return " ".join(w for w in tokens if len(w) > 1)
+
+
+def l2_normalize(matrix):
+    """稀疏矩阵按行 L2 归一化（零行保持为零），与 sklearn.preprocessing.normalize 一致，Web 启动时不必导入 sklearn。"""
+    matrix = sp.csr_matrix(matrix, dtype=np.float64)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sp.csr_matrix(sp.diags(1.0 / norms).dot(matrix))
+
+
+def action_weight(action_type, create_time, now=None):
+    """行为权重 = 类型权重 × 时间衰减（半衰期 RECENCY_HALF_LIFE_DAYS 天）。"""
+    base = ACTION_WEIGHTS.get(action_type, 0.0)
+    if not base or create_time is None:
+        return base
+    age_days = max(((now or datetime.now()) - create_time).total_seconds() / 86400, 0)
+    return base * math.pow(0.5, age_days / RECENCY_HALF_LIFE_DAYS)
+
+
+class ContentRecommender:
+    """
+    视频向量矩阵（行 = 视频，已 L2 归一化）常驻内存；用户画像 = 其行为视频向量的加权和，
+    推荐 = 矩阵乘画像向量得到余弦相似度，再 argpartition 取 Top-K。
+    """
+
+    def __init__(self, vectorizer):
+        self.vectorizer = vectorizer
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._bvids: list[str] = []
+        self._row_of: dict[str, int] = {}
+        self.watermark = None       # 已加载视频对应的 search_docs.indexed_at 最大值
+        self.refreshed_at = 0.0
+        self.ready = False
+
+    def __len__(self):
+        return len(self._bvids)
+
+    def due_for_refresh(self):
+        return time.time() - self.refreshed_at >= REFRESH_INTERVAL
+
+    def add_videos(self, rows, watermark=None):
+        """rows: 可迭代的 (bvid, title, tags)；已在矩阵里的视频跳过（标题/标签入库后不再变化）。"""
+        batch_bvids, batch_texts, blocks = [], [], []
+
+        def flush():
+            if batch_bvids:
+                texts = [join_words(tokens) for tokens in cut_many(batch_texts)]
+                blocks.append((list(batch_bvids), l2_normalize(self.vectorizer.transform(texts))))
+                batch_bvids.clear()
+                batch_texts.clear()
+
+        for bvid, title, tags in rows:
+            if bvid in self._row_of:
+                continue
+            batch_bvids.append(bvid)
+            batch_texts.append(video_text(title, tags))    # 与训练时的分词输入一致
+            if len(batch_bvids) >= TRANSFORM_BATCH:
+                flush()
+        flush()
+
+        with self._lock:
+            new_blocks = [m for _, m in blocks]
+            if new_blocks:
+                parts = ([self._matrix] if self._matrix is not None else []) + new_blocks
+                matrix = sp.vstack(parts, format="csr")
+                bvids = list(self._bvids)
+                for block_bvids, _ in blocks:
+                    bvids.extend(block_bvids)
+                self._matrix = matrix
+                self._bvids = bvids
+                self._row_of = {bvid: i for i, bvid in enumerate(bvids)}
+            if watermark is not None and (self.watermark is None or watermark > self.watermark):
+                self.watermark = watermark
+            self.refreshed_at = time.time()
+            self.ready = True
+
+    def recommend(self, weighted_bvids, exclude, k):
+        """
+        weighted_bvids: [(bvid, 权重)]，构造用户画像；exclude: 不返回的 bvid 集合。
+        返回按余弦相似度降序的 bvid 列表，画像为空时返回 []。
+        """
+        with self._lock:
+            matrix, bvids, row_of = self._matrix, self._bvids, self._row_of
+        if matrix is None:
+            return []
+        rows, weights = [], []
+        for bvid, weight in weighted_bvids:
+            row = row_of.get(bvid)
+            if row is not None and weight > 0:
+                rows.append(row)
+                weights.append(weight)
+        if not rows:
+            return []
+
+        profile = sp.csr_matrix(np.asarray(weights)).dot(matrix[rows])
+        profile = l2_normalize(profile)
+        scores = np.asarray(matrix.dot(profile.T).todense()).ravel()
+        for bvid in exclude:
+            row = row_of.get(bvid)
+            if row is not None:
+                scores[row] = -1.0
+
+        candidates = min(k + len(exclude), len(scores))
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = top[np.argsort(-scores[top])]
+        return [bvids[i] for i in top if scores[i] > 0][:k]
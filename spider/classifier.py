@@ -0,0 +1,188 @@
+"""
+科目分类服务：模型预测 + 关键词规则兜底，爬虫、重新分类任务与 /api/classify 共用。
+同一标题会在不同关键词、不同批次里反复出现：进程内按 (模型版本, 规范化后的 标题 + 标签) 做有界 LRU 记忆，
+命中时不再分词和预测。缓存只存模型的判断（置信时的类别，否则 None），兜底规则命中后再套用，与原始科目无关；
+训练脚本发布新模型后版本变化，旧条目整体失效。
+"""
+
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from spider.model_loader import get_classifier_state
+from spider.token_cache import cut_many, video_text
+
+CONFIDENCE_THRESHOLD = 0.6   # 模型最大类别概率超过该值才采用预测结果
+CACHE_SIZE = int(os.environ.get("BILI_CLASSIFY_CACHE_SIZE", 100_000))
+RECLASSIFY_BATCH = 2000
+
+
+def normalize_text(title, tags):
+    """
+    缓存键与模型输入：即分词缓存的规范文本 video_text（去掉搜索高亮、折叠空白），
+    同一视频在不同关键词下命中同一记忆条目，分词结果也与训练、推荐、词云共用。
+    """
+    return video_text(title, tags)
+
+
+def keyword_classify(title, tags, original_subject):
+    """关键词规则：模型缺失或置信度低时使用，仍未命中则返回原始 subject。"""
+    combined = (title + str(tags)).lower()
+    if "线代" in combined or "线性代数" in combined or "矩阵" in combined:
+        return "线性代数"
+    if "高数" in combined or "高等数学" in combined or "微积分" in combined:
+        return "高等数学"
+    if "概率" in combined or "统计" in combined:
+        return "概率论与数理统计"
+
+    return original_subject
+
+
+def _predict(model, texts):
+    """整批分词后只调用一次 predict_proba，类别取概率 argmax；不置信的为 None，模型出错返回 None（不缓存）。"""
+    words = cut_many(texts)
+    try:
+        probs = model.predict_proba([" ".join(w for w in tokens if len(w) > 1) for tokens in words])
+    except Exception:
+        return None
+    best = probs.argmax(axis=1)
+    confident = probs[range(len(texts)), best] > CONFIDENCE_THRESHOLD
+    return [str(model.classes_[b]) if ok else None for b, ok in zip(best, confident)]
+
+
+class ClassifyService:
+    """线程安全；记录命中率与每次调用的耗时，供 /api/metrics 展示。"""
+
+    def __init__(self, max_entries=CACHE_SIZE):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.rows = 0
+        self.hits = 0
+        self.misses = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.predict_seconds = 0.0
+
+    def predict_many(self, texts):
+        """texts 为 normalize_text 的结果，返回对应的模型判断（类别或 None）；同批内重复的文本只预测一次。"""
+        start = time.perf_counter()
+        model, version = get_classifier_state()
+        labels = [None] * len(texts)
+        missing = {}
+        if model is not None:
+            with self._lock:
+                if version != self._version:
+                    self._cache.clear()
+                    self._version = version
+                for i, text in enumerate(texts):
+                    key = (version, text)
+                    if key in self._cache:
+                        self._cache.move_to_end(key)
+                        labels[i] = self._cache[key]
+                    else:
+                        missing.setdefault(text, []).append(i)
+
+        predict_cost = 0.0
+        if missing:
+            pending = list(missing)
+            predict_start = time.perf_counter()
+            predicted = _predict(model, pending)
+            predict_cost = time.perf_counter() - predict_start
+            if predicted is not None:
+                with self._lock:
+                    for text, label in zip(pending, predicted):
+                        for i in missing[text]:
+                            labels[i] = label
+                        self._cache[(version, text)] = label
+                    while len(self._cache) > self.max_entries:
+                        self._cache.popitem(last=False)
+
+        cost = time.perf_counter() - start
+        with self._lock:
+            self.calls += 1
+            self.rows += len(texts)
+            if model is not None:
+                self.misses += len(missing)
+                self.hits += len(texts) - sum(len(rows) for rows in missing.values())
+            self.seconds += cost
+            self.max_seconds = max(self.max_seconds, cost)
+            self.predict_seconds += predict_cost
+        return labels
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._cache), "max_entries": self.max_entries, "model_version": self._version,
+                "calls": self.calls, "rows": self.rows, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "avg_call_ms": round(self.seconds / self.calls * 1000, 3) if self.calls else None,
+                "max_call_ms": round(self.max_seconds * 1000, 3),
+                "predict_ms_per_miss": round(self.predict_seconds / self.misses * 1000, 3) if self.misses else None,
+            }
+
+
+_default_service = None
+_default_lock = threading.Lock()
+
+
+def get_classify_service():
+    """进程内共享的默认分类服务。"""
+    global _default_service
+    with _default_lock:
+        if _default_service is None:
+            _default_service = ClassifyService()
+        return _default_service
+
+
+def classify_many(records):
+    """
+    批量智能分类，records 为 [(title, tags, original_subject)]：
+    模型置信时取模型的类别（走记忆缓存），否则（或没有模型）退回关键词规则。
+    """
+    labels = get_classify_service().predict_many([normalize_text(title, tags) for title, tags, _ in records])
+    return [
+        label if label is not None else keyword_classify(title, tags, original_subject)
+        for label, (title, tags, original_subject) in zip(labels, records)
+    ]
+
+
+def reclassify_videos(connection, batch_size=RECLASSIFY_BATCH, dry_run=False):
+    """
+    用当前模型重新分类库里的全部视频（发布新模型后执行）：按 bvid 分批读取，模型不置信时以现有 subject 作为兜底，
+    只更新结果变化的行，每批一个事务。返回 (扫描数, 变化数, Counter{(旧科目, 新科目): 条数})。
+    科目不参与快照、索引与汇总的增量维护，直接 UPDATE 即可。
+    """
+    scanned = changed = 0
+    transitions = Counter()
+    last_bvid = ""
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute(
+                "SELECT bvid, title, tags, subject FROM videos WHERE bvid > %s ORDER BY bvid LIMIT %s",
+                (last_bvid, batch_size),
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_bvid = rows[-1][0]
+            subjects = classify_many([(title or "", tags or "", subject) for _, title, tags, subject in rows])
+            updates = []
+            for (bvid, _, _, old), new in zip(rows, subjects):
+                if new != old:
+                    updates.append((new, bvid))
+                    transitions[(old, new)] += 1
+            scanned += len(rows)
+            changed += len(updates)
+            if updates and not dry_run:
+                cursor.executemany("UPDATE videos SET subject = %s WHERE bvid = %s", updates)
+                connection.commit()
+    return scanned, changed, transitions
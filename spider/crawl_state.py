@@ -0,0 +1,119 @@
+"""增量抓取状态：按关键词记录上次抓取/全量刷新时间，以及每页出现过的 bvid 与计数指标哈希（本地 SQLite）。"""
+
+import json
+import os
+import sqlite3
+import zlib
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATE_PATH = os.environ.get("BILI_SPIDER_DB", os.path.join(ROOT_DIR, "spider_state.db"))
+FULL_REFRESH_INTERVAL = timedelta(days=7)   # 增量模式下，超过该时长未全量刷新的关键词自动走一次全量
+
+
+def metric_hash(item):
+    """搜索结果里会变化的计数（播放/收藏/评论/弹幕）的 crc32，相同即认为视频未变化。"""
+    key = f"{item.get('play', 0)}|{item.get('favorites', 0)}|{item.get('review', 0)}|{item.get('video_review', 0)}"
+    return zlib.crc32(key.encode("utf-8"))
+
+
+class CrawlStateStore:
+    """每次读写各开一个短连接，多个抓取线程/进程可以同时使用。"""
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS keyword_state (
+                    keyword TEXT PRIMARY KEY,
+                    last_crawl_at TEXT,
+                    last_full_at TEXT,
+                    pages TEXT NOT NULL DEFAULT '{}'
+                )
+                """
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def load(self, keyword):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT last_crawl_at, last_full_at, pages FROM keyword_state WHERE keyword = ?", (keyword,)
+            ).fetchone()
+        if row is None:
+            return {"last_crawl_at": None, "last_full_at": None, "pages": {}}
+        return {
+            "last_crawl_at": datetime.fromisoformat(row[0]) if row[0] else None,
+            "last_full_at": datetime.fromisoformat(row[1]) if row[1] else None,
+            "pages": {int(page): hashes for page, hashes in json.loads(row[2]).items()},
+        }
+
+    def save(self, keyword, pages, last_crawl_at, last_full_at):
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO keyword_state (keyword, last_crawl_at, last_full_at, pages) VALUES (?, ?, ?, ?)
+                ON CONFLICT(keyword) DO UPDATE SET
+                    last_crawl_at = excluded.last_crawl_at,
+                    last_full_at = excluded.last_full_at,
+                    pages = excluded.pages
+                """,
+                (
+                    keyword,
+                    last_crawl_at.isoformat(timespec="seconds"),
+                    last_full_at.isoformat(timespec="seconds") if last_full_at else None,
+                    json.dumps({str(page): hashes for page, hashes in pages.items()}),
+                ),
+            )
+
+
+class KeywordTracker:
+    """
+    单个关键词一次抓取的增量判断：
+    增量模式下 filter() 只放行新视频和计数有变化的视频，整页都已知且未变时 page_unchanged 为真，调用方据此停止翻页；
+    全量模式（或距上次全量超过 FULL_REFRESH_INTERVAL）全部放行，并在结束时重置该关键词的页面记录。
+    """
+
+    def __init__(self, store, keyword, incremental, now=None):
+        self.store = store
+        self.keyword = keyword
+        self.now = now or datetime.now()
+        self.state = store.load(keyword)
+        last_full = self.state["last_full_at"]
+        self.full = not incremental or last_full is None or self.now - last_full >= FULL_REFRESH_INTERVAL
+        self.known = {}
+        if not self.full:
+            for hashes in self.state["pages"].values():
+                self.known.update(hashes)
+        self.pages = {}
+        self.page_unchanged = False
+
+    @property
+    def known_pages(self):
+        """上次记录到的页数，用于估算本次少抓的页。"""
+        return max(self.state["pages"], default=0)
+
+    def filter(self, page, items):
+        hashes = {item["bvid"]: metric_hash(item) for item in items}
+        self.pages[page] = hashes
+        if self.full:
+            self.page_unchanged = False
+            return list(items)
+        fresh = [item for item in items if self.known.get(item["bvid"]) != hashes[item["bvid"]]]
+        self.page_unchanged = not fresh
+        return fresh
+
+    def commit(self, completed, skip_pages=()):
+        """
+        保存本次看到的页面；completed 为假（中断）时不更新全量刷新时间，且保留未抓到的旧页面记录。
+        skip_pages 为写库失败的页：不记录本次哈希（保留旧记录），下次增量时这些视频仍视为有变化。
+        """
+        seen = {page: hashes for page, hashes in self.pages.items() if page not in skip_pages}
+        if self.full and completed:
+            pages, last_full = seen, self.now
+        else:
+            pages = {**self.state["pages"], **seen}
+            last_full = self.state["last_full_at"]
+        self.store.save(self.keyword, pages, self.now, last_full)
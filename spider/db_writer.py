@@ -0,0 +1,189 @@
+"""爬虫写库阶段：抓取线程只把行放进内存队列，后台线程复用同一条连接、攒够一批再做大批量 upsert。"""
+
+import threading
+import time
+from collections import deque
+
+WRITE_BATCH = 500       # 每次 upsert 的最大行数
+MAX_PENDING = 5000      # 队列上限，超过后 put() 阻塞抓取线程（背压）
+FLUSH_INTERVAL = 2.0    # 不足一批时的最长等待（秒）
+
+
+class BatchWriter:
+    """
+    connect() 返回 pymysql 连接（整个任务期间复用，断线时 ping 重连）；
+    write_batch(cursor, rows) 在一个事务内写入一批行，成功后提交，失败回滚并丢弃本批（与原逐页写库一致）。
+    report(log_line) 接收每次刷盘的耗时与累计写入速率。
+    put(rows, on_commit, on_failure) 的回调在这批行处理完后由写库线程按入队顺序调用：全部提交时调用 on_commit，
+    其中有行随失败的批次被丢弃时调用 on_failure（未传则仍调用 on_commit，用于无论成败都推进的检查点）。
+    """
+
+    def __init__(self, connect, write_batch, batch_size=WRITE_BATCH, max_pending=MAX_PENDING,
+                 flush_interval=FLUSH_INTERVAL, report=None):
+        self.connect = connect
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.max_pending = max(max_pending, batch_size)
+        self.flush_interval = flush_interval
+        self.report = report
+        self._rows = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._connection = None
+        self._thread = None
+        self._queued = 0        # 累计入队行数
+        self._handled = 0       # 累计已处理行数
+        self._callbacks = deque()  # [起始序号, 结束序号, on_commit, on_failure, 是否有行写入失败]
+        self.stats = {
+            'rows_written': 0,
+            'flushes': 0,
+            'failures': 0,
+            'flush_seconds': 0.0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'blocked_seconds': 0.0,
+        }
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def put(self, rows, on_commit=None, on_failure=None):
+        """入队；队列已满时阻塞到后台线程腾出空间。rows 为空时 on_commit 在此前入队的行都处理完后调用。"""
+        if not rows:
+            if on_commit is not None:
+                with self._cond:
+                    if self._handled < self._queued:
+                        self._callbacks.append([self._queued, self._queued, on_commit, on_failure, False])
+                        return
+                on_commit()
+            return
+        with self._cond:
+            start = time.monotonic()
+            while len(self._rows) >= self.max_pending and not self._closed:
+                self._cond.wait()
+            self.stats['blocked_seconds'] += time.monotonic() - start
+            if self._closed:
+                raise RuntimeError("writer 已关闭")
+            self._rows.extend(rows)
+            start = self._queued
+            self._queued += len(rows)
+            if on_commit is not None or on_failure is not None:
+                self._callbacks.append([start, self._queued, on_commit, on_failure, False])
+            if len(self._rows) >= self.batch_size:
+                self._cond.notify_all()
+
+    def rows_per_second(self):
+        seconds = self.stats['flush_seconds']
+        return self.stats['rows_written'] / seconds if seconds else 0.0
+
+    def close(self):
+        """停止接收新行，等待队列全部落库后关闭连接；抓取结束、中断或异常时都应调用。"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        else:
+            self._drain()
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+        return self.stats
+
+    def _take(self):
+        with self._cond:
+            deadline = time.monotonic() + self.flush_interval
+            while not self._closed and len(self._rows) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._rows[:self.batch_size]
+            del self._rows[:self.batch_size]
+            self._cond.notify_all()     # 唤醒被背压阻塞的抓取线程
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            if batch:
+                self._advance(len(batch), self._flush(batch))
+                continue
+            with self._cond:
+                if self._closed and not self._rows:
+                    return
+
+    def _drain(self):
+        while self._rows:
+            batch = self._rows[:self.batch_size]
+            del self._rows[:self.batch_size]
+            self._advance(len(batch), self._flush(batch))
+
+    def _advance(self, count, written=True):
+        """本批 count 行已处理（written 为假表示整批被丢弃）：标记受影响的回调，调用范围已全部处理完的回调。"""
+        ready = []
+        with self._cond:
+            low, self._handled = self._handled, self._handled + count
+            if not written:
+                for entry in self._callbacks:
+                    if entry[0] >= self._handled:
+                        break
+                    if entry[1] > low:
+                        entry[4] = True
+            while self._callbacks and self._callbacks[0][1] <= self._handled:
+                ready.append(self._callbacks.popleft())
+        for _, _, on_commit, on_failure, failed in ready:
+            callback = on_failure if failed and on_failure is not None else on_commit
+            if callback is None:
+                continue
+            try:
+                callback()
+            except Exception as e:
+                self._log(f"  检查点回调失败: {e}")
+
+    def _get_connection(self):
+        if self._connection is None:
+            self._connection = self.connect()
+        else:
+            self._connection.ping(reconnect=True)
+        return self._connection
+
+    def _log(self, log_line):
+        if self.report:
+            self.report(log_line)
+
+    def _flush(self, batch):
+        """写入一批并提交，返回是否成功；失败时回滚并丢弃本批。"""
+        start = time.perf_counter()
+        connection = None
+        try:
+            connection = self._get_connection()
+            with connection.cursor() as cursor:
+                self.write_batch(cursor, batch)
+            connection.commit()
+        except Exception as e:
+            if connection is not None:
+                try:
+                    connection.rollback()
+                except Exception:
+                    self._connection = None
+            self.stats['failures'] += 1
+            self._log(f"  数据库写入失败（{len(batch)} 条）: {e}")
+            return False
+        cost = time.perf_counter() - start
+        self.stats['rows_written'] += len(batch)
+        self.stats['flushes'] += 1
+        self.stats['flush_seconds'] += cost
+        self.stats['last_flush_ms'] = round(cost * 1000, 2)
+        self.stats['max_flush_ms'] = round(max(self.stats['max_flush_ms'], cost * 1000), 2)
+        self._log(
+            f"  已写库 {len(batch)} 条，用时 {cost * 1000:.0f} ms，"
+            f"累计 {self.stats['rows_written']} 条（{self.rows_per_second():.0f} 条/秒）"
+        )
+        return True
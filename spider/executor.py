@@ -0,0 +1,215 @@
+"""爬虫任务执行器：worker（默认为独立子进程）从共享队列先进先出领取任务，相同参数的排队任务去重。
+
+队列、并发上限与去重都在 SQLite（TaskStore）里：多个 Web 进程（如 gunicorn 的多个 worker）提交的任务进同一个队列，
+同时执行的任务数是所有进程合计不超过 BILI_SPIDER_WORKERS。结果在 NDJSON 文件里，worker 进程与 Web 进程之间不需要额外通信：
+取消 = 把任务状态改成 cancelling，worker 内的监视线程轮询到后置位 stop_flag，收尾完成后由 worker 改为 cancelled。
+子进程用 `python -m spider.executor --workers N` 启动，而不是 multiprocessing 的 spawn（后者会在子进程里重新执行 app.py 的启动逻辑）；
+worker 执行完一个任务接着领取下一个，领不到（队列为空或已达上限）即退出。
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from spider.result_spool import SPOOL_DIR, ResultSpool
+from spider.task_store import LOG_KEEP, STATE_PATH, TaskStore
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SPIDER_WORKERS = int(os.environ.get("BILI_SPIDER_WORKERS", 1))
+SPIDER_EXECUTOR = os.environ.get("BILI_SPIDER_EXECUTOR", "process")     # process | thread
+CANCEL_POLL_INTERVAL = 1.0      # worker 检查任务是否被取消的间隔（秒）
+
+_worker_stores: dict[tuple[str, str], tuple[TaskStore, ResultSpool]] = {}
+
+
+def _stores(store_path, spool_dir):
+    """每个 worker 进程/线程池内复用一份 TaskStore/ResultSpool。"""
+    key = (store_path, spool_dir)
+    if key not in _worker_stores:
+        _worker_stores[key] = (TaskStore(store_path), ResultSpool(spool_dir))
+    return _worker_stores[key]
+
+
+def run_task(task_id, store_path=STATE_PATH, spool_dir=SPOOL_DIR):
+    """
+    在 worker 中执行一个已领取（TaskStore.claim，状态为 running）的任务：进度/日志写 TaskStore，结果追加到 NDJSON，
+    检查点随页提交；执行期间每 CANCEL_POLL_INTERVAL 秒检查一次取消并刷新心跳。
+    """
+    from spider.bilibili_api import crawl
+
+    store, spool = _stores(store_path, spool_dir)
+    task = store.get(task_id)
+    if task is None or task["status"] != "running":     # 领取后、开始前已被取消
+        if task is not None and task["status"] == "cancelling":
+            store.finish(task_id, "cancelled")
+        return
+    logs = list(task["logs"])
+    result_count = task["result_count"]
+    stop_flag = threading.Event()
+    finished = threading.Event()
+    sink_lock = threading.Lock()
+
+    def watch_cancel():
+        # 请求取消后继续刷新心跳：收尾（刷完写库队列）期间任务仍占用一个执行名额，也不能被续跑
+        while not finished.wait(CANCEL_POLL_INTERVAL):
+            current = store.get(task_id)
+            if current is None or current["status"] == "cancelling":
+                stop_flag.set()
+            store.heartbeat(task_id)
+
+    def on_rows(rows):
+        nonlocal result_count
+        with sink_lock:
+            spool.append(task_id, rows)
+            result_count += len(rows)
+            store.update(task_id, result_count=result_count)
+
+    def on_progress(done, total, log_line=None):
+        fields = {}
+        if total:
+            fields["progress"] = min(100, max(0, int(done / total * 100)))
+        if log_line:
+            logs.append(log_line)
+            del logs[:-LOG_KEEP]
+            fields["logs"] = logs
+        if fields:
+            event = {"done": done, "total": total, "progress": fields.get("progress"), "log": log_line}
+            store.update(task_id, event=("progress", event), **fields)
+
+    threading.Thread(target=watch_cancel, name=f"cancel-{task_id[:8]}", daemon=True).start()
+    final = {}
+    try:
+        crawl(task["params"] or {}, progress_cb=on_progress, stop_flag=stop_flag,
+              checkpoint=store.checkpoint(task_id), result_sink=on_rows)
+        final = {"status": "cancelled"} if stop_flag.is_set() else {"status": "succeeded", "progress": 100}
+    except Exception as exc:
+        final = {"status": "failed", "message": str(exc)}
+    finally:
+        # crawl() 返回时写库队列已刷完、结果已落盘；此后才写最终状态（cancelling 在这里才变成 cancelled）
+        finished.set()
+        store.finish(task_id, **(final or {"status": "failed", "message": "worker 中断"}))
+
+
+def run_worker(workers, store_path=STATE_PATH, spool_dir=SPOOL_DIR):
+    """worker 主循环：反复领取队首任务执行，直到队列为空或所有进程合计的执行数已达 workers；返回执行的任务数。"""
+    store, _ = _stores(store_path, spool_dir)
+    done = 0
+    while True:
+        task_id = store.claim(workers, os.getpid())
+        if task_id is None:
+            return done
+        run_task(task_id, store_path, spool_dir)
+        done += 1
+
+
+class SpiderExecutor:
+    """
+    提交 = 写入共享队列，再在本进程拉起一个 worker（本进程拉起的 worker 已有 workers 个时不再拉起）。
+    是否还有执行空位由 TaskStore.claim() 按所有进程合计判断，多拉起的 worker 领不到任务会立即退出；
+    排队任务不占用 worker，取消时直接出队。同一参数的任务已在排队时，submit() 返回已有任务 id，不重复入队。
+    """
+
+    def __init__(self, store: TaskStore, spool_dir=SPOOL_DIR, workers=SPIDER_WORKERS, kind=SPIDER_EXECUTOR):
+        self.store = store
+        self.spool_dir = spool_dir
+        self.workers = max(1, workers)
+        self.kind = kind
+        self._threads = None
+        self._alive = 0     # 本进程拉起、尚未退出的 worker 数
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _check_fork(self):
+        """预分叉部署中 fork 出的子进程继承不到父进程的线程池与等待线程：计数、锁与线程池在子进程里重新开始。"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._threads = None
+            self._alive = 0
+            self._lock = threading.Lock()
+
+    def _launch(self):
+        if self.kind == "process":
+            # 独立子进程：抓取与分类不和 Flask 请求线程争 GIL，也不继承 Web 进程里的线程与数据库连接
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "spider.executor", "--workers", str(self.workers),
+                 "--store", self.store.path, "--spool", self.spool_dir],
+                cwd=ROOT_DIR,
+            )
+            threading.Thread(target=self._wait_process, args=(proc,), daemon=True).start()
+        else:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(self.workers, thread_name_prefix="spider")
+            future = self._threads.submit(run_worker, self.workers, self.store.path, self.spool_dir)
+            future.add_done_callback(lambda f: self._on_exit())
+
+    def _wait_process(self, proc):
+        code = proc.wait()
+        if code:    # worker 进程崩溃等 run_task 自身无法记录的异常
+            self.store.fail_worker(proc.pid, f"worker 进程异常退出（退出码 {code}）")
+        self._on_exit()
+
+    def _on_exit(self):
+        with self._lock:
+            self._alive -= 1
+        self.dispatch()
+
+    def dispatch(self):
+        """
+        有排队任务且合计执行数未满时拉起一个 worker。执行中任务的 worker 跑完会自己接着领取，
+        这里只需补上空位（如 worker 崩溃、心跳过期）；进程启动时调用一次即可接手上次遗留的排队任务。
+        """
+        self._check_fork()
+        running, pending = self.store.queue_counts()
+        if not pending or running >= self.workers:
+            return
+        with self._lock:
+            if self._alive >= self.workers:
+                return
+            self._alive += 1
+        self._launch()
+
+    def submit(self, task_id, params, create=True):
+        """
+        入队并返回 (实际排队的任务 id, 是否与已排队任务重复)；create 为真时同时在 TaskStore 建任务记录，
+        续跑已有任务时传 False（仅把状态改回 pending）。
+        """
+        queued_id, deduplicated = self.store.enqueue(task_id, params, create)
+        if not deduplicated:
+            self.dispatch()
+        return queued_id, deduplicated
+
+    def cancel_pending(self, task_id):
+        """排队中的任务直接出队（状态改为 cancelled），返回是否命中。"""
+        return self.store.cancel_pending(task_id)
+
+    def queue_position(self, task_id):
+        """在共享队列中的排队位置（1 起），不在队列中返回 None。"""
+        return self.store.queue_position(task_id)
+
+    def is_active(self, task_id):
+        return self.store.is_active(task_id)
+
+    def snapshot(self):
+        self._check_fork()
+        running, queued = self.store.queue_counts()
+        with self._lock:
+            alive = self._alive
+        return {"workers": self.workers, "kind": self.kind, "running": running, "queued": queued,
+                "local_workers": alive}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="领取并执行 TaskStore 共享队列中的爬虫任务（由 SpiderExecutor 启动）")
+    parser.add_argument("--workers", type=int, default=SPIDER_WORKERS, help="所有进程合计同时执行的任务数上限")
+    parser.add_argument("--store", default=STATE_PATH)
+    parser.add_argument("--spool", default=SPOOL_DIR)
+    args = parser.parse_args()
+    run_worker(max(1, args.workers), args.store, args.spool)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""搜索接口响应的录制与读取：每个 关键词 + 页码 一个 JSON 文件，供本地回放服务离线复现真实抓取。"""
+
+import hashlib
+import json
+import os
+
+
+def fixture_name(keyword, page):
+    """关键词可能含空格/中文，文件名用其哈希，原文保存在文件内容里。"""
+    return f"{hashlib.md5(keyword.encode('utf-8')).hexdigest()[:12]}_p{page}.json"
+
+
+def record_response(directory, keyword, page, response):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, fixture_name(keyword, page))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"keyword": keyword, "page": page, "response": response}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_fixtures(directory):
+    """读取目录下全部录制文件，返回 {(关键词, 页码): 响应 JSON}。"""
+    fixtures = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            record = json.load(f)
+        fixtures[(record["keyword"], int(record["page"]))] = record["response"]
+    return fixtures
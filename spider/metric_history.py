@@ -0,0 +1,215 @@
+"""
+视频指标历史：每次抓取为每个 bvid 追加一个 (时间, 播放, 收藏, 评论) 样本，只追加不改写，用于计算增长趋势。
+
+存储（video_metrics）：按 bvid 分块，每块最多 CHUNK_SAMPLES 个样本。块头用整数列保存块内首/末样本的绝对值，
+块内其余样本只存与前一个样本的差值（时间按分钟），zigzag + varint 编码，按天抓取时每个样本约 6~8 字节。
+增长汇总（video_growth）：追加样本的同一事务内，按 GROWTH_WINDOWS（天）预计算各窗口的增量与日均增速，
+接口只读这张表；窗口配置变化后执行 flask --app app rebuild-growth 从历史重算。
+"""
+
+import os
+from bisect import bisect_right
+from datetime import datetime
+
+import pymysql
+
+CHUNK_SAMPLES = 128         # 每块样本数上限，块头开销摊到每个样本不足 1 字节
+SAMPLE_MIN_INTERVAL = 30    # 分钟；同一视频在一次抓取里被多个关键词搜到时只记一次
+# 预计算的增长窗口（天），接口只接受其中之一
+GROWTH_WINDOWS = tuple(sorted({int(days) for days in os.environ.get("BILI_GROWTH_WINDOWS", "1,7,30").split(",")
+                               if days.strip()}))
+REBUILD_BATCH = 500
+
+
+def to_minute(moment):
+    return int(moment.timestamp() // 60)
+
+
+def from_minute(minute):
+    return datetime.fromtimestamp(minute * 60)
+
+
+def _zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def _put_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode_sample(minutes, deltas):
+    """一个样本：距上个样本的分钟数 + 各指标差值（可能为负，B 站会回收刷量）。"""
+    out = bytearray()
+    _put_varint(out, minutes)
+    for delta in deltas:
+        _put_varint(out, _zigzag(delta))
+    return bytes(out)
+
+
+def decode_samples(base_minute, base_values, data):
+    """块头的首样本 + 差值流 -> [(分钟, 播放, 收藏, 评论), ...]，按时间升序。"""
+    minute, values = base_minute, list(base_values)
+    samples = [(minute, *values)]
+    fields, value, shift = [], 0, 0
+    for byte in data or b"":
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        fields.append(value)
+        value, shift = 0, 0
+        if len(fields) == 1 + len(values):
+            minute += fields[0]
+            values = [v + _unzigzag(d) for v, d in zip(values, fields[1:])]
+            samples.append((minute, *values))
+            fields = []
+    return samples
+
+
+def compute_growth(samples, windows=GROWTH_WINDOWS):
+    """
+    以最后一个样本为终点，窗口起点取离起点时刻最近的样本（抓取时间每天有先后，避免 1 天窗口退化成 2 天；
+    历史不够长时取最早样本），返回 {窗口天数: ((播放, 收藏, 评论) 增量, 日均播放增量, 实际跨度小时)}；只有一个样本时为空。
+    """
+    minutes = [sample[0] for sample in samples]
+    last = samples[-1]
+    growth = {}
+    for days in windows:
+        start = last[0] - days * 1440
+        index = max(bisect_right(minutes, start) - 1, 0)
+        if index + 1 < len(samples) - 1 and minutes[index + 1] - start < start - minutes[index]:
+            index += 1
+        anchor = samples[index]
+        span = last[0] - anchor[0]
+        if span <= 0:
+            continue
+        deltas = tuple(now - then for now, then in zip(last[1:], anchor[1:]))
+        growth[days] = (deltas, deltas[0] / (span / 1440), span / 60)
+    return growth
+
+
+def _load_chunks(cursor, bvids, cutoff):
+    """读取视频的全部块头；只有末样本晚于 cutoff 的块才取差值流（更早的块只需要末样本作窗口起点）。"""
+    placeholders = ", ".join(["%s"] * len(bvids))
+    cursor.execute(
+        f"""
+        SELECT bvid, chunk, samples, base_minute, base_view, base_fav, base_reply,
+               last_minute, last_view, last_fav, last_reply, IF(last_minute >= %s, data, NULL) AS data
+        FROM video_metrics WHERE bvid IN ({placeholders}) ORDER BY bvid, chunk
+        """,
+        [cutoff, *bvids],
+    )
+    chunks = {}
+    for row in cursor.fetchall():
+        chunks.setdefault(row["bvid"], []).append(row)
+    return chunks
+
+
+def _recent_samples(chunks):
+    samples = []
+    for chunk in chunks:
+        if chunk["data"] is None:
+            samples.append((chunk["last_minute"], chunk["last_view"], chunk["last_fav"], chunk["last_reply"]))
+        else:
+            samples.extend(decode_samples(
+                chunk["base_minute"], (chunk["base_view"], chunk["base_fav"], chunk["base_reply"]), chunk["data"]
+            ))
+    return samples
+
+
+def _write_growth(cursor, values):
+    if values:
+        cursor.executemany(
+            """
+            INSERT INTO video_growth (
+                bvid, window_days, view_delta, favorite_delta, reply_delta, view_rate, span_hours, sampled_at
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                view_delta = VALUES(view_delta),
+                favorite_delta = VALUES(favorite_delta),
+                reply_delta = VALUES(reply_delta),
+                view_rate = VALUES(view_rate),
+                span_hours = VALUES(span_hours),
+                sampled_at = VALUES(sampled_at);
+            """,
+            values,
+        )
+
+
+def _growth_rows(bvid, samples, sampled_at):
+    return [
+        (bvid, days, *deltas, rate, span_hours, sampled_at)
+        for days, (deltas, rate, span_hours) in compute_growth(samples).items()
+    ]
+
+
+def update_metric_history(cursor, rows, now=None):
+    """
+    增量维护：在 videos upsert 之后、同一事务内调用，rows 为本批去重后的视频。
+    未满的块只追加一段差值并更新块头的末样本，写满后新开一块；随后刷新这些视频的各窗口增长汇总。
+    """
+    rows = [row for row in rows if row.get("bvid")]
+    if not rows:
+        return
+    now = now or datetime.now()
+    minute = to_minute(now)
+    history = _load_chunks(cursor, [row["bvid"] for row in rows], minute - max(GROWTH_WINDOWS, default=0) * 1440)
+
+    appends, new_chunks, growth = [], [], []
+    for row in rows:
+        bvid = row["bvid"]
+        values = (int(row["view_count"] or 0), int(row["favorite_count"] or 0), int(row["reply_count"] or 0))
+        chunks = history.get(bvid, [])
+        head = chunks[-1] if chunks else None
+        if head is not None and minute - head["last_minute"] < SAMPLE_MIN_INTERVAL:
+            continue
+        if head is None or head["samples"] >= CHUNK_SAMPLES:
+            new_chunks.append((bvid, head["chunk"] + 1 if head else 0, minute, *values, minute, *values))
+        else:
+            last = (head["last_view"], head["last_fav"], head["last_reply"])
+            sample = encode_sample(minute - head["last_minute"], [v - l for v, l in zip(values, last)])
+            appends.append((sample, minute, *values, bvid, head["chunk"]))
+        growth.extend(_growth_rows(bvid, _recent_samples(chunks) + [(minute, *values)], now))
+
+    if new_chunks:
+        cursor.executemany(
+            """
+            INSERT INTO video_metrics (
+                bvid, chunk, samples, base_minute, base_view, base_fav, base_reply,
+                last_minute, last_view, last_fav, last_reply, data
+            ) VALUES (%s, %s, 1, %s, %s, %s, %s, %s, %s, %s, %s, '')
+            """,
+            new_chunks,
+        )
+    if appends:
+        cursor.executemany(
+            """
+            UPDATE video_metrics SET data = CONCAT(data, %s), samples = samples + 1,
+                last_minute = %s, last_view = %s, last_fav = %s, last_reply = %s
+            WHERE bvid = %s AND chunk = %s
+            """,
+            appends,
+        )
+    _write_growth(cursor, growth)
+
+
+def rebuild_growth(connection):
+    """全量重算命令入口（flask rebuild-growth）：窗口配置变化后按完整历史重建 video_growth，终点仍是各视频的最后一个样本。"""
+    with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+        cursor.execute("SELECT DISTINCT bvid FROM video_metrics")
+        bvids = [row["bvid"] for row in cursor.fetchall()]
+        cursor.execute("DELETE FROM video_growth")
+        for start in range(0, len(bvids), REBUILD_BATCH):
+            growth = []
+            for bvid, chunks in _load_chunks(cursor, bvids[start: start + REBUILD_BATCH], 0).items():
+                samples = _recent_samples(chunks)
+                growth.extend(_growth_rows(bvid, samples, from_minute(samples[-1][0])))
+            _write_growth(cursor, growth)
+    connection.commit()
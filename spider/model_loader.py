@@ -0,0 +1,110 @@
+"""
+分类模型与 jieba 词典的懒加载：两者都在首次使用时才加载，导入爬虫模块（Web 进程、任务子进程）不再付出
+sklearn 导入、模型反序列化与词典构建的开销。预分叉部署（gunicorn --preload）可在 fork 前调用 warm_up()，
+worker 通过写时复制共享已加载的模型与词典，首个请求不再冷启动。
+长驻进程每隔 RELOAD_CHECK_INTERVAL 秒检查一次模型（及内容推荐用的 TF-IDF 向量器）文件，训练脚本发布后自动切换，版本号随之变化。
+"""
+
+import os
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.environ.get("BILI_MODEL_PATH", os.path.join(ROOT_DIR, "subject_classifier.pkl"))
+# 内容推荐用的 TF-IDF 向量器：全量训练单独发布，增量训练发布的 Hashing 模型没有词表，不覆盖它
+VECTORIZER_PATH = os.environ.get("BILI_VECTORIZER_PATH", os.path.join(ROOT_DIR, "tfidf_vectorizer.pkl"))
+RELOAD_CHECK_INTERVAL = 30  # 秒
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+class _Artifact:
+    """按需加载的 joblib 文件；每隔 RELOAD_CHECK_INTERVAL 秒检查一次修改时间，文件被替换后重新加载。"""
+
+    def __init__(self, path, label, missing=None):
+        self.path = path
+        self.label = label
+        self.missing = missing      # 文件不存在时打印的提示
+        self._state = (None, None)      # (对象, 版本)；整体替换，读取方总能拿到配对的对象与版本
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _version(self):
+        """文件的修改时间（纳秒），训练脚本每次发布都会替换文件；文件不存在为 None。"""
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self):
+        try:
+            import joblib   # 反序列化时才导入 sklearn（约 1.5 秒）
+
+            value = joblib.load(self.path)
+            print(f"{self.label}加载成功")
+            return value
+        except Exception as e:
+            print(f"{self.label}加载失败: {e}")
+            return None
+
+    def state(self):
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= RELOAD_CHECK_INTERVAL:
+            with self._lock:
+                if self._checked_at is None or now - self._checked_at >= RELOAD_CHECK_INTERVAL:
+                    version = self._version()
+                    if self._checked_at is None or version != self._state[1]:
+                        self._state = (self._load() if version is not None else None, version)
+                        if version is None and self.missing:
+                            print(self.missing)
+                    self._checked_at = now
+        return self._state
+
+
+_classifier = _Artifact(MODEL_PATH, "AI 模型", "未找到 AI 模型，使用关键词规则模式")
+_vectorizer = _Artifact(VECTORIZER_PATH, "TF-IDF 向量器")
+
+
+def get_classifier_state():
+    """
+    进程内共享的 (分类模型, 版本)，首次调用时加载；文件不存在或加载失败时模型为 None（调用方退回关键词规则），
+    之后只在文件变化时重试。
+    """
+    return _classifier.state()
+
+
+def get_classifier():
+    return get_classifier_state()[0]
+
+
+def get_vectorizer_state():
+    """(TF-IDF 向量器, 版本)，加载与重载规则同分类模型；没有单独发布的向量器时为 (None, None)。"""
+    return _vectorizer.state()
+
+
+def get_tokenizer():
+    """进程内共享的 jieba 分词器（jieba.dt），首次调用时导入 jieba 并构建词典（约 1 秒，有词典缓存文件时更快）。"""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                import jieba
+
+                jieba.initialize()
+                _tokenizer = jieba.dt
+    return _tokenizer
+
+
+def warm_up(classifier=True, tokenizer=True):
+    """显式预热：加载模型与词典，返回各项耗时（秒）；已加载的项几乎不耗时。"""
+    cost = {}
+    if classifier:
+        start = time.perf_counter()
+        get_classifier()
+        cost["classifier"] = time.perf_counter() - start
+    if tokenizer:
+        start = time.perf_counter()
+        get_tokenizer()
+        cost["tokenizer"] = time.perf_counter() - start
+    return cost
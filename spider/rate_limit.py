@@ -0,0 +1,157 @@
+"""
+令牌桶限速：多个抓取线程共享同一个桶，按主机限制整体请求速率，取代每次请求前的固定 sleep。
+传入 SQLite 路径时桶状态存在库里（SharedTokenBucket），同一台机器上的多个任务进程、多个 Web worker 共用一份额度；
+单个任务可以再套一层更低的限速（HostRateLimiter 的 parent），但不能超过共享额度。
+"""
+
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_RATE = 1.0      # 每秒补充的令牌数（即稳定状态下每秒请求数）
+DEFAULT_BURST = 2       # 桶容量：空闲后允许的瞬时突发请求数
+
+
+class TokenBucket:
+    """线程安全的令牌桶；acquire() 阻塞到拿到令牌，stop_flag 置位时提前返回 False。"""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        if rate <= 0:
+            raise ValueError("rate 必须大于 0")
+        self.rate = float(rate)
+        self.capacity = max(float(burst), 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0   # 累计等待时长（秒），便于观察限速是否成为瓶颈
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, stop_flag=None):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+                self.waited += wait
+            # 不持锁等待；用 stop_flag.wait 代替 sleep，取消任务时可立即醒来
+            if stop_flag is not None:
+                if stop_flag.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+class SharedTokenBucket:
+    """
+    跨进程的令牌桶：余量与上次补充时间存在 SQLite 的 rate_buckets 表，每次取令牌是一个 BEGIN IMMEDIATE 事务，
+    多个进程串行地补充并扣减；时间用墙钟（time.time），不同进程的单调时钟不可比。每次取令牌开一个短连接，fork 后也可直接使用。
+    速率与容量在创建桶时写进同一行，补充令牌时以库里的值为准：同名的桶无论由哪个进程打开都按同一个上限补充。
+    """
+
+    def __init__(self, path, name, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        if rate <= 0:
+            raise ValueError("rate 必须大于 0")
+        self.path = path
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = max(float(burst), 1.0)
+        self._lock = threading.Lock()
+        self.waited = 0.0
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets "
+                "(name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(rate_buckets)")}
+            for column in ("rate", "capacity"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE rate_buckets ADD COLUMN {column} REAL")
+            conn.execute(
+                "INSERT INTO rate_buckets (name, tokens, updated, rate, capacity) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET rate = excluded.rate, capacity = excluded.capacity",
+                (self.name, self.capacity, time.time(), self.rate, self.capacity),
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _take(self):
+        """补充并尝试扣一个令牌：成功返回 0，否则返回还需等待的秒数。"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated, rate, capacity FROM rate_buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            rate = row[2] if row is not None and row[2] else self.rate
+            capacity = row[3] if row is not None and row[3] else self.capacity
+            tokens = capacity if row is None else min(capacity, row[0] + max(now - row[1], 0) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            conn.execute(
+                "INSERT INTO rate_buckets (name, tokens, updated, rate, capacity) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (self.name, tokens, now, rate, capacity),
+            )
+            conn.execute("COMMIT")
+            return wait
+        finally:
+            conn.close()
+
+    def acquire(self, stop_flag=None):
+        while True:
+            wait = self._take()
+            if not wait:
+                return True
+            with self._lock:
+                self.waited += wait
+            if stop_flag is not None:
+                if stop_flag.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+class HostRateLimiter:
+    """
+    按 URL 的主机名分桶，同一主机的所有请求共享一个令牌桶。
+    path 为 SQLite 路径时改用 SharedTokenBucket，桶名只用主机名：所有任务（无论在哪个进程、配置如何）共用同一份额度。
+    parent 为另一个 HostRateLimiter 时，acquire() 先取本层的令牌再取 parent 的，用于在共享额度之下给单个任务限速。
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, path=None, parent=None):
+        self.rate = rate
+        self.burst = burst
+        self.path = path
+        self.parent = parent
+        self._buckets: dict[str, TokenBucket | SharedTokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url) -> TokenBucket | SharedTokenBucket:
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            if host not in self._buckets:
+                if self.path:
+                    self._buckets[host] = SharedTokenBucket(self.path, host, self.rate, self.burst)
+                else:
+                    self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return self._buckets[host]
+
+    def acquire(self, url, stop_flag=None):
+        if not self.bucket(url).acquire(stop_flag):
+            return False
+        return self.parent is None or self.parent.acquire(url, stop_flag)
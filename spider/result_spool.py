@@ -0,0 +1,100 @@
+"""爬虫结果落盘：每个任务一个 NDJSON 文件，边抓边追加，按字节偏移分页读取或整文件流式返回，内存占用与结果量无关。"""
+
+import base64
+import json
+import os
+import threading
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SPOOL_DIR = os.environ.get("BILI_SPOOL_DIR", os.path.join(ROOT_DIR, "spider_results"))
+STREAM_CHUNK = 64 * 1024
+
+
+def encode_cursor(offset):
+    """分页游标对外不透明：内部是下一行的起始字节偏移。"""
+    return base64.urlsafe_b64encode(f"o{offset}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """解析游标为字节偏移；空游标为 0，格式不对抛 ValueError（偏移是否落在行首由 read() 校验）。"""
+    if not token:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("ascii")
+        if not raw.startswith("o") or not raw[1:].isdigit():
+            raise ValueError(raw)
+        return int(raw[1:])
+    except Exception as exc:
+        raise ValueError("bad cursor") from exc
+
+
+class ResultSpool:
+    def __init__(self, directory=SPOOL_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def path(self, task_id):
+        return os.path.join(self.directory, f"{task_id}.ndjson")
+
+    def _lock(self, task_id):
+        with self._locks_guard:
+            return self._locks.setdefault(task_id, threading.Lock())
+
+    def append(self, task_id, rows):
+        """一页结果追加为若干行；多个抓取线程并发调用时按任务加锁，保证行不交错。"""
+        if not rows:
+            return
+        payload = "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows)
+        with self._lock(task_id):
+            with open(self.path(task_id), "a", encoding="utf-8") as f:
+                f.write(payload)
+
+    def read(self, task_id, cursor=None, limit=200):
+        """
+        从游标（上次返回的 next_cursor，首页为空）起读取至多 limit 行，返回 (rows, next_cursor, has_more)。
+        游标无法解析、超出文件末尾或不在行首时抛 ValueError。
+        """
+        offset = decode_cursor(cursor)
+        rows = []
+        try:
+            f = open(self.path(task_id), "rb")
+        except FileNotFoundError:
+            if offset:
+                raise ValueError("bad cursor")
+            return rows, encode_cursor(0), False
+        with f:
+            if offset:
+                f.seek(offset - 1)
+                if f.read(1) != b"\n":     # 超出文件末尾，或指向某一行的中间
+                    raise ValueError("bad cursor")
+            while len(rows) < limit:
+                line = f.readline()
+                if not line.endswith(b"\n"):    # 文件末尾或正在写入的半行，留到下次读取
+                    break
+                rows.append(json.loads(line))
+                offset = f.tell()
+            has_more = bool(f.readline())
+        return rows, encode_cursor(offset), has_more
+
+    def stream(self, task_id):
+        """按块产出整个 NDJSON 文件，供分块传输响应使用。"""
+        try:
+            f = open(self.path(task_id), "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            while True:
+                chunk = f.read(STREAM_CHUNK)
+                if not chunk:
+                    break
+                yield chunk
+
+    def remove(self, task_id):
+        try:
+            os.remove(self.path(task_id))
+        except FileNotFoundError:
+            pass
+        with self._locks_guard:
+            self._locks.pop(task_id, None)
@@ -0,0 +1,182 @@
+"""关键词倒排索引：爬虫落库时对标题/标签/UP 主做 jieba 分词写入 search_docs，应用启动时加载到内存检索。"""
+
+import math
+import re
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pymysql
+
+from spider.model_loader import get_tokenizer
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+REBUILD_BATCH = 1000
+# 增量加载时回看的窗口：写入事务可能晚于 indexed_at 才提交，重复加载是幂等的
+REFRESH_OVERLAP = timedelta(seconds=60)
+_WORD_RE = re.compile(r"\w")
+
+
+def _normalize(tokens):
+    """统一小写、去空白，丢弃纯标点/空白的切分结果。"""
+    result = []
+    for token in tokens:
+        token = token.strip().lower()
+        if token and _WORD_RE.search(token):
+            result.append(token)
+    return result
+
+
+def tokenize_document(title, tags, up_name):
+    """文档侧用搜索引擎模式切分（长词 + 子词都入索引），UP 主名额外整体作为一个词。"""
+    tokens = []
+    for text in (title, tags, up_name):
+        if text:
+            tokens.extend(_normalize(get_tokenizer().cut_for_search(text)))
+    if up_name and up_name.strip():
+        tokens.append(up_name.strip().lower())
+    return Counter(tokens)
+
+
+def tokenize_query(keyword):
+    """查询侧用精确模式，去重后保持顺序。"""
+    return list(dict.fromkeys(_normalize(get_tokenizer().cut(keyword or ""))))
+
+
+def encode_terms(counts):
+    """词频表压成 'term:tf term:tf' 文本存库；分词结果不含空白，可直接按空格拆分。"""
+    return " ".join(f"{term}:{tf}" for term, tf in counts.items())
+
+
+def decode_terms(text):
+    counts = {}
+    for pair in (text or "").split():
+        term, _, tf = pair.rpartition(":")
+        if term:
+            counts[term] = int(tf)
+    return counts
+
+
+def _doc_values(row, now):
+    counts = tokenize_document(row.get("title"), row.get("tags"), row.get("up_name"))
+    return (row["bvid"], encode_terms(counts), sum(counts.values()), now)
+
+
+_UPSERT_SQL = """
+INSERT INTO search_docs (bvid, terms, doc_len, indexed_at) VALUES (%s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    terms = VALUES(terms),
+    doc_len = VALUES(doc_len),
+    indexed_at = VALUES(indexed_at);
+"""
+
+
+def update_search_index(cursor, before, after):
+    """增量维护：标题/标签/UP 主不在 upsert 的更新列里，只需给新视频建索引。"""
+    now = datetime.now()
+    values = [_doc_values(row, now) for row in after if row["bvid"] not in before]
+    if values:
+        cursor.executemany(_UPSERT_SQL, values)
+
+
+def rebuild_search_index(connection):
+    """全量重建命令入口（flask rebuild-search-index）：按批分词写回，并清理已不存在的视频。"""
+    now = datetime.now()
+    with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+        last_bvid = ""
+        while True:
+            cursor.execute(
+                "SELECT bvid, title, tags, up_name FROM videos WHERE bvid > %s ORDER BY bvid LIMIT %s",
+                (last_bvid, REBUILD_BATCH),
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            cursor.executemany(_UPSERT_SQL, [_doc_values(row, now) for row in rows])
+            connection.commit()
+            last_bvid = rows[-1]["bvid"]
+        cursor.execute("DELETE FROM search_docs WHERE bvid NOT IN (SELECT bvid FROM videos)")
+    connection.commit()
+
+
+class SearchIndex:
+    """内存倒排索引：term -> {bvid: tf}，按 indexed_at 水位增量加载新文档。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: dict[str, dict[str, int]] = {}
+        self._doc_terms: dict[str, dict[str, int]] = {}
+        self._doc_len: dict[str, int] = {}
+        self._total_len = 0
+        self.watermark = None   # 已加载文档的最大 indexed_at
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    def _remove(self, bvid):
+        old_terms = self._doc_terms.pop(bvid, None)
+        if old_terms is None:
+            return
+        for term in old_terms:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(bvid, None)
+                if not posting:
+                    del self._postings[term]
+        self._total_len -= self._doc_len.pop(bvid, 0)
+
+    def refresh_since(self):
+        """下一次增量加载的起点；尚未加载过时返回 None 表示全量加载。"""
+        if self.watermark is None:
+            return None
+        return self.watermark - REFRESH_OVERLAP
+
+    def add_rows(self, rows):
+        """rows: 可迭代的 (bvid, terms 文本, doc_len, indexed_at)，重复加载同一文档是幂等的。"""
+        with self._lock:
+            for bvid, terms, doc_len, indexed_at in rows:
+                self._remove(bvid)
+                counts = decode_terms(terms)
+                self._doc_terms[bvid] = counts
+                self._doc_len[bvid] = doc_len or 0
+                self._total_len += doc_len or 0
+                for term, tf in counts.items():
+                    self._postings.setdefault(term, {})[bvid] = tf
+                if indexed_at and (self.watermark is None or indexed_at > self.watermark):
+                    self.watermark = indexed_at
+            self.loaded = True
+
+    def search(self, keyword):
+        """
+        返回 {bvid: BM25 分数}，各查询词的倒排表取交集（AND 语义）。
+        返回 None 表示无法用索引回答（无有效词或某个词不在词典中），由调用方回退 LIKE。
+        """
+        terms = tokenize_query(keyword)
+        if not terms:
+            return None
+        with self._lock:
+            postings = [self._postings.get(term) for term in terms]
+            if any(not p for p in postings):
+                return None
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+                if not candidates:
+                    return {}
+
+            total_docs = len(self._doc_len)
+            avg_len = self._total_len / total_docs if total_docs else 1
+            scores = {}
+            for bvid in candidates:
+                doc_len = self._doc_len.get(bvid, 0)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len / (avg_len or 1))
+                score = 0.0
+                for posting in postings:
+                    tf = posting[bvid]
+                    idf = math.log(1 + (total_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                    score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+                scores[bvid] = score
+            return scores
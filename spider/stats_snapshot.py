@@ -0,0 +1,211 @@
+"""仪表盘统计快照：爬虫落库时增量维护，/api/stats 直接读取单行快照。"""
+
+import json
+from datetime import datetime
+
+import pymysql
+
+SNAPSHOT_NAME = "dashboard"
+RANK_SIZE = 8              # 干货度榜单条数
+SCATTER_SIZE = 150         # 散点图按播放量取的条数
+SCATTER_MIN_DURATION = 300
+SCATTER_MAX_DURATION = 10800
+
+
+def _rank_entry(row):
+    """干货度榜单条目：[bvid, 干货度, 标题]。"""
+    return [row["bvid"], row["dry_goods_ratio"], row["title"]]
+
+
+def _scatter_entry(row):
+    """散点图条目：[bvid, 播放量, 时长(秒), 干货度, 标题, UP 主]。"""
+    return [row["bvid"], row["view_count"] or 0, row["duration"], row["dry_goods_ratio"], row["title"], row["up_name"]]
+
+
+def _in_scatter_range(row):
+    duration = row.get("duration") or 0
+    return SCATTER_MIN_DURATION < duration < SCATTER_MAX_DURATION
+
+
+def _score(value):
+    """排序键：NULL 与 MySQL 的 DESC 排序一致，排在最后。"""
+    return float("-inf") if value is None else value
+
+
+def _query_rank(cursor):
+    cursor.execute(
+        "SELECT bvid, title, dry_goods_ratio FROM videos ORDER BY dry_goods_ratio DESC LIMIT %s",
+        (RANK_SIZE,),
+    )
+    return [_rank_entry(row) for row in cursor.fetchall()]
+
+
+def _query_scatter(cursor):
+    cursor.execute(
+        "SELECT bvid, title, up_name, duration, view_count, dry_goods_ratio FROM videos "
+        "WHERE duration > %s AND duration < %s ORDER BY view_count DESC LIMIT %s",
+        (SCATTER_MIN_DURATION, SCATTER_MAX_DURATION, SCATTER_SIZE),
+    )
+    return [_scatter_entry(row) for row in cursor.fetchall()]
+
+
+def _merge_ranking(ranking, candidates, score_index, size, requery):
+    """
+    合并 Top-K 榜单：新分数只会让条目上榜或名次上升时直接合并；
+    已在榜条目分数下降时，第 K+1 名未知，退回一次带 LIMIT 的重查。
+    """
+    current = {entry[0]: entry for entry in ranking}
+    for cand in candidates:
+        old = current.get(cand[0])
+        if old is not None and _score(cand[score_index]) < _score(old[score_index]):
+            return requery()
+    current.update({cand[0]: cand for cand in candidates})
+    merged = sorted(current.values(), key=lambda e: _score(e[score_index]), reverse=True)
+    return merged[:size]
+
+
+def _write_snapshot(cursor, counters, payload):
+    cursor.execute(
+        """
+        INSERT INTO stats_snapshot (
+            name, total_videos, total_teachers, total_views, ratio_sum, ratio_count, payload, updated_at
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            total_videos = VALUES(total_videos),
+            total_teachers = VALUES(total_teachers),
+            total_views = VALUES(total_views),
+            ratio_sum = VALUES(ratio_sum),
+            ratio_count = VALUES(ratio_count),
+            payload = VALUES(payload),
+            updated_at = VALUES(updated_at);
+        """,
+        (
+            SNAPSHOT_NAME,
+            counters["total_videos"],
+            counters["total_teachers"],
+            counters["total_views"],
+            counters["ratio_sum"],
+            counters["ratio_count"],
+            json.dumps(payload, ensure_ascii=False),
+            datetime.now(),
+        ),
+    )
+
+
+def rebuild_from_cursor(cursor):
+    """全量重算：与旧版 /api/stats 的聚合口径一致。"""
+    cursor.execute(
+        """
+        SELECT COUNT(*) AS total_videos,
+               COUNT(DISTINCT up_name) AS total_teachers,
+               COALESCE(SUM(view_count), 0) AS total_views,
+               COALESCE(SUM(dry_goods_ratio), 0) AS ratio_sum,
+               COUNT(dry_goods_ratio) AS ratio_count
+        FROM videos
+        """
+    )
+    row = cursor.fetchone()
+    counters = {
+        "total_videos": int(row["total_videos"]),
+        "total_teachers": int(row["total_teachers"]),
+        "total_views": int(row["total_views"]),
+        "ratio_sum": float(row["ratio_sum"]),
+        "ratio_count": int(row["ratio_count"]),
+    }
+
+    cursor.execute(
+        "SELECT category, COUNT(bvid) AS cnt FROM videos "
+        "WHERE category IS NOT NULL AND category != '' GROUP BY category"
+    )
+    payload = {
+        "category_counts": {r["category"]: int(r["cnt"]) for r in cursor.fetchall()},
+        "rank": _query_rank(cursor),
+        "scatter": _query_scatter(cursor),
+    }
+    _write_snapshot(cursor, counters, payload)
+
+
+def rebuild_stats_snapshot(connection):
+    """全量重建命令入口（flask rebuild-stats）：传入 pymysql 兼容连接。"""
+    with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+        lock_stats_snapshot(cursor)     # 与爬虫的增量维护互斥，避免重算期间提交的批次被覆盖
+        rebuild_from_cursor(cursor)
+    connection.commit()
+
+
+def lock_stats_snapshot(cursor):
+    """
+    在读取本批旧值（before）之前、同一事务内调用：锁住快照行，并发的落库事务在这里排队。
+    否则两个事务可能读到同一份旧值，各自按差值累加后计数重复。
+    """
+    cursor.execute("SELECT name FROM stats_snapshot WHERE name = %s FOR UPDATE", (SNAPSHOT_NAME,))
+    cursor.fetchone()
+
+
+def update_stats_snapshot(cursor, before, after):
+    """
+    增量维护：在 videos upsert 之后、同一事务内调用（before 须在 lock_stats_snapshot 之后读取）。
+    before: {bvid: 旧行}，只包含本批中已存在的视频；after: 本批落库后的行。
+    """
+    if not after:
+        return
+    cursor.execute("SELECT * FROM stats_snapshot WHERE name = %s FOR UPDATE", (SNAPSHOT_NAME,))
+    snapshot = cursor.fetchone()
+    if not snapshot:
+        # 首次运行还没有快照：本批已写入，直接全量算一次即可
+        rebuild_from_cursor(cursor)
+        return
+
+    counters = {
+        "total_videos": snapshot["total_videos"] or 0,
+        "total_teachers": snapshot["total_teachers"] or 0,
+        "total_views": snapshot["total_views"] or 0,
+        "ratio_sum": snapshot["ratio_sum"] or 0.0,
+        "ratio_count": snapshot["ratio_count"] or 0,
+    }
+    payload = json.loads(snapshot["payload"] or "{}")
+    category_counts = payload.get("category_counts", {})
+
+    new_rows = [row for row in after if row["bvid"] not in before]
+    counters["total_videos"] += len(new_rows)
+    for row in after:
+        old = before.get(row["bvid"], {})
+        counters["total_views"] += (row["view_count"] or 0) - (old.get("view_count") or 0)
+        if old.get("dry_goods_ratio") is not None:
+            counters["ratio_sum"] -= old["dry_goods_ratio"]
+            counters["ratio_count"] -= 1
+        if row["dry_goods_ratio"] is not None:
+            counters["ratio_sum"] += row["dry_goods_ratio"]
+            counters["ratio_count"] += 1
+
+    # category 不在 upsert 的更新列里，只有新视频会改变分布
+    new_per_up = {}
+    for row in new_rows:
+        if row["category"]:
+            category_counts[row["category"]] = category_counts.get(row["category"], 0) + 1
+        if row["up_name"] is not None:
+            new_per_up[row["up_name"]] = new_per_up.get(row["up_name"], 0) + 1
+
+    # 落库后某 UP 的视频数恰好等于本批新增数，说明是新出现的 UP 主
+    if new_per_up:
+        placeholders = ", ".join(["%s"] * len(new_per_up))
+        cursor.execute(
+            f"SELECT up_name, COUNT(*) AS cnt FROM videos WHERE up_name IN ({placeholders}) GROUP BY up_name",
+            list(new_per_up),
+        )
+        for r in cursor.fetchall():
+            if int(r["cnt"]) == new_per_up.get(r["up_name"]):
+                counters["total_teachers"] += 1
+
+    payload["category_counts"] = category_counts
+    payload["rank"] = _merge_ranking(
+        payload.get("rank", []), [_rank_entry(r) for r in after], 1, RANK_SIZE, lambda: _query_rank(cursor)
+    )
+    payload["scatter"] = _merge_ranking(
+        payload.get("scatter", []),
+        [_scatter_entry(r) for r in after if _in_scatter_range(r)],
+        1,
+        SCATTER_SIZE,
+        lambda: _query_scatter(cursor),
+    )
+    _write_snapshot(cursor, counters, payload)
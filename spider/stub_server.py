@@ -0,0 +1,146 @@
+"""本地桩/回放服务：模拟 B 站搜索接口，用于离线测试/压测抓取流程。
+
+默认按 关键词 + 页码 返回确定性的假数据；--fixtures 指定录制目录（BILI_RECORD_DIR / --record 生成）时回放真实响应，
+未录制的页返回空结果。可注入延迟抖动、HTTP 503 错误和 code != 0 的限流响应。
+用法：
+    python spider/stub_server.py --port 8765 --pages 5 --latency 0.2
+    python spider/stub_server.py --fixtures fixtures/search --latency 0.3 --jitter 0.2 --error-rate 0.02 --throttle-rate 0.01
+    BILI_SEARCH_URL=http://127.0.0.1:8765/x/web-interface/search/type python spider/bilibili_api.py
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from spider.fixtures import load_fixtures  # noqa: E402
+
+SEARCH_PATH = "/x/web-interface/search/type"
+
+
+def fake_items(keyword, page, per_page):
+    """同一 关键词 + 页码 每次生成相同的结果，便于重复对比。"""
+    items = []
+    for i in range(per_page):
+        digest = hashlib.md5(f"{keyword}-{page}-{i}".encode("utf-8")).hexdigest()
+        seed = int(digest[:8], 16)
+        items.append({
+            "bvid": "BV1" + digest[:9],
+            "title": f'<em class="keyword">{keyword}</em> 第{page}页 第{i + 1}讲',
+            "author": f"UP主{seed % 50}",
+            "mid": seed % 100000,
+            "upic": "",
+            "pic": f"//i0.hdslb.com/bfs/archive/{digest}.jpg",
+            "play": seed % 500000,
+            "favorites": seed % 20000,
+            "video_review": seed % 3000,
+            "review": seed % 1000,
+            "duration": f"{seed % 90}:{seed % 60:02d}",
+            "pubdate": 1600000000 + seed % 100000000,
+            "tags": keyword,
+        })
+    return items
+
+
+# B 站风控拦截时的典型响应：HTTP 200，业务码非 0
+THROTTLED_RESPONSE = {"code": -412, "message": "请求被拦截", "data": None}
+
+
+class StubSearchHandler(BaseHTTPRequestHandler):
+    pages = 5
+    per_page = 20
+    latency = 0.0
+    jitter = 0.0            # 在 latency 基础上再随机增加 0~jitter 秒
+    error_rate = 0.0        # 返回 HTTP 503 的概率
+    throttle_rate = 0.0     # 返回 code=-412 的概率
+    fixtures = None         # {(关键词, 页码): 响应}，None 时生成假数据
+    rng = random.Random()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != SEARCH_PATH:
+            self.send_error(404)
+            return
+        query = parse_qs(url.query)
+        keyword = query.get("keyword", [""])[0]
+        try:
+            page = int(query.get("page", ["1"])[0])
+        except ValueError:
+            page = 1
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.send_error(503)
+            return
+        if self.throttle_rate and self.rng.random() < self.throttle_rate:
+            payload = THROTTLED_RESPONSE
+        elif self.fixtures is not None:
+            payload = self.fixtures.get((keyword, page)) or {"code": 0, "message": "0", "data": {"result": []}}
+        else:
+            result = fake_items(keyword, page, self.per_page) if 1 <= page <= self.pages else []
+            payload = {"code": 0, "message": "0", "data": {"result": result}}
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(host="127.0.0.1", port=0, pages=5, per_page=20, latency=0.0, jitter=0.0,
+                      error_rate=0.0, throttle_rate=0.0, fixtures=None, seed=None):
+    """在后台线程启动桩服务，返回 (server, 搜索接口 URL)；fixtures 为录制目录或已加载的字典。用完调用 server.shutdown()。"""
+    if isinstance(fixtures, str):
+        fixtures = load_fixtures(fixtures)
+    handler = type("Handler", (StubSearchHandler,), {
+        "pages": pages, "per_page": per_page, "latency": latency, "jitter": jitter,
+        "error_rate": error_rate, "throttle_rate": throttle_rate, "fixtures": fixtures, "rng": random.Random(seed),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-search", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}{SEARCH_PATH}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="B 站搜索接口本地桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=5, help="每个关键词返回多少页数据")
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的模拟延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="额外的随机延迟上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 HTTP 503 的概率")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="返回 code=-412 限流响应的概率")
+    parser.add_argument("--fixtures", help="回放的录制目录；不指定则生成假数据")
+    parser.add_argument("--seed", type=int, help="故障注入的随机种子")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(
+        args.host, args.port, args.pages, args.per_page, args.latency, args.jitter,
+        args.error_rate, args.throttle_rate, args.fixtures, args.seed,
+    )
+    print(f"桩服务已启动: {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+爬虫任务持久化：任务状态/参数/日志与页级检查点存本地 SQLite，进程重启后可从最后提交的页继续。
+待执行队列也在这张表里（status = pending，按 queued_seq 先进先出），多个 Web 进程与 worker 进程看到的是同一个队列。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from spider.crawl_state import STATE_PATH
+
+LOG_KEEP = 20                               # 每个任务保留的最近日志行数
+RESULT_TTL = timedelta(hours=24)            # 结束的任务及其结果文件保留时长
+# cancelling：已请求取消，worker 仍在收尾（刷完写库队列等），收尾结束后才由它改为 cancelled
+ACTIVE_STATUSES = ("pending", "running", "cancelling")
+RESUMABLE_STATUSES = ("interrupted", "cancelled", "failed")
+HEARTBEAT_TIMEOUT = 30                      # 执行中的任务超过该秒数没有心跳，视为 worker 已退出
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _pid_alive(pid):
+    """本机是否存在该进程；无法判断（如无权限）时按存活处理，交给心跳超时兜底。"""
+    if not pid:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def params_key(params):
+    """参数规范化后的字符串，用于识别“完全相同”的任务。"""
+    return json.dumps(params or {}, sort_keys=True, ensure_ascii=False)
+
+
+class TaskStore:
+    """线程内复用连接（sqlite3 连接不能跨线程），WAL 模式下读写互不阻塞。"""
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS spider_tasks (
+                id TEXT PRIMARY KEY,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL DEFAULT 0,
+                message TEXT NOT NULL DEFAULT '',
+                logs TEXT NOT NULL DEFAULT '[]',
+                result_count INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS task_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id TEXT NOT NULL,
+                type TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_task_events_task_id ON task_events (task_id, id);
+            CREATE TABLE IF NOT EXISTS task_checkpoints (
+                task_id TEXT NOT NULL,
+                keyword_index INTEGER NOT NULL,
+                page INTEGER NOT NULL,
+                finished INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (task_id, keyword_index)
+            );
+            """
+        )
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(spider_tasks)")}
+        if "result_count" not in columns:   # 兼容结果落盘之前创建的库
+            conn.execute("ALTER TABLE spider_tasks ADD COLUMN result_count INTEGER NOT NULL DEFAULT 0")
+        # 共享队列：排队序号、参数指纹（去重），以及执行中任务的 worker pid 与心跳（墙钟秒）
+        for name, ddl in (("params_key", "TEXT"), ("queued_seq", "INTEGER"),
+                          ("worker_pid", "INTEGER"), ("heartbeat_at", "REAL")):
+            if name not in columns:
+                conn.execute(f"ALTER TABLE spider_tasks ADD COLUMN {name} {ddl}")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_spider_tasks_queue ON spider_tasks (status, queued_seq)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():     # fork 后不沿用父进程打开的连接
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _immediate(self):
+        """BEGIN IMMEDIATE 事务：先拿写锁再读，多个进程的 入队/领取 判断不会交错。"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def create(self, task_id, params):
+        now = _now()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO spider_tasks (id, params, status, created_at, updated_at) VALUES (?, ?, 'pending', ?, ?)",
+                (task_id, json.dumps(params, ensure_ascii=False), now, now),
+            )
+
+    def get(self, task_id):
+        row = self._conn().execute("SELECT * FROM spider_tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        task = dict(row)
+        task["params"] = json.loads(task["params"])
+        task["logs"] = json.loads(task["logs"])
+        return task
+
+    def update(self, task_id, event=None, **fields):
+        """
+        只更新传入的列；logs 传列表，自动截断到最近 LOG_KEEP 行。
+        event=(类型, 数据) 在同一事务内追加到事件流；status 变化时自动追加 status 事件（SSE 推送用）。
+        """
+        with self._conn() as conn:
+            self._apply(conn, task_id, event, fields)
+
+    @staticmethod
+    def _apply(conn, task_id, event, fields, where=""):
+        """update() 的事务内部分；where 为附加条件（如只改仍在排队的任务），返回是否命中。"""
+        events = [event] if event else []
+        if "status" in fields:
+            events.append(("status", {key: fields[key] for key in ("status", "message", "progress") if key in fields}))
+        if "logs" in fields:
+            fields["logs"] = json.dumps(list(fields["logs"])[-LOG_KEEP:], ensure_ascii=False)
+        fields["updated_at"] = _now()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        cur = conn.execute(f"UPDATE spider_tasks SET {columns} WHERE id = ?{where}", (*fields.values(), task_id))
+        if not cur.rowcount:
+            return False
+        conn.executemany(
+            "INSERT INTO task_events (task_id, type, data) VALUES (?, ?, ?)",
+            [(task_id, kind, json.dumps(data, ensure_ascii=False)) for kind, data in events],
+        )
+        return True
+
+    def enqueue(self, task_id, params, create=True):
+        """
+        放入共享队列并返回 (实际排队的任务 id, 是否与已排队任务重复)：参数完全相同的任务已在排队时不重复入队。
+        create 为真时新建任务记录，续跑已有任务时传 False（仅把状态改回 pending、排到队尾）。
+        """
+        key = params_key(params)
+        with self._immediate() as conn:
+            row = conn.execute(
+                "SELECT id FROM spider_tasks WHERE status = 'pending' AND params_key = ? ORDER BY queued_seq LIMIT 1",
+                (key,),
+            ).fetchone()
+            if row is not None:
+                return row["id"], True
+            seq = conn.execute("SELECT COALESCE(MAX(queued_seq), 0) + 1 FROM spider_tasks").fetchone()[0]
+            if create:
+                now = _now()
+                conn.execute(
+                    "INSERT INTO spider_tasks (id, params, status, created_at, updated_at, params_key, queued_seq) "
+                    "VALUES (?, ?, 'pending', ?, ?, ?, ?)",
+                    (task_id, json.dumps(params, ensure_ascii=False), now, now, key, seq),
+                )
+            else:
+                self._apply(conn, task_id, None, {"status": "pending", "params_key": key, "queued_seq": seq,
+                                                  "worker_pid": None, "heartbeat_at": None})
+        return task_id, False
+
+    def claim(self, workers, pid):
+        """
+        worker 领取队首任务：心跳未过期的执行中任务少于 workers 时，把最早排队的任务标为 running 并记下 pid 与心跳，
+        返回任务 id；没有空位或队列为空返回 None。workers 是所有进程合计的上限。
+        """
+        with self._immediate() as conn:
+            running = conn.execute(
+                "SELECT COUNT(*) FROM spider_tasks WHERE status IN ('running', 'cancelling') AND heartbeat_at >= ?",
+                (time.time() - HEARTBEAT_TIMEOUT,),
+            ).fetchone()[0]
+            if running >= workers:
+                return None
+            row = conn.execute(
+                "SELECT id FROM spider_tasks WHERE status = 'pending' ORDER BY queued_seq LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._apply(conn, row["id"], None, {"status": "running", "message": "", "worker_pid": pid,
+                                                "heartbeat_at": time.time()})
+            return row["id"]
+
+    def heartbeat(self, task_id):
+        """执行中的 worker 定期调用，证明任务仍有人在跑（不写事件、不改 updated_at）。"""
+        with self._conn() as conn:
+            conn.execute("UPDATE spider_tasks SET heartbeat_at = ? WHERE id = ?", (time.time(), task_id))
+
+    def cancel_pending(self, task_id):
+        """仍在排队的任务直接改为 cancelled（出队），返回是否命中；已被领取的任务不受影响。"""
+        with self._conn() as conn:
+            return self._apply(conn, task_id, None, {"status": "cancelled"}, where=" AND status = 'pending'")
+
+    def request_cancel(self, task_id):
+        """执行中的任务改为 cancelling，worker 轮询到后中断并在收尾完成后改为 cancelled；返回是否命中。"""
+        with self._conn() as conn:
+            return self._apply(conn, task_id, None, {"status": "cancelling"}, where=" AND status = 'running'")
+
+    def finish(self, task_id, status, **fields):
+        """worker 写入最终状态；只覆盖仍处于 running/cancelling 的任务，且已请求取消的任务总是记为 cancelled。"""
+        with self._conn() as conn:
+            if status != "cancelled" and self._apply(
+                conn, task_id, None, {"status": status, **fields}, where=" AND status = 'running'"
+            ):
+                return
+            self._apply(conn, task_id, None, {"status": "cancelled"}, where=" AND status = 'cancelling'")
+
+    def fail_worker(self, pid, message):
+        """worker 进程异常退出时调用：它名下执行中的任务标为 failed（收尾中的标为 cancelled），返回条数。"""
+        rows = self._conn().execute(
+            "SELECT id FROM spider_tasks WHERE status IN ('running', 'cancelling') AND worker_pid = ?", (pid,)
+        ).fetchall()
+        for row in rows:
+            self.finish(row["id"], "failed", message=message)
+        return len(rows)
+
+    def queue_position(self, task_id):
+        """排队位置（1 起），不在排队返回 None。"""
+        row = self._conn().execute(
+            """
+            SELECT COUNT(*) AS position FROM spider_tasks
+            WHERE status = 'pending' AND queued_seq <= (
+                SELECT queued_seq FROM spider_tasks WHERE id = ? AND status = 'pending'
+            )
+            """,
+            (task_id,),
+        ).fetchone()
+        return row["position"] or None
+
+    def is_active(self, task_id):
+        """排队中，或执行中且心跳未过期。"""
+        row = self._conn().execute(
+            """
+            SELECT 1 FROM spider_tasks
+            WHERE id = ? AND (status = 'pending' OR (status IN ('running', 'cancelling') AND heartbeat_at >= ?))
+            """,
+            (task_id, time.time() - HEARTBEAT_TIMEOUT),
+        ).fetchone()
+        return row is not None
+
+    def queue_counts(self):
+        """(心跳未过期的执行中任务数, 排队任务数)。"""
+        row = self._conn().execute(
+            """
+            SELECT SUM(status IN ('running', 'cancelling') AND heartbeat_at >= ?) AS running,
+                   SUM(status = 'pending') AS pending
+            FROM spider_tasks WHERE status IN ('pending', 'running', 'cancelling')
+            """,
+            (time.time() - HEARTBEAT_TIMEOUT,),
+        ).fetchone()
+        return row["running"] or 0, row["pending"] or 0
+
+    def events_after(self, task_id, last_id=0, limit=500):
+        """事件流中 id 大于 last_id 的事件 [(id, 类型, 数据)]，id 全局递增，可直接作为 SSE 的事件 id。"""
+        rows = self._conn().execute(
+            "SELECT id, type, data FROM task_events WHERE task_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (task_id, last_id, limit),
+        ).fetchall()
+        return [(row["id"], row["type"], json.loads(row["data"])) for row in rows]
+
+    def last_event_id(self, task_id):
+        row = self._conn().execute("SELECT MAX(id) AS id FROM task_events WHERE task_id = ?", (task_id,)).fetchone()
+        return row["id"] or 0
+
+    def recover_stale(self):
+        """
+        标记已无人执行的任务为 interrupted 等待续跑（收尾中的 cancelling 任务直接记为 cancelled）：
+        心跳超过 HEARTBEAT_TIMEOUT 未刷新，或记录的 worker 进程在本机已不存在。心跳正常的任务
+        （其他 Web 进程拉起的 worker 正在执行）不受影响；排队中的任务留在共享队列里，由执行器继续领取。返回标记的条数。
+        """
+        rows = self._conn().execute(
+            "SELECT id, worker_pid, heartbeat_at FROM spider_tasks WHERE status IN ('running', 'cancelling')"
+        ).fetchall()
+        cutoff = time.time() - HEARTBEAT_TIMEOUT
+        stale = [row["id"] for row in rows
+                 if row["heartbeat_at"] is None or row["heartbeat_at"] < cutoff or not _pid_alive(row["worker_pid"])]
+        for task_id in stale:
+            self.finish(task_id, "interrupted")
+        return len(stale)
+
+    def expired(self, ttl=RESULT_TTL):
+        """已结束且超过 ttl 未更新的任务 id。"""
+        cutoff = (datetime.now() - ttl).isoformat(timespec="seconds")
+        placeholders = ", ".join("?" * len(ACTIVE_STATUSES))
+        rows = self._conn().execute(
+            f"SELECT id FROM spider_tasks WHERE status NOT IN ({placeholders}) AND updated_at < ?",
+            (*ACTIVE_STATUSES, cutoff),
+        ).fetchall()
+        return [row["id"] for row in rows]
+
+    def delete(self, task_ids):
+        if not task_ids:
+            return
+        placeholders = ", ".join("?" * len(task_ids))
+        with self._conn() as conn:
+            conn.execute(f"DELETE FROM task_checkpoints WHERE task_id IN ({placeholders})", task_ids)
+            conn.execute(f"DELETE FROM task_events WHERE task_id IN ({placeholders})", task_ids)
+            conn.execute(f"DELETE FROM spider_tasks WHERE id IN ({placeholders})", task_ids)
+
+    def checkpoint(self, task_id):
+        return TaskCheckpoint(self, task_id)
+
+
+class TaskCheckpoint:
+    """crawl() 的检查点接口：按关键词序号记录已落库的最后一页，以及该关键词是否已抓完。"""
+
+    def __init__(self, store, task_id):
+        self.store = store
+        self.task_id = task_id
+
+    def load(self):
+        rows = self.store._conn().execute(
+            "SELECT keyword_index, page, finished FROM task_checkpoints WHERE task_id = ?", (self.task_id,)
+        ).fetchall()
+        return {row["keyword_index"]: (row["page"], bool(row["finished"])) for row in rows}
+
+    def commit(self, keyword_index, page, finished=False):
+        with self.store._conn() as conn:
+            conn.execute(
+                """
+                INSERT INTO task_checkpoints (task_id, keyword_index, page, finished) VALUES (?, ?, ?, ?)
+                ON CONFLICT(task_id, keyword_index) DO UPDATE SET
+                    page = MAX(page, excluded.page),
+                    finished = MAX(finished, excluded.finished)
+                """,
+                (self.task_id, keyword_index, page, int(finished)),
+            )
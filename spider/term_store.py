@@ -0,0 +1,93 @@
+"""词频存储：视频入库时分词一次，维护 UP 主词频表（词云）和全局标签计数（热门标签）。"""
+
+import re
+from collections import Counter
+
+import pymysql
+
+from spider.search_index import encode_terms
+from spider.token_cache import cut_many, video_text
+
+WORD_CLOUD_SIZE = 150
+MAX_TERM_LENGTH = 50    # 与 up_terms.term / tag_counts.tag 列宽一致
+REBUILD_BATCH = 1000
+
+# 词云停用词：高频虚词 + 站内几乎每条都有的泛词
+STOP_WORDS = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很',
+              '到', '说', '去', '你', '会', '着', '没有', '看', '怎么', '视频', '高数', '数学', '考研',
+              '这一', '这个', '那个', '还是', '因为', '所以', '如果', '就是', '什么', '主要', '很多', '非常',
+              '大家'}
+_TAG_SPLIT_RE = re.compile(r'[\,，、\s]+')
+
+
+def count_words(tokens):
+    """词云用词：去停用词、单字、空白和纯数字。"""
+    return Counter(w[:MAX_TERM_LENGTH] for w in tokens
+                   if len(w) > 1 and not w.isspace() and w not in STOP_WORDS and not w.isdigit())
+
+
+def split_tags(tags):
+    """标签按中英文逗号、顿号、空白拆分。"""
+    return [t[:MAX_TERM_LENGTH] for t in _TAG_SPLIT_RE.split(tags or "") if t]
+
+
+def _store_rows(cursor, rows):
+    """写入 video_tokens，并把词频/标签数累加到 up_terms 与 tag_counts。"""
+    token_values = []
+    up_terms = Counter()
+    tag_counts = Counter()
+    tokenized = cut_many([video_text(row.get("title"), row.get("tags")) for row in rows])
+    for row, tokens in zip(rows, tokenized):
+        words = count_words(tokens)
+        tags = split_tags(row.get("tags"))
+        token_values.append((row["bvid"], encode_terms(words), " ".join(tags)))
+        if row.get("up_name") is not None:
+            for term, tf in words.items():
+                up_terms[(row["up_name"], term)] += tf
+        tag_counts.update(tags)
+    if not token_values:
+        return
+    cursor.executemany(
+        """
+        INSERT INTO video_tokens (bvid, words, tags) VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE words = VALUES(words), tags = VALUES(tags);
+        """,
+        token_values,
+    )
+    if up_terms:
+        cursor.executemany(
+            "INSERT INTO up_terms (up_name, term, cnt) VALUES (%s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE cnt = cnt + VALUES(cnt);",
+            [(up, term, cnt) for (up, term), cnt in up_terms.items()],
+        )
+    if tag_counts:
+        cursor.executemany(
+            "INSERT INTO tag_counts (tag, cnt) VALUES (%s, %s) ON DUPLICATE KEY UPDATE cnt = cnt + VALUES(cnt);",
+            list(tag_counts.items()),
+        )
+
+
+def update_term_store(cursor, before, after):
+    """增量维护：标题/标签/UP 主不在 upsert 的更新列里，只需处理新视频。"""
+    _store_rows(cursor, [row for row in after if row["bvid"] not in before])
+
+
+def rebuild_term_store(connection):
+    """全量重建命令入口（flask rebuild-terms）：清空后按批重新分词累加。"""
+    with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+        cursor.execute("DELETE FROM video_tokens")
+        cursor.execute("DELETE FROM up_terms")
+        cursor.execute("DELETE FROM tag_counts")
+        connection.commit()
+        last_bvid = ""
+        while True:
+            cursor.execute(
+                "SELECT bvid, title, tags, up_name FROM videos WHERE bvid > %s ORDER BY bvid LIMIT %s",
+                (last_bvid, REBUILD_BATCH),
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            _store_rows(cursor, rows)
+            connection.commit()
+            last_bvid = rows[-1]["bvid"]
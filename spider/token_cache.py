@@ -0,0 +1,177 @@
+"""
+分词缓存：jieba 精确模式的切分结果按文本哈希存本地 SQLite（token_cache.db），
+模型训练、爬虫分类、推荐向量与词云共用，同一段标题 + 标签只分词一次；重新训练只需切分新增或改动过的文本。
+大批量未命中时按块分给进程池并行分词；条目超过上限后按最近使用时间淘汰。
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from spider.model_loader import get_tokenizer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.environ.get("BILI_TOKEN_CACHE", os.path.join(ROOT_DIR, "token_cache.db"))
+MAX_ENTRIES = int(os.environ.get("BILI_TOKEN_CACHE_SIZE", 1_000_000))
+TOKENIZE_WORKERS = int(os.environ.get("BILI_TOKENIZE_WORKERS", os.cpu_count() or 1))
+EVICT_SLACK = 0.1           # 超出上限 10% 才淘汰一次，避免每次写入都排序删除
+TOUCH_INTERVAL = 86400      # 命中条目的最近使用时间最多每天刷新一次，减少写放大
+PARALLEL_MIN = 5000         # 未命中数达到该值才启用进程池（每个子进程首次分词要加载约 1 秒的词典）
+CHUNK_SIZE = 2000
+LOOKUP_BATCH = 500          # 单条 SQL 的参数个数上限 999
+SEPARATOR = "\x1f"          # 词之间的分隔符；jieba 会把空白也切成词，不能用空格
+_HIGHLIGHT_RE = re.compile(r"</?em[^>]*>")    # 搜索接口标题里的关键词高亮，随搜索词变化
+_SPACE_RE = re.compile(r"\s+")
+
+
+def video_text(title, tags):
+    """
+    视频分词输入的唯一规范形式：标题 + 空格 + 标签，去掉搜索高亮、折叠空白。
+    训练、爬虫分类、推荐向量与词云都经它得到分词文本，同一视频在各处命中同一条缓存。
+    """
+    return _SPACE_RE.sub(" ", _HIGHLIGHT_RE.sub("", f"{title or ''} {tags or ''}")).strip()
+
+
+def text_key(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _cut_chunk(texts):
+    tokenizer = get_tokenizer()
+    return [list(tokenizer.cut(text)) for text in texts]
+
+
+class TokenCache:
+    """线程内复用 SQLite 连接；多个进程（Web、爬虫子进程、训练脚本）可同时读写同一个缓存文件。"""
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tokens (key BLOB PRIMARY KEY, tokens TEXT NOT NULL, used_at INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_tokens_used_at ON tokens (used_at)")
+        conn.commit()
+        self._entries = conn.execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():     # fork 后不沿用父进程打开的连接
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _lookup(self, keys):
+        found, stale = {}, []
+        now = int(time.time())
+        conn = self._conn()
+        for start in range(0, len(keys), LOOKUP_BATCH):
+            batch = keys[start: start + LOOKUP_BATCH]
+            placeholders = ", ".join("?" * len(batch))
+            for key, tokens, used_at in conn.execute(
+                f"SELECT key, tokens, used_at FROM tokens WHERE key IN ({placeholders})", batch
+            ):
+                found[key] = tokens.split(SEPARATOR) if tokens else []
+                if now - used_at >= TOUCH_INTERVAL:
+                    stale.append((now, key))
+        if stale:
+            with conn:
+                conn.executemany("UPDATE tokens SET used_at = ? WHERE key = ?", stale)
+        return found
+
+    def _store(self, entries):
+        now = int(time.time())
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO tokens (key, tokens, used_at) VALUES (?, ?, ?)",
+                [(key, SEPARATOR.join(tokens), now) for key, tokens in entries.items()],
+            )
+        with self._lock:
+            self._entries += len(entries)
+            due = self._entries > self.max_entries * (1 + EVICT_SLACK)
+        if due:
+            self.evict()
+
+    def evict(self):
+        """删除最久未使用的条目，直到不超过 max_entries；返回删除条数。"""
+        with self._conn() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+            excess = total - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM tokens WHERE key IN (SELECT key FROM tokens ORDER BY used_at LIMIT ?)", (excess,)
+                )
+        with self._lock:
+            self._entries = min(total, self.max_entries)
+        return max(excess, 0)
+
+    def cut_many(self, texts, workers=1):
+        """
+        批量分词，返回与 texts 一一对应的词列表（jieba.cut 原样输出，过滤规则由调用方决定）。
+        workers > 1 且去重后的未命中数不少于 PARALLEL_MIN 时，按 CHUNK_SIZE 分块交给进程池；
+        Web 进程里保持默认的 1，避免在多线程进程中 fork。
+        """
+        texts = [text if isinstance(text, str) else "" for text in texts]
+        keys = [text_key(text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        with self._lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            pending = list(missing.values())
+            if workers > 1 and len(pending) >= PARALLEL_MIN:
+                chunks = [pending[i: i + CHUNK_SIZE] for i in range(0, len(pending), CHUNK_SIZE)]
+                with ProcessPoolExecutor(min(workers, len(chunks))) as pool:
+                    results = [tokens for chunk in pool.map(_cut_chunk, chunks) for tokens in chunk]
+            else:
+                results = _cut_chunk(pending)
+            entries = dict(zip(missing, results))
+            self._store(entries)
+            found.update(entries)
+        return [found[key] for key in keys]
+
+    def cut(self, text):
+        return self.cut_many([text])[0]
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"entries": self._entries, "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / total, 4) if total else None}
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_token_cache():
+    """进程内共享的默认缓存（首次调用时打开 CACHE_PATH）。"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = TokenCache()
+        return _default_cache
+
+
+def cut_many(texts, workers=1):
+    return get_token_cache().cut_many(texts, workers)
+
+
+def cut(text):
+    return get_token_cache().cut(text)
@@ -0,0 +1,169 @@
+"""UP 主指标汇总：爬虫落库时按 UP 增量累加，/api/compare_data 只读两行汇总 + 一条归一化基准。"""
+
+import json
+from datetime import datetime
+
+import pymysql
+
+MAXIMA_NAME = "up_maxima"   # 归一化基准存放在 stats_snapshot 中的快照名
+DERIVED_FIELDS = ("fav_rate", "interact_avg", "depth_score", "activity")
+
+
+def safe_rate(numerator, denominator):
+    """分母为 0 时返回 0，避免抛异常。"""
+    return round((numerator / denominator) * 100, 2) if denominator else 0
+
+
+def derive_metrics(row, now=None):
+    """由累加值计算雷达图的原始指标，口径与旧版 compare_data 一致。"""
+    now = now or datetime.now()
+    video_count = row["video_count"] or 0
+    total_views = row["total_views"] or 0
+    total_fav = row["total_fav"] or 0
+    total_interact = (row["total_reply"] or 0) + (row["total_danmaku"] or 0)
+    duration_hours = (row["total_duration"] or 0) / 3600 or 0
+    first_pub = row["first_pub"]
+    if first_pub:
+        days_span = max((now - first_pub).total_seconds() / 86400, 1)
+    else:
+        days_span = 30  # 无发布时间数据时给一个平滑基准
+    return {
+        "fav_rate": safe_rate(total_fav, total_views),
+        "interact_avg": total_interact / max(video_count, 1) / 2,  # (弹幕+评论)/视频数/2
+        "depth_score": total_fav / max(duration_hours, 1),          # 收藏/时长(小时)
+        "activity": (video_count / days_span) * 7,                  # 每周发片数
+    }
+
+
+def _refresh_derived(cursor, up_names, now):
+    placeholders = ", ".join(["%s"] * len(up_names))
+    cursor.execute(f"SELECT * FROM up_stats WHERE up_name IN ({placeholders})", list(up_names))
+    values = []
+    for row in cursor.fetchall():
+        derived = derive_metrics(row, now)
+        values.append(tuple(derived[f] for f in DERIVED_FIELDS) + (now, row["up_name"]))
+    if values:
+        cursor.executemany(
+            "UPDATE up_stats SET fav_rate = %s, interact_avg = %s, depth_score = %s, activity = %s, "
+            "updated_at = %s WHERE up_name = %s",
+            values,
+        )
+
+
+def _refresh_maxima(cursor, now):
+    """各指标上都有索引，MAX 直接走索引，不扫 UP 表。"""
+    cursor.execute(
+        "SELECT MAX(total_views) AS views, MAX(fav_rate) AS fav_rate, MAX(interact_avg) AS interact, "
+        "MAX(depth_score) AS depth, MAX(activity) AS activity FROM up_stats"
+    )
+    row = cursor.fetchone() or {}
+    maxima = {key: float(value or 0) or 1 for key, value in row.items()}
+    cursor.execute(
+        """
+        INSERT INTO stats_snapshot (name, payload, updated_at) VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE payload = VALUES(payload), updated_at = VALUES(updated_at);
+        """,
+        (MAXIMA_NAME, json.dumps(maxima), now),
+    )
+
+
+def lock_up_rollup(cursor, up_names):
+    """
+    在读取本批旧值（before）之前、同一事务内调用：锁住归一化基准行与本批涉及的 UP 汇总行（FOR UPDATE），
+    并发的落库事务与全量重建在这里排队，不会基于同一份旧值重复累加差值。
+    """
+    cursor.execute("SELECT name FROM stats_snapshot WHERE name = %s FOR UPDATE", (MAXIMA_NAME,))
+    cursor.fetchall()
+    up_names = sorted({name for name in up_names if name is not None})
+    if up_names:
+        placeholders = ", ".join(["%s"] * len(up_names))
+        cursor.execute(f"SELECT up_name FROM up_stats WHERE up_name IN ({placeholders}) FOR UPDATE", up_names)
+        cursor.fetchall()
+
+
+def update_up_rollup(cursor, before, after):
+    """
+    增量维护：在 videos upsert 之后、同一事务内调用（before 须在 lock_up_rollup 之后读取）。
+    播放/收藏/评论按新旧差值累加；弹幕、时长、发布时间不在 upsert 更新列里，只统计新视频。
+    """
+    deltas = {}
+    for row in after:
+        if row["up_name"] is None:
+            continue
+        old = before.get(row["bvid"])
+        d = deltas.setdefault(row["up_name"], {
+            "video_count": 0, "views": 0, "fav": 0, "reply": 0, "danmaku": 0, "duration": 0, "first_pub": None,
+        })
+        d["views"] += (row["view_count"] or 0) - ((old or {}).get("view_count") or 0)
+        d["fav"] += (row["favorite_count"] or 0) - ((old or {}).get("favorite_count") or 0)
+        d["reply"] += (row["reply_count"] or 0) - ((old or {}).get("reply_count") or 0)
+        if old is None:
+            d["video_count"] += 1
+            d["danmaku"] += row["danmaku_count"] or 0
+            d["duration"] += row["duration"] or 0
+            if row["pubdate"] and (d["first_pub"] is None or str(row["pubdate"]) < str(d["first_pub"])):
+                d["first_pub"] = row["pubdate"]
+    if not deltas:
+        return
+
+    cursor.executemany(
+        """
+        INSERT INTO up_stats (
+            up_name, video_count, total_views, total_fav, total_reply, total_danmaku, total_duration, first_pub
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            video_count = video_count + VALUES(video_count),
+            total_views = total_views + VALUES(total_views),
+            total_fav = total_fav + VALUES(total_fav),
+            total_reply = total_reply + VALUES(total_reply),
+            total_danmaku = total_danmaku + VALUES(total_danmaku),
+            total_duration = total_duration + VALUES(total_duration),
+            first_pub = LEAST(COALESCE(first_pub, VALUES(first_pub)), COALESCE(VALUES(first_pub), first_pub));
+        """,
+        [
+            (up, d["video_count"], d["views"], d["fav"], d["reply"], d["danmaku"], d["duration"], d["first_pub"])
+            for up, d in deltas.items()
+        ],
+    )
+    now = datetime.now()
+    _refresh_derived(cursor, list(deltas), now)
+    _refresh_maxima(cursor, now)
+
+
+def rebuild_up_rollup(connection):
+    """全量重建命令入口（flask rebuild-up-stats）：一次 GROUP BY 重算全部 UP，同时刷新随时间变化的活跃度。"""
+    now = datetime.now()
+    with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+        lock_up_rollup(cursor, [])      # 与爬虫的增量累加互斥，避免重算期间提交的批次被覆盖或重复计入
+        cursor.execute(
+            """
+            SELECT up_name,
+                   COUNT(bvid) AS video_count,
+                   COALESCE(SUM(view_count), 0) AS total_views,
+                   COALESCE(SUM(favorite_count), 0) AS total_fav,
+                   COALESCE(SUM(reply_count), 0) AS total_reply,
+                   COALESCE(SUM(danmaku_count), 0) AS total_danmaku,
+                   COALESCE(SUM(duration), 0) AS total_duration,
+                   MIN(pubdate) AS first_pub
+            FROM videos WHERE up_name IS NOT NULL GROUP BY up_name
+            """
+        )
+        values = []
+        for row in cursor.fetchall():
+            derived = derive_metrics(row, now)
+            values.append((
+                row["up_name"], int(row["video_count"]), int(row["total_views"]), int(row["total_fav"]),
+                int(row["total_reply"]), int(row["total_danmaku"]), int(row["total_duration"]), row["first_pub"],
+            ) + tuple(derived[f] for f in DERIVED_FIELDS) + (now,))
+        cursor.execute("DELETE FROM up_stats")
+        cursor.executemany(
+            """
+            INSERT INTO up_stats (
+                up_name, video_count, total_views, total_fav, total_reply, total_danmaku, total_duration,
+                first_pub, fav_rate, interact_avg, depth_score, activity, updated_at
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            values,
+        )
+        _refresh_maxima(cursor, now)
+    connection.commit()
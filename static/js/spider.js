@@ -1,7 +1,12 @@
-// 爬虫任务前端逻辑：提交任务、轮询进度、展示结果。
+// 爬虫任务前端逻辑：提交任务、SSE 推送进度（不支持或连接失败时退回轮询）、展示结果。
 (function (window) {
+  const TERMINAL_STATUSES = ['succeeded', 'failed', 'cancelled', 'interrupted'];
+  const LOG_KEEP = 20;
   let currentTaskId = null;
   let pollTimer = null;
+  let eventSource = null;
+  let currentProgress = 0;
+  let logLines = [];
 
   function parseKeywords(raw) {
     if (!raw) return [];
@@ -15,6 +20,7 @@
     const bar = document.getElementById('spider-progress');
     const badge = document.getElementById('status-badge');
     const value = Math.max(0, Math.min(100, percent || 0));
+    currentProgress = value;
     if (bar) {
       bar.style.width = `${value}%`;
       bar.textContent = `${value}%`;
@@ -35,10 +41,10 @@
     box.textContent = lines.join('\n');
   }
 
-  function renderTable(list) {
+  function renderTable(list, total) {
     const tbody = document.getElementById('spider-table-body');
     const counter = document.getElementById('result-count');
-    if (counter) counter.textContent = `${(list || []).length} 条`;
+    if (counter) counter.textContent = `${total ?? (list || []).length} 条`;
     if (!tbody) return;
     if (!list || !list.length) {
       tbody.innerHTML = '<tr><td colspan="7" class="text-center text-muted py-4">暂无数据</td></tr>';
@@ -100,7 +106,7 @@
       });
       currentTaskId = data.task_id;
       document.getElementById('current-task-label').textContent = `当前任务: ${currentTaskId}`;
-      startPolling();
+      startEvents();
     } catch (err) {
       disableForm(false);
       setLogs([`创建任务失败: ${err.message}`]);
@@ -117,20 +123,78 @@
     }
   }
 
+  async function finishTask(status) {
+    disableForm(false);
+    if (status === 'succeeded') {
+      const res = await fetchJSON(`/api/spider/tasks/${currentTaskId}/data`);
+      renderTable(res.data || [], res.total); // 接口按页返回，表格只展示第一页
+    }
+  }
+
+  function stopEvents() {
+    if (eventSource) {
+      eventSource.close();
+      eventSource = null;
+    }
+  }
+
+  function startEvents() {
+    if (!window.EventSource) {
+      startPolling();
+      return;
+    }
+    stopEvents();
+    logLines = [];
+    let finished = false;
+    const source = new EventSource(`/api/spider/tasks/${currentTaskId}/events`);
+    eventSource = source;
+
+    const handleStatus = (status) => {
+      if (finished || !TERMINAL_STATUSES.includes(status)) return;
+      finished = true;
+      stopEvents();
+      finishTask(status).catch((err) => setLogs([`加载结果失败: ${err.message}`]));
+    };
+
+    source.addEventListener('snapshot', (e) => {
+      const data = JSON.parse(e.data);
+      logLines = data.logs || [];
+      setProgress(data.progress, data.status);
+      setLogs(logLines);
+      handleStatus(data.status);
+    });
+    source.addEventListener('progress', (e) => {
+      const data = JSON.parse(e.data);
+      setProgress(data.progress ?? currentProgress, 'running');
+      if (data.log) {
+        logLines = logLines.concat(data.log).slice(-LOG_KEEP);
+        setLogs(logLines);
+      }
+    });
+    source.addEventListener('status', (e) => {
+      const data = JSON.parse(e.data);
+      setProgress(data.progress ?? currentProgress, data.status);
+      handleStatus(data.status);
+    });
+    source.onerror = () => {
+      // 断线时浏览器会带 Last-Event-ID 自动重连；连接被彻底关闭（如登录失效）时退回轮询
+      if (source.readyState === EventSource.CLOSED && !finished) {
+        stopEvents();
+        startPolling();
+      }
+    };
+  }
+
   async function pollTask() {
     if (!currentTaskId) return;
     try {
       const data = await fetchJSON(`/api/spider/tasks/${currentTaskId}`);
       setProgress(data.progress || 0, data.status || 'running');
       setLogs(data.logs || []);
-      if (['succeeded', 'failed', 'cancelled'].includes(data.status)) {
+      if (TERMINAL_STATUSES.includes(data.status)) {
         clearInterval(pollTimer);
         pollTimer = null;
-        disableForm(false);
-        if (data.status === 'succeeded') {
-          const res = await fetchJSON(`/api/spider/tasks/${currentTaskId}/data`);
-          renderTable(res.data || []);
-        }
+        await finishTask(data.status);
       }
     } catch (err) {
       clearInterval(pollTimer);
@@ -1,15 +1,45 @@
-"""文本分类模型训练脚本：基于数据库中的视频标题/标签，训练科目分类器。"""
+"""
+文本分类模型训练脚本：基于数据库中的视频标题/标签，训练科目分类器。
+
+两种训练方式：
+- full：全量重训 TF-IDF + ComplementNB，同时用全部数据重置增量状态；
+- incremental：HashingVectorizer 无需拟合词表，ComplementNB.partial_fit 只学习上次水位之后新入库的视频。
+默认 auto：已有增量状态、距上次全量不足 7 天、新数据不多且没有新类别时走增量，否则全量（即定期全量重训）。
+每次训练产出一个带版本号的模型文件（model_artifacts/，manifest.json 记录模式、水位、行数与准确率），
+并发布为 subject_classifier.pkl 供爬虫加载。--compare 在同一划分上对比两种方式的准确率与训练耗时。
+训练数据经服务端游标按 BILI_TRAIN_CHUNK 行一块流式读取、逐块分词；全量训练分三遍读取（统计文档频率、训练、评估），
+内存里不保留整份语料，只有词表与模型参数；结束时报告行/秒与峰值内存。
+
+    python train_model.py [--mode auto|full|incremental] [--compare]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
 
-import jieba
 import joblib
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics import classification_report
-from sklearn.model_selection import train_test_split
+from sqlalchemy import create_engine, text
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.metrics import accuracy_score, classification_report
 from sklearn.naive_bayes import ComplementNB
 from sklearn.pipeline import make_pipeline
 
+from spider.model_loader import MODEL_PATH, VECTORIZER_PATH     # 爬虫与 Web 加载的当前模型、内容推荐的向量器
+from spider.token_cache import TOKENIZE_WORKERS, cut, cut_many, video_text
+
+try:
+    import resource     # 仅 POSIX，用于报告峰值内存
+except ImportError:
+    resource = None
+
 # 数据库配置（固定值）
 DB_CONFIG = {
     "host": "localhost",
@@ -19,79 +49,457 @@ DB_CONFIG = {
     "charset": "utf8mb4"
 }
 
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.environ.get("BILI_MODEL_DIR", os.path.join(ROOT_DIR, "model_artifacts"))
+MANIFEST_PATH = os.path.join(MODEL_DIR, "manifest.json")
+STATE_PATH = os.path.join(MODEL_DIR, "hashing_state.pkl")        # 增量训练的 HashingVectorizer + NB 状态
+KEEP_VERSIONS = 10              # 保留最近的版本文件数
+HASH_FEATURES = 2 ** 20
+MIN_CLASS_SAMPLES = 5           # 样本数不超过它的类别不参与训练
+FULL_REFIT_INTERVAL = timedelta(days=7)
+REFIT_RATIO = 0.5               # 新数据超过已训练行数的该比例时改走全量（如重建搜索索引后水位失效）
+# 水位只推进到当前时间之前一段：爬虫写库事务可能晚于 indexed_at 才提交，留给下一次增量
+WATERMARK_LAG = timedelta(seconds=60)
+CHUNK_ROWS = int(os.environ.get("BILI_TRAIN_CHUNK", 20000))     # 服务端游标每次取回的行数
+TEST_BUCKETS = 5                # crc32(bvid) % 5 == 0 的视频作测试集（约 20%）
+
 
 def build_db_url() -> str:
     """拼接 MySQL 连接串。"""
     return f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}/{DB_CONFIG['db']}?charset={DB_CONFIG['charset']}"
 
 
-def get_training_data() -> pd.DataFrame:
-    """从数据库读取标注好的 subject，过滤“其他”与 NULL。"""
+_TRAINING_SQL = (
+    "FROM videos v LEFT JOIN search_docs d ON d.bvid = v.bvid "
+    "WHERE v.subject != '其他' AND v.subject IS NOT NULL"
+)
+
+
+def _training_where(since=None, until=None):
+    """
+    标注数据的筛选条件：过滤“其他”与 NULL。
+    search_docs.indexed_at 是视频首次入库（建索引）的时间，增量训练按它截取 (since, until] 区间；
+    全量训练不限下界，没有索引记录的旧数据也包含在内。
+    """
+    sql, params = _TRAINING_SQL, {}
+    if since is not None:
+        sql += " AND d.indexed_at > :since"
+        params["since"] = since
+    if until is not None:
+        sql += " AND (d.indexed_at IS NULL OR d.indexed_at <= :until)"
+        params["until"] = until
+    return sql, params
+
+
+def get_subject_counts(since=None, until=None) -> pd.Series:
+    """各类别行数（只做 GROUP BY，不读文本），训练前据此确定参与训练的类别、判断走增量还是全量。"""
+    sql, params = _training_where(since, until)
     engine = create_engine(build_db_url())
-    sql = "SELECT title, tags, subject FROM videos WHERE subject != '其他' AND subject IS NOT NULL"
-    return pd.read_sql(sql, engine)
+    counts = pd.read_sql(text(f"SELECT v.subject, COUNT(*) AS cnt {sql} GROUP BY v.subject"), engine, params=params)
+    return counts.set_index('subject')['cnt'].sort_values(ascending=False)
+
+
+def iter_training_data(subjects, since=None, until=None, chunksize=CHUNK_ROWS):
+    """
+    服务端游标（stream_results，pymysql 下为 SSCursor）按入库顺序逐块读取，每块至多 chunksize 行；
+    subject 转成固定类别集合的 categorical（每行只占 1 字节编码），不在 subjects 中的类别直接丢弃。
+    """
+    sql, params = _training_where(since, until)
+    dtype = pd.CategoricalDtype(sorted(subjects))
+    engine = create_engine(build_db_url())
+    query = text(f"SELECT v.bvid, v.title, v.tags, v.subject {sql} ORDER BY d.indexed_at")
+    with engine.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql(query, conn, params=params, chunksize=chunksize):
+            chunk['subject'] = chunk['subject'].astype(dtype)
+            yield chunk.dropna(subset=['subject'])
+
+
+def join_words(words) -> str:
+    """去单字，空格拼接，供向量器输入。"""
+    return " ".join([w for w in words if len(w) > 1])
 
 
 def clean_text(text: str) -> str:
-    """jieba 分词 + 去停用词/单字，供 TF-IDF 输入。"""
+    """jieba 分词 + 去停用词/单字，供 TF-IDF 输入（结果走分词缓存）。"""
     if not isinstance(text, str):
         return ""
-    words = jieba.cut(text)
-    return " ".join([w for w in words if len(w) > 1])
+    return join_words(cut(text))
+
+
+def cut_texts(df: pd.DataFrame) -> pd.Series:
+    """标题 + 标签按 video_text 规范化后批量分词：命中分词缓存的行不再切分，未命中的按块交给进程池。"""
+    texts = [video_text(title, tags) for title, tags in zip(df['title'].fillna(''), df['tags'].fillna(''))]
+    words = cut_many(texts, workers=TOKENIZE_WORKERS)
+    return pd.Series([join_words(w) for w in words], index=df.index, dtype=object)
+
+
+def iter_token_batches(subjects, since=None, until=None, meter=None):
+    """
+    逐块分词，产出 (分词文本列表, 类别名数组, 是否测试行数组)。原始标题/标签所在的 DataFrame 用完即丢，
+    内存里只保留分词结果；测试行由 bvid 的 crc32 决定（约 1/TEST_BUCKETS），不需要先读全量再划分，且跨次训练稳定。
+    """
+    categories = np.asarray(sorted(subjects), dtype=object)
+    for chunk in iter_training_data(subjects, since, until):
+        texts = cut_texts(chunk).tolist()
+        labels = categories[chunk['subject'].cat.codes.to_numpy()]
+        test = np.fromiter((zlib.crc32(bvid.encode("utf-8")) % TEST_BUCKETS == 0 for bvid in chunk['bvid']),
+                           dtype=bool, count=len(chunk))
+        if meter is not None:
+            meter.add(len(chunk))
+        yield texts, labels, test
+
+
+def peak_memory_mb():
+    """进程峰值常驻内存（MB）；没有 resource 模块（Windows）时返回 None。"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class LoadMeter:
+    """统计流式读取 + 分词的行数与速度。"""
+
+    def __init__(self):
+        self.rows = 0
+        self.start = time.perf_counter()
+
+    def add(self, rows):
+        self.rows += rows
+
+    def report(self, label):
+        cost = max(time.perf_counter() - self.start, 1e-9)
+        peak = peak_memory_mb()
+        memory = f"，进程峰值内存 {peak:.0f} MB" if peak is not None else ""
+        print(f"{label}: {self.rows} 行，{self.rows / cost:.0f} 行/秒（读取 + 分词）{memory}")
+
+
+def build_hashing_model():
+    """无状态特征（不需要词表，可以逐批 partial_fit）；alternate_sign=False 保证特征非负，NB 才能使用。"""
+    return make_pipeline(HashingVectorizer(n_features=HASH_FEATURES, alternate_sign=False), ComplementNB())
+
+
+def partial_fit(model, texts, labels, classes=None):
+    model[-1].partial_fit(model[0].transform(texts), labels, classes=classes)
+    return model
+
+
+def build_tfidf(doc_freq, n_docs):
+    """
+    由文档频率构造已拟合的 TfidfVectorizer，与默认参数下 TfidfVectorizer().fit(语料) 等价：
+    词表按词排序编号，idf = ln((1 + n) / (1 + df)) + 1（smooth_idf），不按 min_df/max_df 截断。
+    """
+    vectorizer = TfidfVectorizer()
+    terms = sorted(doc_freq)
+    vectorizer.vocabulary_ = {term: i for i, term in enumerate(terms)}
+    df = np.fromiter((doc_freq[term] for term in terms), dtype=np.float64, count=len(terms))
+    vectorizer.idf_ = np.log((1 + n_docs) / (1 + df)) + 1
+    return vectorizer
+
+
+# --- 版本化模型文件 ---
+
+def load_manifest() -> dict:
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"current": None, "versions": [], "incremental": None}
+
+
+def _atomic_dump(obj, path):
+    tmp_path = path + ".tmp"
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
 
 
-def train():
-    print("1. 正在加载数据...")
+def save_manifest(manifest):
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def publish(manifest, model, info) -> int:
+    """保存为新版本并替换 subject_classifier.pkl；只保留最近 KEEP_VERSIONS 个版本文件。"""
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    version = max((v["version"] for v in manifest["versions"]), default=0) + 1
+    filename = f"subject_classifier-v{version}.pkl"
+    _atomic_dump(model, os.path.join(MODEL_DIR, filename))
+    shutil.copyfile(os.path.join(MODEL_DIR, filename), MODEL_PATH + ".tmp")
+    os.replace(MODEL_PATH + ".tmp", MODEL_PATH)
+    manifest["versions"].append({
+        "version": version, "file": filename, "created_at": datetime.now().isoformat(timespec="seconds"), **info,
+    })
+    manifest["current"] = version
+    for old in manifest["versions"][:-KEEP_VERSIONS]:
+        try:
+            os.remove(os.path.join(MODEL_DIR, old["file"]))
+        except FileNotFoundError:
+            pass
+    manifest["versions"] = manifest["versions"][-KEEP_VERSIONS:]
+    save_manifest(manifest)
+    return version
+
+
+def choose_mode(manifest, counts) -> str:
+    """auto 模式的判断：满足任一条件即全量重训。counts 为水位之后新数据的类别行数。"""
+    state = manifest.get("incremental")
+    if not state or not os.path.exists(STATE_PATH):
+        return "full"
+    if datetime.now() - datetime.fromisoformat(state["last_full_at"]) >= FULL_REFIT_INTERVAL:
+        print("距上次全量训练已超过 7 天，执行定期全量重训")
+        return "full"
+    new_classes = set(counts.index) - set(state["classes"])
+    if new_classes:
+        print(f"出现新类别 {sorted(new_classes)}，朴素贝叶斯的增量更新无法新增类别，改为全量重训")
+        return "full"
+    total = int(counts.sum())
+    if total > state["trained_rows"] * REFIT_RATIO:
+        print(f"新数据 {total} 条超过已训练行数的 {REFIT_RATIO:.0%}，改为全量重训")
+        return "full"
+    return "incremental"
+
+
+def select_subjects(counts):
+    """过滤样本极少的类别，避免模型偏斜。"""
+    print("类别分布情况:\n", counts)
+    return counts[counts > MIN_CLASS_SAMPLES].index.tolist()
+
+
+def train_full(manifest, until):
+    """
+    全量重训，按 until 水位截取数据并分三遍流式读取：统计文档频率（同时训练增量状态）、训练 TF-IDF 模型、评估。
+    每遍只持有当前块的分词结果，内存占用取决于词表大小而不是行数。
+    """
+    print("1. 正在统计类别分布...")
     try:
-        df = get_training_data()
+        counts = get_subject_counts(until=until)
     except Exception as e:
         print(f"[WARN] 数据库连接失败: {e}")
         return
-
-    if len(df) < 50:
-        print(f"[WARN] 数据量太少（只有 {len(df)} 条），无法训练，请先运行爬虫抓取更多数据。")
+    if counts.sum() < 50:
+        print(f"[WARN] 数据量太少（只有 {int(counts.sum())} 条），无法训练，请先运行爬虫抓取更多数据。")
         return
 
-    # 2. 中文分词，合并标题 + 标签
-    print("2. 正在进行中文分词...")
-    df['text'] = df['title'] + " " + df['tags'].fillna('')
-    df['cut_text'] = df['text'].apply(clean_text)
-
-    # 3. 过滤样本极少的类别，避免模型偏斜
-    subject_counts = df['subject'].value_counts()
-    print("类别分布情况:\n", subject_counts)
-    valid_subjects = subject_counts[subject_counts > 5].index
-    df = df[df['subject'].isin(valid_subjects)]
-    print(f"过滤后剩余用于训练的数据量: {len(df)}")
-    if len(df) == 0:
+    # 过滤样本极少的类别（在 SQL 读取前确定，读取时直接丢弃）
+    subjects = select_subjects(counts)
+    print(f"过滤后剩余用于训练的数据量: {int(counts[subjects].sum())}")
+    if not subjects:
         print("[WARN] 过滤后没有足够的数据进行训练。")
         return
 
-    # 4. 划分训练集和测试集（stratify 保证比例一致）
-    X = df['cut_text']
-    y = df['subject']
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    # 2. 第一遍：流式读取 + 中文分词；增量状态（Hashing + NB）逐块 partial_fit，同时统计训练行的文档频率，
+    #    TF-IDF 的词表与 idf 由它得出，不需要把整份语料留在内存里一次性 fit
+    print("2. 正在流式读取、分词并统计词频...")
+    classes = np.asarray(sorted(subjects), dtype=object)
+    hashing = build_hashing_model()
+    analyzer = TfidfVectorizer().build_analyzer()
+    doc_freq, n_train, n_test = Counter(), 0, 0
+    meter = LoadMeter()
+    try:
+        for texts, labels, test in iter_token_batches(subjects, until=until, meter=meter):
+            train_rows = np.flatnonzero(~test)
+            batch = [texts[i] for i in train_rows]
+            if batch:
+                partial_fit(hashing, batch, labels[train_rows], classes=classes)
+            for doc in batch:
+                doc_freq.update(set(analyzer(doc)))
+            n_train += len(batch)
+            n_test += int(test.sum())
+    except Exception as e:
+        print(f"[WARN] 读取训练数据失败: {e}")
+        return
+    meter.report("读取完成")
+    if not n_train or not n_test:
+        print("[WARN] 训练集或测试集为空，无法训练。")
+        return
 
-    # 5. 训练模型：TF-IDF + 互补朴素贝叶斯（对不平衡数据更稳）
+    # 3. 第二遍：训练模型，TF-IDF + 互补朴素贝叶斯（对不平衡数据更稳）；按块变换后 partial_fit，结果与一次性 fit 相同。
+    #    Hashing 模型在第一遍已训练完，同一遍里在测试行上评估。分词命中缓存，重读只多一次数据库扫描
     print("3. 开始训练模型...")
-    model = make_pipeline(TfidfVectorizer(), ComplementNB())
-    model.fit(X_train, y_train)
+    vectorizer = build_tfidf(doc_freq, n_train)
+    del doc_freq
+    nb = ComplementNB()
+    hashing_true, hashing_pred = [], []
+    try:
+        for texts, labels, test in iter_token_batches(subjects, until=until):
+            train_rows, test_rows = np.flatnonzero(~test), np.flatnonzero(test)
+            if len(train_rows):
+                nb.partial_fit(vectorizer.transform([texts[i] for i in train_rows]), labels[train_rows],
+                               classes=classes)
+            if len(test_rows):
+                hashing_pred.append(hashing.predict([texts[i] for i in test_rows]))
+                hashing_true.append(labels[test_rows])
+    except Exception as e:
+        print(f"[WARN] 读取训练数据失败: {e}")
+        return
+    model = make_pipeline(vectorizer, nb)
 
-    # 6. 评估
+    # 4. 第三遍：评估；评估完的测试行再补学进增量状态，之后的增量训练从本次水位继续
     print("4. 评估结果:")
-    y_pred = model.predict(X_test)
+    y_test, y_pred = [], []
+    try:
+        for texts, labels, test in iter_token_batches(subjects, until=until):
+            test_rows = np.flatnonzero(test)
+            if len(test_rows):
+                batch = [texts[i] for i in test_rows]
+                y_pred.append(model.predict(batch))
+                y_test.append(labels[test_rows])
+                partial_fit(hashing, batch, labels[test_rows])
+    except Exception as e:
+        print(f"[WARN] 读取测试数据失败: {e}")
+        return
+    if not y_test or not hashing_true:
+        print("[WARN] 测试集为空，无法评估。")
+        return
+    y_test, y_pred = np.concatenate(y_test), np.concatenate(y_pred)
     print(classification_report(y_test, y_pred, zero_division=0))
+    accuracy = accuracy_score(y_test, y_pred)
+    hashing_accuracy = accuracy_score(np.concatenate(hashing_true), np.concatenate(hashing_pred))
+    print(f"准确率: TF-IDF 全量 {accuracy:.4f}，Hashing 增量模型 {hashing_accuracy:.4f}")
+    rows = n_train + n_test
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    _atomic_dump(hashing, STATE_PATH)
+    manifest["incremental"] = {
+        "watermark": until.isoformat(timespec="seconds"), "trained_rows": rows,
+        "last_full_at": datetime.now().isoformat(timespec="seconds"), "classes": classes.tolist(),
+    }
 
-    # 7. 保存模型
-    joblib.dump(model, 'subject_classifier.pkl')
-    print("[OK] 模型已保存为 subject_classifier.pkl")
+    # 5. 保存模型
+    version = publish(manifest, model, {
+        "mode": "full", "kind": "tfidf", "rows": rows, "accuracy": round(accuracy, 4),
+        "hashing_accuracy": round(hashing_accuracy, 4), "watermark": manifest["incremental"]["watermark"],
+    })
+    print(f"[OK] 模型已保存为 v{version} 并发布到 subject_classifier.pkl")
+    # 内容推荐需要带词表的 TF-IDF 向量器，单独发布；之后的增量训练只替换分类模型，不影响推荐
+    _atomic_dump(model.named_steps['tfidfvectorizer'], VECTORIZER_PATH)
 
-    # 8. 简单测试样例，方便答辩演示
+    # 6. 简单测试样例，方便答辩演示
     test_title = "张宇带你刷线代矩阵的本质"
     processed = clean_text(test_title)
     prediction = model.predict([processed])[0]
     print(f"\n测试预测: '{test_title}' -> 【{prediction}】")
 
 
+def train_incremental(manifest, counts, since, until):
+    state = manifest["incremental"]
+    model = joblib.load(STATE_PATH)
+    known = [subject for subject in counts.index if subject in set(model.classes_)]
+    skipped = int(counts.drop(known).sum())
+    if skipped:
+        print(f"[WARN] 跳过 {skipped} 条未知类别的数据，需全量重训才能学到新类别")
+    if not known:
+        print("没有可用于增量训练的新数据")
+        return
+
+    print(f"2. 正在流式读取并分词 {int(counts[known].sum())} 条新数据...")
+    rows = correct = 0
+    fit_seconds = 0.0
+    meter = LoadMeter()
+    try:
+        for texts, labels, _ in iter_token_batches(known, since=since, until=until, meter=meter):
+            if not texts:
+                continue
+            # 先测后训：更新前的模型在新数据上的准确率，反映模型对新入库视频的泛化
+            correct += int((model.predict(texts) == labels).sum())
+            rows += len(texts)
+            start = time.perf_counter()
+            partial_fit(model, texts, labels)
+            fit_seconds += time.perf_counter() - start
+    except Exception as e:
+        print(f"[WARN] 读取训练数据失败: {e}")
+        return
+    meter.report("读取完成")
+    if not rows:
+        print("没有可用于增量训练的新数据")
+        return
+    accuracy = correct / rows
+    print(f"3. 增量更新完成，训练耗时 {fit_seconds:.2f} 秒；更新前在新数据上的准确率 {accuracy:.4f}")
+
+    _atomic_dump(model, STATE_PATH)
+    state["watermark"] = until.isoformat(timespec="seconds")
+    state["trained_rows"] += rows
+    version = publish(manifest, model, {
+        "mode": "incremental", "kind": "hashing", "rows": rows, "trained_rows": state["trained_rows"],
+        "accuracy": round(accuracy, 4), "watermark": state["watermark"],
+    })
+    print(f"[OK] 模型已保存为 v{version} 并发布到 subject_classifier.pkl")
+
+
+def train(mode="auto"):
+    manifest = load_manifest()
+    until = datetime.now() - WATERMARK_LAG
+    state = manifest.get("incremental")
+    if mode != "full" and state and os.path.exists(STATE_PATH):
+        print("1. 正在统计上次水位之后的新数据...")
+        since = datetime.fromisoformat(state["watermark"])
+        try:
+            counts = get_subject_counts(since=since, until=until)
+        except Exception as e:
+            print(f"[WARN] 数据库连接失败: {e}")
+            return
+        if mode == "auto":
+            mode = choose_mode(manifest, counts)
+        if mode == "incremental":
+            if counts.empty:
+                print("自上次训练以来没有新的标注数据")
+                return
+            train_incremental(manifest, counts, since, until)
+            return
+    elif mode == "incremental":
+        print("[WARN] 还没有增量状态，先执行一次全量训练")
+    train_full(manifest, until)
+
+
+def compare():
+    """
+    同一份数据、同一个测试集上对比：TF-IDF 全量、Hashing 全量、Hashing 增量
+    （训练集按入库顺序前 90% 作为已有状态，后 10% 作为新数据 partial_fit）的准确率与训练耗时。
+    """
+    try:
+        subjects = select_subjects(get_subject_counts())
+        texts, labels, test = [], [], []
+        meter = LoadMeter()
+        for batch_texts, batch_labels, batch_test in iter_token_batches(subjects, meter=meter):
+            texts.extend(batch_texts)
+            labels.append(batch_labels)
+            test.append(batch_test)
+    except Exception as e:
+        print(f"[WARN] 数据库连接失败: {e}")
+        return
+    meter.report("读取完成")
+    if len(texts) < 50:
+        print(f"[WARN] 数据量太少（只有 {len(texts)} 条），无法对比")
+        return
+    labels, test = np.concatenate(labels), np.concatenate(test)
+    train_rows, test_rows = np.flatnonzero(~test), np.flatnonzero(test)     # 均保持入库顺序
+    X, y = [texts[i] for i in train_rows], labels[train_rows]
+    X_test, y_test = [texts[i] for i in test_rows], labels[test_rows]
+    split = int(len(X) * 0.9)
+    classes = np.asarray(sorted(subjects), dtype=object)
+
+    def run(name, fit):
+        start = time.perf_counter()
+        model = fit()
+        cost = time.perf_counter() - start
+        accuracy = accuracy_score(y_test, model.predict(X_test))
+        print(f"{name:<24} {accuracy:>9.4f} {cost:>10.3f}")
+
+    incremental = partial_fit(build_hashing_model(), X[:split], y[:split], classes=classes)
+    print(f"训练 {len(X)} 条（增量部分 {len(X) - split} 条），测试 {len(X_test)} 条")
+    print(f"{'mode':<24} {'accuracy':>9} {'fit (s)':>10}")
+    run("full tfidf", lambda: make_pipeline(TfidfVectorizer(), ComplementNB()).fit(X, y))
+    run("full hashing", lambda: partial_fit(build_hashing_model(), X, y, classes=classes))
+    run("incremental hashing", lambda: partial_fit(incremental, X[split:], y[split:]))
+
+
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="训练科目分类器")
+    parser.add_argument("--mode", choices=("auto", "full", "incremental"), default="auto")
+    parser.add_argument("--compare", action="store_true", help="对比全量与增量训练的准确率和耗时，不发布模型")
+    args = parser.parse_args()
+    if args.compare:
+        compare()
+    else:
+        train(args.mode)